@@ -0,0 +1,54 @@
+# compression_middleware.py
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request, Response
+
+from framework.utils.compression import CompressedBodyCache, negotiate_encoding
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+
+class CompressionMiddleware(BaseHTTPMiddleware):
+    """
+    Compress responses with gzip (or brotli, if installed) when the client accepts it and the body is
+    at least minimum_size bytes. Compressed bodies are cached by content, see CompressedBodyCache.
+    Streaming responses such as server-sent events are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, cache_entries: int = 256):
+        super().__init__(app)
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache(max_entries=cache_entries)
+
+    async def dispatch(self, request: Request, call_next):
+        response: Response = await call_next(request)
+
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if (content_type not in COMPRESSIBLE_TYPES
+                or "content-encoding" in response.headers
+                or response.status_code in (204, 304)):
+            return response
+
+        vary = response.headers.get("vary")
+        response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is None:
+            return response
+        length = response.headers.get("content-length")
+        if length is not None and int(length) < self.minimum_size:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        if len(body) < self.minimum_size:
+            content = body
+            extra_headers = []
+        else:
+            content = self.cache.get_or_compress(body, encoding)
+            extra_headers = [(b"content-encoding", encoding.encode("latin-1"))]
+
+        compressed = Response(content=content, status_code=response.status_code,
+                              background=response.background)
+        compressed.raw_headers = [
+            (name, value) for name, value in response.raw_headers if name != b"content-length"
+        ] + extra_headers + [(b"content-length", str(len(content)).encode("latin-1"))]
+        return compressed
@@ -0,0 +1,41 @@
+# dependencies.py
+import os
+
+from fastapi import HTTPException
+
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+from framework.services.data_access.CircuitBreaker import CircuitOpenException
+from framework.utils.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+# One limiter per worker process. The maximum should not exceed the threadpool that runs the
+# synchronous route handlers (40 threads by default).
+concurrency_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=int(os.getenv("CONCURRENCY_LIMIT_INITIAL", 20)),
+    min_limit=int(os.getenv("CONCURRENCY_LIMIT_MIN", 2)),
+    max_limit=int(os.getenv("CONCURRENCY_LIMIT_MAX", 40)),
+)
+
+
+async def limit_concurrency():
+    """
+    Router dependency that sheds load: requests over the adaptive concurrency limit get 503 with
+    Retry-After instead of queueing behind a slow database.
+    """
+    token = concurrency_limiter.try_acquire()
+    if token is None:
+        raise HTTPException(status_code=503, detail="Service is overloaded, please retry",
+                            headers={"Retry-After": "1"})
+    try:
+        yield
+    except CircuitOpenException:
+        # Failed fast without reaching the database: says nothing about the right limit.
+        concurrency_limiter.cancel(token)
+        raise
+    except ServiceUnavailableException:
+        concurrency_limiter.release(token, dropped=True)
+        raise
+    except BaseException:
+        concurrency_limiter.release(token)
+        raise
+    else:
+        concurrency_limiter.release(token)
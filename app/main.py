@@ -1,20 +1,79 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI, Request
-import uvicorn
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import logging
-import json
+import math
 import os
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import recipes
+from app import warmup
+from app.routers import changes, health, recipes
+from app.services.service_factory import ServiceFactory
 from app.correlation_id_middleware import CorrelationIdMiddleware
 from app.log_requests_middleware import LogRequestsMiddleware
+from app.compression_middleware import CompressionMiddleware
+from app.profiling_middleware import ProfiledRoute, ProfilingMiddleware
+from app.rate_limit_middleware import RateLimitMiddleware, policies_from_env, store_from_env
+from app.tracing_middleware import TracingMiddleware
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+from framework.utils.tracing import exporter_from_spec, tracer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# TRACING_EXPORTER ("stdout", "file:<path>" or a collector URL) turns on tracing; spans are exported in
+# batches from a background thread.
+tracer.configure(exporter_from_spec(os.getenv("TRACING_EXPORTER"),
+                                    service_name=os.getenv("TRACING_SERVICE_NAME", "recipe-service")),
+                 sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 1)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker after it is forked, so each worker warms its own pool and caches.
+    # Nothing here waits for the database: the warmup and the catalog snapshot load run in background
+    # threads, requests open connections on demand, and /health/ready reports 503 until warmup is done.
+    if warmup.warmup_enabled():
+        warmup.start()
+    else:
+        warmup.state["ready"] = True
+    snapshot = ServiceFactory.get_service("RecipeSnapshot")
+    if snapshot is not None:
+        snapshot.start()
+    write_buffer = ServiceFactory.get_service("RecipeWriteBuffer")
+    if write_buffer is not None:
+        # Recover updates journaled by workers that died before flushing
+        await run_in_threadpool(write_buffer.start)
+    nutrition = ServiceFactory.get_service("NutritionClient")
+    if nutrition is not None:
+        # Its pooled HTTP client belongs to this worker's event loop
+        await nutrition.start()
+    yield
+    if nutrition is not None:
+        await nutrition.close()
+    if write_buffer is not None:
+        await run_in_threadpool(write_buffer.close)
+    if snapshot is not None:
+        snapshot.stop()
+    await run_in_threadpool(tracer.flush)
+    data_service = ServiceFactory.peek_service("RecipeResourceDataService")
+    if data_service is not None:
+        data_service.pool.close_all()
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = ProfiledRoute
+
+# RATE_LIMIT=1 limits every client with token buckets per kind of route. Innermost, so that 429
+# responses still get CORS headers and are logged and traced.
+if os.getenv("RATE_LIMIT", "0") == "1":
+    app.add_middleware(RateLimitMiddleware, store=store_from_env(os.environ), policies=policies_from_env(os.environ),
+                       client_header=os.getenv("RATE_LIMIT_CLIENT_HEADER") or None,
+                       # Proxies that append to a forwarded-for RATE_LIMIT_CLIENT_HEADER, e.g. 1 load balancer
+                       trusted_hops=int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", 1)))
 
 # add middleware
 app.add_middleware(
@@ -25,12 +84,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)))
+
 #add middleware
 app.add_middleware(LogRequestsMiddleware)
 
+# Inside CorrelationIdMiddleware, which must run first to give the profile its key
+app.add_middleware(ProfilingMiddleware, sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)))
+
+# Also inside CorrelationIdMiddleware: new traces take the correlation id as their trace id
+app.add_middleware(TracingMiddleware)
+
 app.add_middleware(CorrelationIdMiddleware)
 
+@app.exception_handler(ServiceUnavailableException)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableException):
+    # Database down, timed out or circuit open: tell clients when to retry instead of failing with 500.
+    retry_after = max(1, math.ceil(exc.retry_after))
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(retry_after)})
+
 app.include_router(recipes.router)
+app.include_router(changes.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def root(request: Request):
@@ -43,5 +118,7 @@ async def root(request: Request):
 #     json.dump(app.openapi(), f)
 
 if __name__ == "__main__":
+    # Only needed to run the app directly; gunicorn loads uvicorn through its worker class.
+    import uvicorn
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, Field
 
 class Ingredient(BaseModel):
@@ -17,6 +17,7 @@ class Recipe(BaseModel):
     meal_type: Optional[str] = None
     calories: Optional[int] = None
     rating: Optional[float] = None
+    version: Optional[int] = None
     links: Optional[Dict[str, Any]] = Field(None, alias="links")
 
     class Config:
@@ -71,6 +72,49 @@ class Recipe(BaseModel):
             }
         }
 
+class RecipePatch(BaseModel):
+    """
+    A partial update: only the fields that are set are changed.
+    """
+    name: Optional[str] = None
+    ingredients: Optional[List[Ingredient]] = None
+    steps: Optional[str] = None
+    time_to_cook: Optional[int] = None
+    meal_type: Optional[str] = None
+    calories: Optional[int] = None
+    rating: Optional[float] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "rating": 4.6
+            }
+        }
+
+class RecipeOperation(BaseModel):
+    """
+    One write of a POST /recipes/transactions batch: create takes recipe, update takes recipe_id and
+    changes, delete takes recipe_id. expected_version works like If-Match on the single-recipe endpoints.
+    """
+    op: Literal["create", "update", "delete"]
+    recipe_id: Optional[int] = None
+    recipe: Optional[Recipe] = None
+    changes: Optional[RecipePatch] = None
+    expected_version: Optional[int] = None
+
+class RecipeTransaction(BaseModel):
+    operations: List[RecipeOperation] = Field(..., min_length=1, max_length=100)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "operations": [
+                    {"op": "update", "recipe_id": 171, "changes": {"rating": 4.6}, "expected_version": 3},
+                    {"op": "delete", "recipe_id": 172}
+                ]
+            }
+        }
+
 class PaginatedResponse(BaseModel):
     items: List[Any]
     links: Dict[str, Any]
@@ -0,0 +1,120 @@
+# profiling_middleware.py
+import asyncio
+import hmac
+import os
+import random
+import time
+from functools import wraps
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from framework.utils.request_profiler import ProfileStore, RequestProfile, cprofiled, current_profile
+
+# Profiling is off unless PROFILE_TOKEN is set: a request whose X-Profile-Token header matches it is
+# profiled and gets a Server-Timing header; with "X-Profile: cprofile" its endpoint also runs under
+# cProfile. PROFILE_SAMPLE_RATE profiles that fraction of all requests without telling the client.
+# Profiles are kept per worker by correlation id, see GET /debug/profiles.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+
+profile_store = ProfileStore(max_entries=int(os.getenv("PROFILE_STORE_SIZE", 200)))
+
+
+def profile_token_valid(token: Optional[str]) -> bool:
+    return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Profile requests that ask for it with the profiling token, and a sample of all requests.
+    Add it inside CorrelationIdMiddleware, so profiles are stored under the request's correlation id.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0):
+        super().__init__(app)
+        self.sample_rate = sample_rate
+
+    async def dispatch(self, request: Request, call_next):
+        requested = profile_token_valid(request.headers.get("X-Profile-Token"))
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            return await call_next(request)
+
+        profile = RequestProfile(getattr(request.state, "correlation_id", None), request.method, request.url.path,
+                                 use_cprofile=requested and request.headers.get("X-Profile", "").lower() == "cprofile")
+        token = current_profile.set(profile)
+        response = None
+        try:
+            response: Response = await call_next(request)
+        finally:
+            current_profile.reset(token)
+            profile.finish(response.status_code if response is not None else None)
+            profile_store.put(profile)
+
+        if requested:
+            response.headers["Server-Timing"] = profile.server_timing()
+        return response
+
+
+def _timed_endpoint(endpoint):
+    """
+    Wrap a route endpoint to record when it runs in the current request's profile. FastAPI reads the
+    endpoint's parameters through the wrapper (functools.wraps sets __wrapped__).
+    """
+    if getattr(endpoint, "_profiled", False):
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.endpoint_start = time.perf_counter()
+            try:
+                with cprofiled(profile):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                profile.endpoint_end = time.perf_counter()
+    else:
+        @wraps(endpoint)
+        def timed(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            profile.endpoint_start = time.perf_counter()
+            try:
+                with cprofiled(profile):
+                    return endpoint(*args, **kwargs)
+            finally:
+                profile.endpoint_end = time.perf_counter()
+
+    timed._profiled = True
+    return timed
+
+
+class ProfiledRoute(APIRoute):
+    """
+    An APIRoute that records when FastAPI starts and finishes handling a profiled request and when the
+    endpoint runs, so the profile can tell validation and serialization apart from the endpoint. When
+    the request is not profiled this costs a context variable lookup.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            profile = current_profile.get()
+            if profile is None:
+                return await handler(request)
+            profile.route_start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                profile.route_end = time.perf_counter()
+
+        return timed_handler
@@ -0,0 +1,117 @@
+# rate_limit_middleware.py
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from framework.utils.rate_limiter import (
+    InMemoryRateLimitStore, NetworkRateLimitStore, RateLimitPolicy, RateLimitStore
+)
+
+# Not rate limited: probes, debugging and documentation
+EXEMPT_PREFIXES = ("/health", "/_ah/", "/debug/", "/docs", "/redoc", "/openapi.json")
+
+# Listing and search scan the catalog; every other GET reads one recipe.
+EXPENSIVE_PATHS = {"/recipes", "/recipes/search", "/recipes/top", "/recipes/stats"}
+
+# GET /recipes with skip reads and discards skip rows: it costs one more token per this many rows skipped.
+SKIP_COST_STEP = 1000
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def route_policy(method: str, path: str) -> Optional[str]:
+    """
+    :return: The name of the policy that limits the request ("read", "write" or "expensive"), or None
+        if it is not limited.
+    """
+    if method == "OPTIONS" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method in WRITE_METHODS:
+        return "write"
+    if path.rstrip("/") in EXPENSIVE_PATHS:
+        return "expensive"
+    return "read"
+
+
+def request_cost(request: Request, policy: RateLimitPolicy) -> int:
+    cost = 1
+    if request.url.path.rstrip("/") == "/recipes":
+        try:
+            cost += max(0, int(request.query_params.get("skip", 0))) // SKIP_COST_STEP
+        except ValueError:
+            pass  # rejected by validation
+    return min(cost, policy.limit)
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Token bucket rate limiting per client and per kind of route. A request over its client's limit gets
+    429 with Retry-After; every limited response carries RateLimit-Limit, RateLimit-Remaining,
+    RateLimit-Reset and RateLimit-Policy headers.
+
+    Clients are told apart by the client_header (e.g. X-Forwarded-For behind a load balancer, or an API
+    key header) when the request has it, else by their address.
+
+    Each proxy appends the address it received the request from to a forwarded-for list, after whatever
+    the client sent, so only the last trusted_hops entries can be trusted: the client is the entry
+    trusted_hops from the right (1 behind a single load balancer).
+    """
+
+    def __init__(self, app, store: RateLimitStore, policies: dict, client_header: Optional[str] = None,
+                 trusted_hops: int = 1):
+        super().__init__(app)
+        self.store = store
+        self.policies = policies
+        self.client_header = client_header
+        self.trusted_hops = max(1, trusted_hops)
+
+    def client_key(self, request: Request) -> str:
+        if self.client_header:
+            value = request.headers.get(self.client_header)
+            if value:
+                # Entries left of the trusted ones come from the client, which can make up any it likes
+                entries = [entry.strip() for entry in value.split(",")]
+                return entries[-min(self.trusted_hops, len(entries))]
+        return request.client.host if request.client else "unknown"
+
+    async def dispatch(self, request: Request, call_next):
+        policy = self.policies.get(route_policy(request.method, request.url.path))
+        if policy is None:
+            return await call_next(request)
+
+        key, cost = self.client_key(request), request_cost(request, policy)
+        if self.store.blocking:
+            result = await run_in_threadpool(self.store.consume, key, policy, cost)
+        else:
+            result = self.store.consume(key, policy, cost)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests, please retry later"},
+                                headers=result.headers())
+
+        response = await call_next(request)
+        response.headers.update(result.headers())
+        return response
+
+
+def policies_from_env(environ) -> dict:
+    """
+    Policies from RATE_LIMIT_READ, RATE_LIMIT_WRITE and RATE_LIMIT_EXPENSIVE ("<limit>/<seconds>").
+    """
+    defaults = {"read": "600/60", "write": "60/60", "expensive": "120/60"}
+    return {name: RateLimitPolicy.parse(name, environ.get(f"RATE_LIMIT_{name.upper()}", spec))
+            for name, spec in defaults.items()}
+
+
+def store_from_env(environ) -> RateLimitStore:
+    """
+    Buckets shared by all instances on the server at RATE_LIMIT_URL (e.g. redis://10.0.0.3:6379/0), or
+    kept in each worker (up to RATE_LIMIT_MAX_CLIENTS buckets), which then limits clients per worker.
+    """
+    url = environ.get("RATE_LIMIT_URL")
+    if url:
+        from framework.services.cache.NetworkCacheService import NetworkCacheService
+        return NetworkRateLimitStore(NetworkCacheService.from_url(url, key_prefix="recipe-service:"))
+    return InMemoryRateLimitStore(max_entries=int(environ.get("RATE_LIMIT_MAX_CLIENTS", 100000)))
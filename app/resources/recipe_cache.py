@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from framework.services.cache.BaseCacheService import CacheService
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+
+# Age in seconds of the oldest stale value served in the current request context, or None.
+# Route handlers read it with served_stale_age() to mark their responses.
+_stale_age: ContextVar[Optional[float]] = ContextVar("recipe_cache_stale_age", default=None)
+
+
+def served_stale_age() -> Optional[float]:
+    return _stale_age.get()
+
+
+class RecipeCache:
+    """
+    Read-through cache in front of RecipeResource's data service reads.
+
+    Two tiers:
+    - local: a small per-process InMemoryCacheService with a short TTL. Values are kept as Python objects.
+    - shared (optional): a CacheService shared by every instance (NetworkCacheService), values as JSON.
+
+    Keys are versioned. Every write increments a generation counter in the shared tier, and list/count
+    keys embed the generation, so a write on any instance retires every cached page at once. Single
+    recipes are cached by id (names map to ids) and are deleted on write. Each write also publishes an
+    invalidation message so other instances drop their local copies immediately.
+
+    Stale-while-revalidate: a value is fresh for ttl seconds, then stale for up to max_stale seconds more.
+    A stale value is returned immediately while one background task reloads it. If the load of a missing
+    value fails because the database is unavailable, a stale local copy is served instead. Either way the
+    request is marked, see served_stale_age(). max_stale=0 turns this off.
+    """
+
+    CHANNEL = "recipes:invalidate"
+    GENERATION_KEY = "recipes:generation"
+
+    def __init__(self, local: CacheService, shared: Optional[CacheService] = None,
+                 ttl: float = 60.0, local_ttl: float = 5.0, max_stale: float = 0.0,
+                 generation_check_interval: float = 1.0, refresh_workers: int = 2):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_stale = max_stale
+        self.generation_check_interval = generation_check_interval
+
+        self._generation = None
+        self._generation_checked_at = 0.0
+        self._lock = threading.Lock()
+
+        self._refresh_workers = refresh_workers
+        self._refresh_executor = None
+        self._refreshing = set()
+
+        (shared or local).subscribe(self.CHANNEL, self._on_invalidate)
+
+    # -- versioned keys ---------------------------------------------------------------------------
+
+    def generation(self) -> int:
+        """
+        The current list generation. Read from the shared tier at most every generation_check_interval
+        seconds, and updated immediately by invalidation messages.
+        """
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_checked_at > self.generation_check_interval:
+            value = self.shared.get(self.GENERATION_KEY) if self.shared else None
+            with self._lock:
+                if value is not None:
+                    self._generation = max(int(value), self._generation or 0)
+                elif self._generation is None:
+                    self._generation = 0
+                self._generation_checked_at = now
+        return self._generation
+
+    def _on_invalidate(self, message: str):
+        event = json.loads(message)
+        with self._lock:
+            self._generation = max(event["generation"], self._generation or 0)
+            self._generation_checked_at = time.monotonic()
+        self.local.delete(*event["keys"])
+
+    def invalidate(self, recipe_ids=(), names=()):
+        """
+        Called after a write. Retires every cached page and count and the given recipes, on every instance.
+        """
+        keys = [f"recipe:id:{recipe_id}" for recipe_id in recipe_ids] + [f"recipe:name:{name}" for name in names]
+        if self.shared:
+            try:
+                generation = self.shared.incr(self.GENERATION_KEY)
+            except Exception as e:
+                print(f"Cache generation increment failed: {e}")
+                generation = self.generation() + 1
+            self.shared.delete(*keys)
+        else:
+            generation = self.local.incr(self.GENERATION_KEY)
+        self.local.delete(*keys)
+        with self._lock:
+            self._generation = max(generation, self._generation or 0)
+        (self.shared or self.local).publish(self.CHANNEL, json.dumps({"generation": generation, "keys": keys}))
+
+    # -- read-through -----------------------------------------------------------------------------
+
+    def _read(self, key: str):
+        """
+        Look a key up in the local tier, then the shared tier.
+
+        Values are stored with the time they were loaded, as [value, stored_at]. A local copy is trusted
+        for local_ttl seconds; after that the shared tier decides. A local copy the shared tier no longer
+        has (invalidated or expired there) is only returned as the fallback, for use during an outage.
+
+        :return: (entry, fallback), each [value, stored_at] or None.
+        """
+        now = time.time()
+        local_entry = self.local.get(key)
+        if local_entry is not None and (self.shared is None or now - local_entry[2] < self.local_ttl):
+            return local_entry[:2], None
+        if self.shared:
+            raw = self.shared.get(key)
+            if raw is not None:
+                value, stored_at = json.loads(raw)
+                self.local.set(key, [value, stored_at, now], self.ttl + self.max_stale)
+                return [value, stored_at], None
+        return None, local_entry[:2] if local_entry is not None else None
+
+    def _set(self, key: str, value: Any):
+        now = time.time()
+        self.local.set(key, [value, now, now], self.ttl + self.max_stale)
+        if self.shared:
+            self.shared.set(key, json.dumps([value, now]), self.ttl + self.max_stale)
+
+    def _serve_stale(self, value, stored_at: float):
+        age = time.time() - stored_at
+        current = _stale_age.get()
+        _stale_age.set(age if current is None else max(age, current))
+        return value
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any], cache_empty: bool):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                # Created on first use, so each worker process gets its own threads.
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=self._refresh_workers, thread_name_prefix="cache-refresh"
+                )
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None and (cache_empty or value):
+                    self._set(key, value)
+            except Exception as e:
+                print(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], cache_empty: bool = True):
+        entry, fallback = self._read(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.max_stale:
+                self._refresh_in_background(key, loader, cache_empty)
+                return self._serve_stale(value, stored_at)
+            fallback = entry
+
+        try:
+            value = loader()
+        except ServiceUnavailableException:
+            if fallback is not None and time.time() - fallback[1] < self.ttl + self.max_stale:
+                return self._serve_stale(*fallback)
+            raise
+        if value is not None and (cache_empty or value):
+            self._set(key, value)
+        return value
+
+    def get_recipe(self, key_field: str, key_value: Any, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Get a recipe dict by recipe_id or name. Names are cached as a pointer to the recipe id; a pointer
+        whose recipe has since been renamed or deleted counts as a miss.
+        """
+        if key_field == "recipe_id":
+            return self.get_or_load(f"recipe:id:{key_value}", loader)
+
+        name_key = f"recipe:{key_field}:{key_value}"
+        entry, fallback = self._read(name_key)
+        pointer = entry or fallback
+        if pointer is not None:
+            recipe_id = pointer[0]
+
+            def load_same_recipe():
+                # The loader looks the recipe up by name; only keep the result if it is still this recipe.
+                recipe = loader()
+                return recipe if recipe is not None and recipe["recipe_id"] == recipe_id else None
+
+            recipe = self.get_or_load(f"recipe:id:{recipe_id}", load_same_recipe)
+            if recipe is not None and recipe.get(key_field) == key_value:
+                return recipe
+
+        recipe = loader()
+        if recipe is not None:
+            self._set(f"recipe:id:{recipe['recipe_id']}", recipe)
+            self._set(name_key, recipe["recipe_id"])
+        return recipe
+
+    def get_projection(self, key_field: str, key_value: Any, shape: str, loader: Callable[[], Optional[dict]]):
+        """
+        Get a sparse fieldset of one recipe. Keyed by the list generation, so any write retires it.
+        """
+        return self.get_or_load(f"recipes:v{self.generation()}:{key_field}:{key_value}:{shape}", loader)
+
+    def get_page(self, skip: int, limit: int, loader: Callable[[], list], shape: str = "") -> list:
+        """
+        :param shape: Identifies the fieldset of a sparse page; empty for full recipes.
+        """
+        key = f"recipes:v{self.generation()}:page:{skip}:{limit}"
+        if shape:
+            key += f":{shape}"
+        return self.get_or_load(key, loader, cache_empty=False)
+
+    def get_count(self, loader: Callable[[], int]) -> int:
+        return self.get_or_load(f"recipes:v{self.generation()}:count", loader)
+
+    def get_top_rated(self, limit: int, meal_type: Optional[str], loader: Callable[[], dict]) -> dict:
+        return self.get_or_load(f"recipes:v{self.generation()}:top:{limit}:{meal_type or '*'}", loader)
+
+    def get_stats(self, top_ingredients: int, loader: Callable[[], dict]) -> dict:
+        return self.get_or_load(f"recipes:v{self.generation()}:stats:{top_ingredients}", loader)
@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Callable
+
+from framework.services.cache.BaseCacheService import CacheService
+
+
+class RecipeChangeFeed:
+    """
+    The recipe change feed. Events are rows of the change outbox table, written by the data service in
+    the same transaction as each recipe write; their change_id is the offset consumers resume from.
+
+    After a write, RecipeResource publishes a wake-up on the pub/sub channel so that open streams on
+    every instance read the new events right away instead of waiting for their next poll.
+
+    change_ids are handed out when a write inserts its event but become visible when it commits, and
+    writes do not commit in change_id order: change N+1 can be read while N is still uncommitted. A
+    consumer that moved its offset past N would never see it, so read() stops before the first gap in
+    the change_ids. A gap is skipped once it has been open for gap_timeout seconds, longer than any write
+    transaction runs: by then the write that left it rolled back, and its change_id is never used.
+    """
+
+    CHANNEL = "recipes:changes"
+
+    # How many of the latest changes head() checks for gaps
+    HEAD_SCAN = 500
+    # Gaps remembered; the oldest are forgotten first
+    MAX_GAPS = 1000
+
+    def __init__(self, data_service, pubsub: CacheService, database: str = "recipes_database",
+                 gap_timeout: float = 30.0):
+        self.data_service = data_service
+        self.pubsub = pubsub
+        self.database = database
+        self.gap_timeout = gap_timeout
+        self._listeners = set()
+        self._gaps = []  # [first missing change_id, last missing change_id, monotonic time first seen]
+        self._lock = threading.Lock()
+        pubsub.subscribe(self.CHANNEL, self._on_message)
+
+    def publish(self, recipe_id: int):
+        self.pubsub.publish(self.CHANNEL, str(recipe_id))
+
+    def _on_message(self, message: str):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Error in change feed listener: {e}")
+
+    def add_listener(self, listener: Callable[[], None]):
+        """
+        Register a callable invoked (from any thread) whenever new changes may be available.
+        """
+        with self._lock:
+            self._listeners.add(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        with self._lock:
+            self._listeners.discard(listener)
+
+    def bounds(self) -> tuple:
+        """
+        :return: (first, last) change_id currently retained, or (None, None).
+        """
+        return self.data_service.get_change_bounds(self.database)
+
+    def pruned_through(self) -> int:
+        """
+        :return: The highest change_id pruned from the outbox, or 0. A consumer whose offset is lower
+            missed changes and must resynchronise.
+        """
+        return self.data_service.get_pruned_change_id(self.database)
+
+    def head(self) -> int:
+        """
+        The offset to start from for only the changes made from now on: the last change_id, or the last
+        one before a gap in the latest changes that a running write may still fill.
+        """
+        first, last = self.bounds()
+        if last is None:
+            return self.pruned_through()
+        start = max(first - 1, last - self.HEAD_SCAN)
+        changes = self.read(start, self.HEAD_SCAN)
+        return changes[-1]["change_id"] if changes else start
+
+    def read(self, after_change_id: int, limit: int = 100) -> list:
+        """
+        Read the changes after an offset in change_id order, up to the first gap that may still be filled
+        (see the class docstring). Fewer than limit changes do not mean that there are no more.
+        """
+        changes = self.data_service.get_changes(self.database, after_change_id, limit)
+        now = time.monotonic()
+        expected = after_change_id + 1
+        for i, change in enumerate(changes):
+            if change["change_id"] > expected and not self._gap_closed(expected, change["change_id"] - 1, now):
+                return changes[:i]
+            expected = change["change_id"] + 1
+        return changes
+
+    def _gap_closed(self, start: int, end: int, now: float) -> bool:
+        """
+        Whether the change_ids start..end, missing from the outbox, will stay missing. They were all
+        handed out before the gap was first seen, so its age bounds how long their writes have run.
+        """
+        with self._lock:
+            for gap in self._gaps:
+                if gap[0] <= start <= gap[1]:
+                    return now - gap[2] >= self.gap_timeout
+            self._gaps.append([start, end, now])
+            if len(self._gaps) > self.MAX_GAPS:
+                self._gaps.pop(0)
+        return self.gap_timeout <= 0
@@ -1,9 +1,16 @@
-from typing import Any, List
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional, Sequence
 from framework.resources.base_resource import BaseResource
+from framework.utils.tracing import traced
 
 from app.models.recipe import Recipe
 from app.services.service_factory import ServiceFactory
 
+# The recipe ids and names written by the unit of work open in this thread/task, if any. Their cache
+# entries are invalidated, and the change feed woken, only once it has committed.
+_unit_of_work_writes: ContextVar[Optional[tuple]] = ContextVar("recipe_unit_of_work_writes", default=None)
+
 
 class RecipeResource(BaseResource):
 
@@ -11,52 +18,218 @@ class RecipeResource(BaseResource):
         super().__init__(config)
 
         self.data_service = ServiceFactory.get_service("RecipeResourceDataService")
+        self.cache = ServiceFactory.get_service("RecipeCache")
+        self.change_feed = ServiceFactory.get_service("RecipeChangeFeed")
+        # None unless write-behind is enabled
+        self.write_buffer = ServiceFactory.get_service("RecipeWriteBuffer")
+        # None unless read batching is enabled
+        self.read_batcher = ServiceFactory.get_service("RecipeReadBatcher")
         self.database = "recipes_database"
         self.recipes = "recipes"
         ##self.key_field = "recipe_id"
 
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Apply the writes made through this resource inside the block atomically, in one transaction on one
+        connection (see MySQLRDBDataService.unit_of_work). Reads inside the block see its writes and bypass
+        the cache; caches are invalidated after the commit. A unit of work inside another one joins it.
+        """
+        if _unit_of_work_writes.get() is not None:
+            yield self
+            return
+        writes = ([], [])
+        token = _unit_of_work_writes.set(writes)
+        try:
+            with self.data_service.unit_of_work():
+                yield self
+        finally:
+            _unit_of_work_writes.reset(token)
+        self._written(*writes)
+
+    def _written(self, recipe_ids: list, names: Sequence[str] = ()):
+        """
+        Invalidate the caches of written recipes and wake the change feed, or leave it to the unit of work.
+        """
+        if not recipe_ids:
+            return
+        writes = _unit_of_work_writes.get()
+        if writes is not None:
+            writes[0].extend(recipe_ids)
+            writes[1].extend(names)
+            return
+        self.cache.invalidate(recipe_ids=recipe_ids, names=names)
+        # One wake-up is enough: change feed streams read everything new from the outbox
+        self.change_feed.publish(recipe_ids[0])
+
+    @traced
     def get_total_count(self) -> int:
-        return self.data_service.get_total_count(self.database, self.recipes)
+        return self.cache.get_count(
+            lambda: self.data_service.get_total_count(self.database, self.recipes)
+        )
 
 
+    @traced
+    def get_stats(self, top_ingredients: int = 10) -> dict:
+        """
+        Catalog statistics from the rollup tables: meal type counts and averages, the calorie histogram
+        and the most used ingredients.
+        """
+        return self.cache.get_stats(top_ingredients, lambda: self.data_service.get_recipe_stats(
+            self.database, top_ingredients=top_ingredients
+        ))
+
+    @traced
     def create_by_key(self, data: dict) -> Recipe:
         d_service = self.data_service
         result = d_service.insert_data(
             self.database, self.recipes, data
         )
+        self._written([result["recipe_id"]], [result["name"]])
         return Recipe(**result)
 
-    def get_by_key(self, key_value: Any, key_field: str) -> Recipe:
+    @staticmethod
+    def _shape(fields: Optional[Sequence[str]], include_ingredients: bool) -> str:
+        # Cache key part for a sparse fieldset; empty for the full representation.
+        if fields is None and include_ingredients:
+            return ""
+        shape = ",".join(sorted(fields)) if fields is not None else "*"
+        return shape + ("+ingredients" if include_ingredients else "")
+
+    @traced
+    def get_by_key(self, key_value: Any, key_field: str, fields: Optional[Sequence[str]] = None,
+                   include_ingredients: bool = True):
+        """
+        Retrieve one recipe. With the default arguments this returns a Recipe. If fields or
+        include_ingredients restrict the result, only those columns are read and a dict is returned.
+        """
         d_service = self.data_service
-        result = d_service.get_data_object(
-            self.database, self.recipes, key_field=key_field, key_value=key_value
-        )
+        shape = self._shape(fields, include_ingredients)
+        in_unit_of_work = _unit_of_work_writes.get() is not None
+        if shape:
+            def load():
+                return d_service.get_data_object(
+                    self.database, self.recipes, key_field=key_field, key_value=key_value,
+                    fields=fields, include_ingredients=include_ingredients
+                )
+            # Uncommitted writes of a unit of work must not be read from or into the cache
+            return load() if in_unit_of_work else self.cache.get_projection(key_field, key_value, shape, load)
+
+        def load():
+            if key_field == "recipe_id" and self.read_batcher is not None and not in_unit_of_work:
+                # Joins the reads by id of concurrent requests into one query
+                return self.read_batcher.load(key_value)
+            return d_service.get_data_object(self.database, self.recipes, key_field=key_field, key_value=key_value)
+        result = load() if in_unit_of_work else self.cache.get_recipe(key_field, key_value, load)
         if result:
             return Recipe(**result)
         else:
             return None
 
-    def update_by_key(self, key_value: Any, key_field: str, data: dict) -> Recipe:
+    @traced
+    def get_by_name(self, name: str, fields: Optional[Sequence[str]] = None, include_ingredients: bool = True):
+        """
+        Retrieve one recipe by name like get_by_key, falling back to a name that only differs in case,
+        accents or whitespace (see normalize_name) when there is no exact match.
+        :return: (recipe or None, exact): exact is False if the recipe was found by its normalized name.
+        """
+        result = self.get_by_key(name, "name", fields=fields, include_ingredients=include_ingredients)
+        if result:
+            return result, True
+        recipe_id = self.data_service.get_recipe_id_by_normalized_name(self.database, self.recipes, name)
+        if recipe_id is None:
+            return None, False
+        return self.get_by_key(recipe_id, "recipe_id", fields=fields, include_ingredients=include_ingredients), False
+
+    @traced
+    def update_by_key(self, key_value: Any, key_field: str, data: dict, expected_version: int = None) -> Recipe:
         d_service = self.data_service
-        d_service.update_data(
-            self.database, self.recipes, data, key_field=key_field, key_value=key_value
+        new_name = data.get("name")
+        recipe_id = d_service.update_data(
+            self.database, self.recipes, data, key_field=key_field, key_value=key_value,
+            expected_version=expected_version
         )
+        names = [key_value] if key_field == "name" else []
+        if new_name:
+            names.append(new_name)
+        self._written([recipe_id], names)
         return self.get_by_key(key_value, key_field)
 
-    def delete_by_key(self, key_value: Any, key_field: str) -> None:
+    @traced
+    def update_deferred(self, recipe_id: int, data: dict) -> None:
+        """
+        Buffer an update of write-behind fields (see WRITE_BEHIND_FIELDS) for a batched write. Repeated
+        updates of a recipe before the flush are coalesced; the last value wins.
+        """
+        self.write_buffer.put(recipe_id, data)
+
+    @traced
+    def apply_buffered_updates(self, updates: dict) -> None:
+        """
+        Flush callback of the write-behind buffer: write the coalesced updates in one transaction.
+        """
+        recipe_ids = self.data_service.update_fields_batch(self.database, self.recipes, updates)
+        self._written(recipe_ids)
+
+    @traced
+    def delete_by_key(self, key_value: Any, key_field: str, expected_version: int = None) -> None:
         d_service = self.data_service
-        d_service.delete_data(
-            self.database, self.recipes, key_field=key_field, key_value=key_value
+        recipe_id = d_service.delete_data(
+            self.database, self.recipes, key_field=key_field, key_value=key_value,
+            expected_version=expected_version
         )
+        self._written([recipe_id], [key_value] if key_field == "name" else [])
 
-    def get_all(self, skip: int = 0, limit: int = 10) -> List[Recipe]:
+    @traced
+    def delete_many(self, recipe_ids: Optional[Sequence[int]] = None, filters: Optional[dict] = None,
+                    progress=None) -> int:
+        """
+        Delete the recipes in recipe_ids and/or matching the {column: value} filters, in chunks that are
+        committed one by one (see MySQLRDBDataService.delete_data_bulk). Caches are invalidated after
+        each chunk.
+        :param progress: Called as progress(recipe_ids, total_deleted) after each chunk.
+        :return: The number of recipes deleted.
+        """
+        def chunk_deleted(deleted_ids, names, total):
+            self._written(deleted_ids, names)
+            if progress is not None:
+                progress(deleted_ids, total)
+
+        return self.data_service.delete_data_bulk(self.database, self.recipes, recipe_ids=recipe_ids,
+                                                  filters=filters, progress=chunk_deleted)
+
+    @traced
+    def get_all(self, skip: int = 0, limit: int = 10, fields: Optional[Sequence[str]] = None,
+                include_ingredients: bool = True, sort: Optional[str] = None, descending: bool = False,
+                after: Optional[tuple] = None) -> List[Recipe]:
         """
         Retrieve all recipes from the database with pagination.
         :param skip: Number of records to skip.
         :param limit: Number of records to retrieve.
-        :return: List of Recipe objects.
+        :param fields: Recipe columns to return; None for all. recipe_id is always returned.
+        :param include_ingredients: Whether to read and return ingredients.
+        :param sort: Column to order by (recipe_id by default), see MySQLRDBDataService.SORT_COLUMNS.
+        :param after: (sort value, recipe_id) of the last recipe of the previous page (keyset pagination).
+        :return: List of Recipe objects, or of dicts with only the requested fields for a sparse fieldset.
         """
-        results = self.data_service.get_all_data(
-            self.database, self.recipes, skip=skip, limit=limit
-        )
+        shape = self._shape(fields, include_ingredients)
+        page_shape = shape
+        if sort or after is not None:
+            page_shape += f":sort={'-' if descending else ''}{sort or 'recipe_id'}:after={after}"
+        results = self.cache.get_page(skip, limit, lambda: self.data_service.get_all_data(
+            self.database, self.recipes, skip=skip, limit=limit,
+            fields=fields, include_ingredients=include_ingredients,
+            sort=sort, descending=descending, after=after
+        ), shape=page_shape)
+        if shape:
+            return results
         return [Recipe(**item) for item in results]
+
+    @traced
+    def get_top_rated(self, limit: int = 5, meal_type: Optional[str] = None) -> dict:
+        """
+        The best rated recipes per meal type, without ingredients: {meal_type: [recipe dicts]}.
+        """
+        return self.cache.get_top_rated(limit, meal_type, lambda: self.data_service.get_top_rated(
+            self.database, self.recipes, limit=limit, meal_types=[meal_type] if meal_type else None
+        ))
@@ -0,0 +1,400 @@
+import heapq
+import math
+import sys
+import threading
+import time
+from array import array
+from itertools import compress
+from typing import Optional
+
+from framework.utils.name_matching import TrigramIndex
+
+# Stored for a NULL calories / time_to_cook. It sorts below every real value, so "at least" filters
+# exclude NULLs without a separate test. A NULL rating is NaN, which fails every comparison.
+NULL_INT = -2 ** 31
+
+# Columns a search can sort by
+SORT_KEYS = ("rating", "calories", "time_to_cook", "name", "recipe_id")
+
+
+class _Columns:
+    """
+    One version of the catalog, column by column. Row i of every column is the same recipe.
+
+    meal_type and ingredient names are dictionary encoded: the columns hold small integer codes into a
+    list of distinct values. A recipe's ingredients are codes[offsets[i]:offsets[i + 1]], and
+    postings[code] lists the rows that use an ingredient. Rows deleted since the load are marked in
+    alive; rows whose ingredients changed keep their new codes in changed_ingredients (the flat arrays
+    cannot be edited in place), and are left out of postings, which only describes the loaded state.
+    name_index maps the trigrams of the names of live rows to their rows.
+    """
+
+    def __init__(self):
+        self.recipe_id = array("i")
+        self.calories = array("i")
+        self.time_to_cook = array("i")
+        self.rating = array("f")
+        self.meal_type = array("H")
+        self.alive = array("b")
+        self.name = []
+        self.name_index = TrigramIndex()
+
+        self.ingredient_offsets = array("I", [0])
+        self.ingredient_codes = array("I")
+        self.postings = {}
+        self.changed_ingredients = {}
+
+        self.meal_types = [None]  # code 0 is "no meal type"
+        self.meal_type_codes = {None: 0}
+        self.ingredients = []
+        self.ingredient_codes_by_name = {}
+
+        self.positions = {}  # recipe_id -> row
+
+    def meal_type_code(self, meal_type: Optional[str]) -> int:
+        # Meal types compare case-insensitively too
+        key = meal_type.casefold() if meal_type is not None else None
+        code = self.meal_type_codes.get(key)
+        if code is None:
+            code = len(self.meal_types)
+            self.meal_types.append(meal_type)
+            self.meal_type_codes[key] = code
+        return code
+
+    def ingredient_code(self, name: str) -> int:
+        # Names compare case-insensitively, like the database collation
+        key = name.casefold()
+        code = self.ingredient_codes_by_name.get(key)
+        if code is None:
+            code = len(self.ingredients)
+            self.ingredients.append(name)
+            self.ingredient_codes_by_name[key] = code
+        return code
+
+    def _set_values(self, row: int, recipe: dict):
+        self.calories[row] = recipe["calories"] if recipe["calories"] is not None else NULL_INT
+        self.time_to_cook[row] = recipe["time_to_cook"] if recipe["time_to_cook"] is not None else NULL_INT
+        self.rating[row] = recipe["rating"] if recipe["rating"] is not None else math.nan
+        self.meal_type[row] = self.meal_type_code(recipe["meal_type"])
+        # Dead rows were taken out of name_index, so a revived row is indexed again even if its name is unchanged
+        indexed = self.name[row] is not None and self.alive[row]
+        if not indexed or self.name[row] != recipe["name"]:
+            if indexed:
+                self.name_index.remove(row, self.name[row])
+            self.name_index.add(row, recipe["name"])
+        self.name[row] = recipe["name"]
+        self.alive[row] = 1
+
+    def append(self, recipe: dict, ingredient_names: list):
+        row = len(self.recipe_id)
+        self.positions[recipe["recipe_id"]] = row
+        self.recipe_id.append(recipe["recipe_id"])
+        for column in (self.calories, self.time_to_cook, self.meal_type, self.alive):
+            column.append(0)
+        self.rating.append(0.0)
+        self.name.append(None)
+        self._set_values(row, recipe)
+
+        for name in ingredient_names:
+            code = self.ingredient_code(name)
+            self.ingredient_codes.append(code)
+            self.postings.setdefault(code, array("I")).append(row)
+        self.ingredient_offsets.append(len(self.ingredient_codes))
+
+    def update(self, row: int, recipe: dict, ingredient_names: list):
+        self._set_values(row, recipe)
+        codes = frozenset(self.ingredient_code(name) for name in ingredient_names)
+        loaded = self.ingredient_codes[self.ingredient_offsets[row]:self.ingredient_offsets[row + 1]]
+        if codes == frozenset(loaded):
+            self.changed_ingredients.pop(row, None)
+        else:
+            self.changed_ingredients[row] = codes
+
+    def row_ingredients(self, row: int):
+        changed = self.changed_ingredients.get(row)
+        if changed is not None:
+            return changed
+        return self.ingredient_codes[self.ingredient_offsets[row]:self.ingredient_offsets[row + 1]]
+
+    def rows_with_ingredient(self, code: int) -> list:
+        changed = self.changed_ingredients
+        rows = [row for row in self.postings.get(code, ()) if row not in changed]
+        rows.extend(row for row, codes in changed.items() if code in codes)
+        rows.sort()
+        return rows
+
+    def nbytes(self) -> int:
+        arrays = (self.recipe_id, self.calories, self.time_to_cook, self.rating, self.meal_type, self.alive,
+                  self.ingredient_offsets, self.ingredient_codes, *self.postings.values())
+        return (sum(a.itemsize * len(a) for a in arrays)
+                + sum(sys.getsizeof(s) for s in self.name)
+                + sum(sys.getsizeof(s) for s in self.ingredients))
+
+
+class RecipeSnapshot:
+    """
+    A compact, column-oriented in-memory copy of the catalog for filtering and ranking across all
+    recipes (GET /recipes/search) without a database query or a Recipe object per row.
+
+    Numeric columns are typed arrays (4 bytes per value), meal types and ingredient names are
+    dictionary encoded, and there is an ingredient -> rows index. Queries run column at a time:
+    each predicate narrows a list of row numbers, and sorting/top-k use heapq over the sort column.
+
+    The snapshot is loaded with keyset-paginated reads, then kept current from the change feed: every
+    refresh_interval seconds, or as soon as a change is announced, changed recipes are re-read by id and
+    patched in place. When the patches pile up (deleted rows, replaced ingredient lists), or the feed
+    no longer has the changes since the last refresh, the snapshot is reloaded and swapped in whole.
+    Results may lag writes by about a refresh.
+    """
+
+    def __init__(self, data_service, change_feed, database: str = "recipes_database",
+                 collection: str = "recipes", refresh_interval: float = 5.0, chunk_size: int = 5000,
+                 max_patched_fraction: float = 0.2):
+        self.data_service = data_service
+        self.change_feed = change_feed
+        self.database = database
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.chunk_size = chunk_size
+        self.max_patched_fraction = max_patched_fraction
+
+        self._columns = None
+        self._offset = 0  # last change_id applied
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.loaded_at = None
+        self.refreshed_at = None
+
+    # -- loading ----------------------------------------------------------------------------------
+
+    def load(self):
+        """
+        Read the whole catalog into a new set of columns and swap it in.
+        """
+        start = time.perf_counter()
+        # Changes committed after this offset may or may not be in the load; refresh re-reads them.
+        offset = self.change_feed.head() if self.change_feed else None
+
+        columns = _Columns()
+        after = 0
+        while True:
+            recipes, ingredients = self.data_service.get_catalog_rows(
+                self.database, self.collection, after_recipe_id=after, limit=self.chunk_size
+            )
+            names = {}
+            for row in ingredients:
+                names.setdefault(row["recipe_id"], []).append(row["ingredient_name"])
+            for recipe in recipes:
+                columns.append(recipe, names.get(recipe["recipe_id"], []))
+            if len(recipes) < self.chunk_size:
+                break
+            after = recipes[-1]["recipe_id"]
+
+        with self._lock:
+            self._columns = columns
+            self._offset = offset or 0
+            self.loaded_at = self.refreshed_at = time.time()
+        print(f"Catalog snapshot loaded: {len(columns.recipe_id)} recipes, {columns.nbytes()} bytes "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def refresh(self):
+        """
+        Apply the changes since the last refresh, or reload when that is cheaper or the only option.
+        """
+        if self._columns is None or self.change_feed is None:
+            self.load()
+            return
+
+        if self._offset < self.change_feed.pruned_through():
+            self.load()  # the changes we need were pruned from the outbox
+            return
+
+        changed, deleted, offset = set(), set(), self._offset
+        while True:
+            changes = self.change_feed.read(offset, 500)
+            for change in changes:
+                offset = change["change_id"]
+                if change["operation"] == "delete":
+                    deleted.add(change["recipe_id"])
+                    changed.discard(change["recipe_id"])
+                else:
+                    changed.add(change["recipe_id"])
+                    deleted.discard(change["recipe_id"])
+            if len(changes) < 500:
+                break
+        if offset == self._offset:
+            self.refreshed_at = time.time()
+            return
+
+        recipes, ingredients = [], []
+        if changed:
+            recipes, ingredients = self.data_service.get_catalog_rows(self.database, self.collection,
+                                                                      recipe_ids=sorted(changed))
+        names = {}
+        for row in ingredients:
+            names.setdefault(row["recipe_id"], []).append(row["ingredient_name"])
+        # A changed recipe that is gone by now was deleted after the change was read
+        deleted |= changed - {recipe["recipe_id"] for recipe in recipes}
+
+        with self._lock:
+            columns = self._columns
+            for recipe in recipes:
+                row = columns.positions.get(recipe["recipe_id"])
+                if row is None:
+                    columns.append(recipe, names.get(recipe["recipe_id"], []))
+                else:
+                    columns.update(row, recipe, names.get(recipe["recipe_id"], []))
+            for recipe_id in deleted:
+                row = columns.positions.get(recipe_id)
+                if row is not None and columns.alive[row]:
+                    columns.alive[row] = 0
+                    columns.name_index.remove(row, columns.name[row])
+            self._offset = offset
+            self.refreshed_at = time.time()
+            rows = len(columns.recipe_id)
+            patched = rows - sum(columns.alive) + len(columns.changed_ingredients)
+
+        if rows and patched > self.max_patched_fraction * rows:
+            self.load()
+
+    def start(self):
+        """
+        Load the snapshot and keep it current in a background thread. Returns at once; the snapshot is
+        not ready until the first load finishes.
+        """
+        if self._thread is not None:
+            return
+        if self.change_feed:
+            self.change_feed.add_listener(self._wake.set)
+        self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.refresh()  # loads the catalog the first time, and after a failed load
+            except Exception as e:
+                print(f"Catalog snapshot refresh failed: {e}")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self.change_feed:
+            self.change_feed.remove_listener(self._wake.set)
+
+    @property
+    def ready(self) -> bool:
+        return self._columns is not None
+
+    # -- queries ----------------------------------------------------------------------------------
+
+    def search(self, meal_type: Optional[str] = None, ingredient: Optional[str] = None,
+               min_calories: Optional[int] = None, max_calories: Optional[int] = None,
+               max_time_to_cook: Optional[int] = None, min_rating: Optional[float] = None,
+               sort: str = "recipe_id", descending: bool = False, skip: int = 0, limit: int = 10) -> tuple:
+        """
+        Filter and rank the catalog. Recipes without a value for the sort column come last.
+        :return: (total, recipes): the number of matches and the requested page of them, as dicts with
+            recipe_id, name, meal_type, calories, time_to_cook, rating and the ingredient names.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort}")
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                raise RuntimeError("Catalog snapshot is not loaded")
+
+            # Each step narrows the candidate rows using one column
+            if ingredient is not None:
+                code = columns.ingredient_codes_by_name.get(ingredient.casefold())
+                if code is None:
+                    return 0, []
+                alive = columns.alive
+                rows = [row for row in columns.rows_with_ingredient(code) if alive[row]]
+            else:
+                rows = compress(range(len(columns.alive)), columns.alive)
+            if meal_type is not None:
+                code = columns.meal_type_codes.get(meal_type.casefold())
+                if code is None:
+                    return 0, []
+                meal_types = columns.meal_type
+                rows = [row for row in rows if meal_types[row] == code]
+            if min_calories is not None:
+                calories = columns.calories
+                rows = [row for row in rows if calories[row] >= min_calories]
+            if max_calories is not None:
+                calories = columns.calories
+                rows = [row for row in rows if NULL_INT < calories[row] <= max_calories]
+            if max_time_to_cook is not None:
+                times = columns.time_to_cook
+                rows = [row for row in rows if NULL_INT < times[row] <= max_time_to_cook]
+            if min_rating is not None:
+                ratings = columns.rating
+                rows = [row for row in rows if ratings[row] >= min_rating]
+            rows = list(rows)
+
+            page = self._rank(columns, rows, sort, descending, skip + limit)[skip:]
+            return len(rows), [self._row(columns, row) for row in page]
+
+    def suggest_names(self, name: str, limit: int = 5, min_similarity: float = 0.3) -> list:
+        """
+        "Did you mean": the recipes whose names are most similar to name (by trigrams, after
+        normalization), most similar first, as dicts with recipe_id, name and similarity (0 to 1).
+        """
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                raise RuntimeError("Catalog snapshot is not loaded")
+            return [{"recipe_id": columns.recipe_id[row], "name": columns.name[row], "similarity": round(score, 3)}
+                    for score, row in columns.name_index.search(name, limit, min_similarity)]
+
+    @staticmethod
+    def _rank(columns: _Columns, rows: list, sort: str, descending: bool, k: int) -> list:
+        column = getattr(columns, sort)
+        if sort == "rating":
+            missing = [row for row in rows if math.isnan(column[row])]
+            present = [row for row in rows if not math.isnan(column[row])]
+        elif sort in ("calories", "time_to_cook"):
+            missing = [row for row in rows if column[row] == NULL_INT]
+            present = [row for row in rows if column[row] != NULL_INT]
+        else:
+            missing, present = [], rows
+
+        key = column.__getitem__
+        if descending:
+            ranked = heapq.nlargest(k, present, key=key)
+        else:
+            ranked = heapq.nsmallest(k, present, key=key)
+        if len(ranked) < k:
+            ranked += missing[:k - len(ranked)]
+        return ranked
+
+    @staticmethod
+    def _row(columns: _Columns, row: int) -> dict:
+        calories, time_to_cook, rating = columns.calories[row], columns.time_to_cook[row], columns.rating[row]
+        return {
+            "recipe_id": columns.recipe_id[row],
+            "name": columns.name[row],
+            "meal_type": columns.meal_types[columns.meal_type[row]],
+            "calories": calories if calories != NULL_INT else None,
+            "time_to_cook": time_to_cook if time_to_cook != NULL_INT else None,
+            # float32 storage: round back to the precision of the FLOAT column
+            "rating": round(rating, 2) if not math.isnan(rating) else None,
+            "ingredients": [columns.ingredients[code] for code in columns.row_ingredients(row)],
+        }
+
+    def stats(self) -> dict:
+        columns = self._columns
+        if columns is None:
+            return {"ready": False}
+        return {
+            "ready": True,
+            "recipes": sum(columns.alive),
+            "bytes": columns.nbytes(),
+            "change_offset": self._offset,
+            "age_seconds": round(time.time() - self.refreshed_at, 1),
+        }
@@ -0,0 +1,93 @@
+# app/routers/changes.py
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.profiling_middleware import ProfiledRoute
+from app.services.service_factory import ServiceFactory
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+
+# Not under the recipes router: a stream stays open indefinitely and must not hold a concurrency-limit slot.
+router = APIRouter(route_class=ProfiledRoute)
+
+BATCH_SIZE = 100
+# How long a stream waits for a wake-up before polling the outbox anyway (and sending a keep-alive).
+POLL_INTERVAL = 5.0
+# Reconnection delay suggested to clients, in milliseconds.
+RETRY_MS = 3000
+
+
+def format_event(change: dict) -> str:
+    data = json.dumps(change, default=str)
+    return f"id: {change['change_id']}\nevent: {change['operation']}\ndata: {data}\n\n"
+
+
+@router.get("/recipes/changes", tags=["recipes"])
+async def recipe_changes(request: Request,
+                         after: Optional[int] = Query(None, ge=0, description="Resume after this change_id; "
+                                                      "0 replays all retained changes"),
+                         last_event_id: Optional[str] = Header(None)):
+    """
+    Stream recipe changes as server-sent events. Each event has the change_id as its id, the operation
+    (create, update or delete) as its type, and the change as JSON data.
+    - **after**: Offset to resume from. Defaults to the latest change, i.e. only new changes are sent.
+    - **Last-Event-ID**: Sent by EventSource clients when they reconnect; takes precedence over after.
+
+    If changes after the requested offset were pruned, a "reset" event is sent first: the consumer
+    missed changes and should resynchronise from GET /recipes.
+
+    A change is sent once every change with a lower change_id has committed (or rolled back), so offsets
+    never skip one; a change can be delayed by a slower write that started before it.
+    """
+    if last_event_id:
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid Last-Event-ID {last_event_id}")
+
+    feed = ServiceFactory.get_service("RecipeChangeFeed")
+    pruned = await run_in_threadpool(feed.pruned_through)
+    offset = after if after is not None else await run_in_threadpool(feed.head)
+
+    async def stream():
+        nonlocal offset
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def listener():
+            loop.call_soon_threadsafe(wake.set)
+
+        feed.add_listener(listener)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if offset < pruned:
+                yield f"event: reset\ndata: {json.dumps({'first_change_id': pruned + 1})}\n\n"
+                offset = pruned
+
+            while not await request.is_disconnected():
+                # Clear before reading, so a wake-up during the read is not lost
+                wake.clear()
+                # Stops before changes that may still be preceded by an uncommitted one; the write
+                # publishes a wake-up when it commits
+                changes = await run_in_threadpool(feed.read, offset, BATCH_SIZE)
+                for change in changes:
+                    offset = change["change_id"]
+                    yield format_event(change)
+                if len(changes) == BATCH_SIZE:
+                    continue
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        except ServiceUnavailableException as e:
+            # End the stream; the client reconnects with Last-Event-ID after RETRY_MS.
+            print(f"Change stream ended: {e}")
+        finally:
+            feed.remove_listener(listener)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,96 @@
+# app/routers/health.py
+import os
+import time
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+from app import warmup
+from app.dependencies import concurrency_limiter
+from app.profiling_middleware import ProfiledRoute, profile_store, profile_token_valid
+from app.services.service_factory import ServiceFactory
+
+router = APIRouter(route_class=ProfiledRoute)
+
+started_at = time.time()
+
+
+@router.get("/health/live", tags=["health"])
+async def liveness():
+    """
+    Liveness: the worker process is running and its event loop is responsive.
+    """
+    return {"status": "alive", "pid": os.getpid(), "uptime_seconds": round(time.time() - started_at, 1)}
+
+
+@router.get("/health/ready", tags=["health"])
+def readiness():
+    """
+    Readiness: warmup has finished and this worker's connection pool can reach the database.
+    """
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    body = {"pid": os.getpid(), "warmup_seconds": warmup.state["warmup_seconds"]}
+
+    if not warmup.state["ready"]:
+        body.update(status="warming_up", pool=data_service.pool.stats())
+        return JSONResponse(status_code=503, content=body)
+
+    try:
+        data_service.pool.health_check()
+    except Exception as e:
+        body.update(status="unavailable", error=str(e), pool=data_service.pool.stats())
+        return JSONResponse(status_code=503, content=body)
+
+    body.update(status="ready", pool=data_service.pool.stats(),
+                circuit_breaker=data_service.circuit_breaker.stats(), concurrency=concurrency_limiter.stats())
+    snapshot = ServiceFactory.get_service("RecipeSnapshot")
+    if snapshot is not None:
+        body["catalog_snapshot"] = snapshot.stats()
+    read_batcher = ServiceFactory.get_service("RecipeReadBatcher")
+    if read_batcher is not None:
+        body["read_batcher"] = read_batcher.stats()
+    nutrition = ServiceFactory.get_service("NutritionClient")
+    if nutrition is not None:
+        body["nutrition"] = nutrition.stats()
+    return body
+
+
+@router.get("/_ah/warmup", include_in_schema=False)
+def app_engine_warmup():
+    """
+    App Engine sends a warmup request to new instances when inbound_services includes warmup.
+    """
+    if not warmup.state["ready"]:
+        warmup.run()
+    return {"status": "warm"}
+
+
+def _check_profile_token(token: Optional[str]):
+    # 404 rather than 401/403, so the endpoints do not reveal that profiling exists
+    if not profile_token_valid(token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/debug/profiles", include_in_schema=False)
+def recent_profiles(limit: int = Query(20, ge=1, le=200),
+                    x_profile_token: Optional[str] = Header(None)):
+    """
+    The latest request profiles of this worker, newest first. Requires the PROFILE_TOKEN.
+    """
+    _check_profile_token(x_profile_token)
+    return {"pid": os.getpid(), "profiles": profile_store.recent(limit)}
+
+
+@router.get("/debug/profiles/{correlation_id}", include_in_schema=False)
+def request_profile(correlation_id: str, x_profile_token: Optional[str] = Header(None)):
+    """
+    The profile of one request, by its X-Correlation-ID. Profiles are kept by the worker that served the
+    request, so another worker answers 404.
+    """
+    _check_profile_token(x_profile_token)
+    profile = profile_store.get(correlation_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile for correlation id {correlation_id}")
+    return profile
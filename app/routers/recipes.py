@@ -1,18 +1,177 @@
 # app/routers/recipes.py
-from fastapi import APIRouter, HTTPException, Query, Request
-from app.models.recipe import Recipe, PaginatedResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.dependencies import limit_concurrency
+from app.models.recipe import Recipe, RecipeOperation, RecipePatch, RecipeTransaction, PaginatedResponse
+from app.profiling_middleware import ProfiledRoute
+from app.resources.recipe_cache import served_stale_age
 from app.resources.recipe_resource import RecipeResource
+from app.resources.recipe_snapshot import SORT_KEYS
 from app.services.service_factory import ServiceFactory
-from typing import List, Optional
+from framework.services.data_access.BaseDataService import (
+    ConstraintViolationException, NotFoundException, ServiceUnavailableException, UnitOfWorkAbortedException,
+    VersionConflictException
+)
+from framework.utils.idempotency import IdempotencyKeyInProgressException, IdempotencyKeyReusedException
+from framework.utils.tracing import tracer
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
+import anyio
+import base64
+import hashlib
+import json
 
-router = APIRouter()
+# Handlers are plain functions: FastAPI runs them in its threadpool, so blocking database calls
+# do not stall the event loop.
+router = APIRouter(dependencies=[Depends(limit_concurrency)], route_class=ProfiledRoute)
 
-@router.post("/recipes", tags=["recipes"], status_code=201, response_model=Recipe)
-async def create_recipe(recipe: Recipe, request: Request) -> Recipe:
+
+def make_etag(version: Optional[int]) -> Optional[str]:
     """
-    Create a new recipe.
-    - **recipe**: Recipe object to be created.
+    The ETag of a recipe is its version column, as a strong entity tag.
+    """
+    if version is None:
+        return None
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Convert an If-Match header into the version the write must match.
+    Returns None when there is no precondition ("*" only requires that the recipe exists).
+    An entity tag that can never match one of ours fails the precondition.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail=f"If-Match {if_match} does not match the current version")
+
+
+# Fields a client can select with ?fields=
+SPARSE_FIELDS = ("recipe_id", "name", "ingredients", "steps", "time_to_cook", "meal_type", "calories", "rating",
+                 "version")
+EXPANSIONS = ("ingredients", "nutrition")
+
+FIELDS_QUERY = Query(None, description="Comma-separated fields to return, e.g. name,rating. "
+                                       "recipe_id is always included.")
+EXPAND_QUERY = Query(None, description="Related data to include: ingredients (with a sparse fieldset), "
+                                       "nutrition (from the nutrition service)")
+
+
+def parse_fieldset(fields: Optional[str], expand: Optional[str]) -> Tuple[Optional[List[str]], bool]:
+    """
+    Convert the fields and expand query parameters into (columns, include_ingredients).
+    Without fields the full recipe is returned, so expand=ingredients only matters together with fields.
+    """
+    expansions = [e.strip() for e in expand.split(",") if e.strip()] if expand else []
+    unknown = [e for e in expansions if e not in EXPANSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand value(s): {', '.join(unknown)}")
+    if fields is None:
+        return None, True
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SPARSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. "
+                                                    f"Available: {', '.join(SPARSE_FIELDS)}")
+    include_ingredients = "ingredients" in requested or "ingredients" in expansions
+    return [f for f in requested if f != "ingredients"], include_ingredients
+
+
+def expands_nutrition(expand: Optional[str]) -> bool:
+    """
+    Whether expand asks for nutrition facts. Fails with 501 if no nutrition service is configured.
+    """
+    if not expand or "nutrition" not in [e.strip() for e in expand.split(",")]:
+        return False
+    if ServiceFactory.get_service("NutritionClient") is None:
+        raise HTTPException(status_code=501, detail="Nutrition data is not enabled")
+    return True
+
+
+def add_nutrition(recipes: List[dict]):
+    """
+    Add the nutrition facts of each recipe under "nutrition", so clients get them in the same response.
+    A recipe gets None if the nutrition service has no data for it or did not answer in time.
+    """
+    client = ServiceFactory.get_service("NutritionClient")
+    # Handlers run in the threadpool; the lookups run concurrently on the event loop, which owns the
+    # client's connection pool. The traceparent is read here, where the request's span is current.
+    nutrition = anyio.from_thread.run(client.get_many, [recipe["recipe_id"] for recipe in recipes],
+                                      tracer.inject({}))
+    for recipe in recipes:
+        recipe["nutrition"] = nutrition.get(recipe["recipe_id"])
+
+
+def parse_sort(sort: Optional[str]) -> Tuple[Optional[str], bool]:
+    """
+    Convert a sort query parameter ("rating", "-rating" for descending) into (column, descending).
+    """
+    if sort is None:
+        return None, False
+    column = sort.lstrip("-")
+    if column not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort {sort}. Available: {', '.join(SORT_KEYS)}")
+    return column, sort.startswith("-")
+
+
+def encode_cursor(sort: str, descending: bool, recipe: dict) -> str:
     """
+    An opaque keyset cursor: the sort order and the (sort value, recipe_id) of the last recipe of a page.
+    """
+    data = [sort, descending, recipe[sort], recipe["recipe_id"]]
+    return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> tuple:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_sort, cursor_descending, value, recipe_id = data
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise HTTPException(status_code=400, detail="The cursor belongs to a different sort order")
+    return value, recipe_id
+
+
+def sparse_response(data: dict, response: Response) -> JSONResponse:
+    """
+    A sparse or expanded recipe does not validate as a Recipe, so it is returned as JSON directly,
+    keeping the headers set on response.
+    """
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return JSONResponse(content=jsonable_encoder(data), headers=headers)
+
+
+def mark_stale(response: Response):
+    """
+    Mark a response built from cached data that is past its freshness lifetime, e.g. during a database
+    outage. Age is the age of the oldest stale value used.
+    """
+    age = served_stale_age()
+    if age is not None:
+        response.headers["Age"] = str(int(age))
+        response.headers["X-Cache-Status"] = "stale"
+
+
+# Idempotent scalar fields whose updates may be buffered and written in batches (write-behind)
+WRITE_BEHIND_FIELDS = ("rating",)
+
+
+def version_conflict(e: VersionConflictException) -> HTTPException:
+    headers = {}
+    if e.current_version is not None:
+        headers["ETag"] = make_etag(e.current_version)
+    return HTTPException(status_code=412, detail=str(e), headers=headers)
+
+def insert_recipe(recipe: Recipe) -> Recipe:
     res = ServiceFactory.get_service("RecipeResource")
     try:
         new_recipe = res.create_by_key(recipe.dict())
@@ -26,142 +185,521 @@ async def create_recipe(recipe: Recipe, request: Request) -> Recipe:
         }
 
         return Recipe(**recipe_data)
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create recipe: {e}")
 
+# Longest Idempotency-Key accepted
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+@router.post("/recipes", tags=["recipes"], status_code=201, response_model=Recipe)
+def create_recipe(recipe: Recipe, request: Request, idempotency_key: Optional[str] = Header(None)):
+    """
+    Create a new recipe.
+    - **recipe**: Recipe object to be created.
+    - **Idempotency-Key**: Optional unique key (e.g. a UUID) for this creation. Retries with the same key
+      get the first response, with Idempotent-Replayed: true, instead of creating the recipe again (for
+      IDEMPOTENCY_TTL seconds). A retry sent while the first request is still running waits for it.
+      Reusing a key with a different recipe fails with 422.
+    """
+    if idempotency_key is None:
+        return insert_recipe(recipe)
+    if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+
+    store = ServiceFactory.get_service("IdempotencyStore")
+    fingerprint = hashlib.sha256(json.dumps(jsonable_encoder(recipe), sort_keys=True).encode()).hexdigest()
+    try:
+        content, replayed = store.run(f"POST /recipes:{idempotency_key}", fingerprint,
+                                      lambda: jsonable_encoder(insert_recipe(recipe)))
+    except IdempotencyKeyReusedException as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInProgressException as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    return JSONResponse(status_code=201, content=content,
+                        headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+# A ?fuzzy=true lookup only resolves to the most similar name if it is at least this similar (0 to 1)
+FUZZY_MATCH_MIN_SIMILARITY = 0.5
+
+
+def suggest_names(name: str) -> Optional[list]:
+    """
+    "Did you mean" suggestions for a name, from the catalog snapshot's trigram index, or None when the
+    snapshot is not enabled or not loaded yet.
+    """
+    snapshot = ServiceFactory.get_service("RecipeSnapshot")
+    if snapshot is None or not snapshot.ready:
+        return None
+    return [dict(suggestion, links={"self": {"href": f"/recipes/id/{suggestion['recipe_id']}"}})
+            for suggestion in snapshot.suggest_names(name)]
+
+
 @router.get("/recipes/name/{name}", tags=["recipes"], response_model=Recipe)
-async def get_recipe_by_name(name: str, request: Request) -> Recipe:
+def get_recipe_by_name(name: str, request: Request, response: Response,
+                       fields: Optional[str] = FIELDS_QUERY, expand: Optional[str] = EXPAND_QUERY,
+                       fuzzy: bool = Query(False, description="Return the most similar name if none matches")) -> Recipe:
     """
-    Retrieve a recipe by its name.
+    Retrieve a recipe by its name. A name that only differs in case, accents or whitespace matches too;
+    the response then has a Content-Location header with the recipe's id URL.
     - **name**: The name of the recipe.
+    - **fields**: Optional comma-separated fields to return (sparse fieldset).
+    - **expand**: Optional "ingredients" to include ingredients with a sparse fieldset, "nutrition" to
+      include nutrition facts.
+    - **fuzzy**: If no name matches, return the recipe with the most similar name instead of 404.
+
+    With the catalog snapshot enabled, a 404 lists the most similar names under did_you_mean.
     """
+    columns, include_ingredients = parse_fieldset(fields, expand)
+    nutrition = expands_nutrition(expand)
     res = ServiceFactory.get_service("RecipeResource")
-    result = res.get_by_key(key_value=name, key_field="name")
+    result, exact = res.get_by_name(name, fields=columns, include_ingredients=include_ingredients)
 
     if not result:
-        raise HTTPException(status_code=404, detail="Recipe not found")
+        suggestions = suggest_names(name)
+        if fuzzy and suggestions and suggestions[0]["similarity"] >= FUZZY_MATCH_MIN_SIMILARITY:
+            result = res.get_by_key(key_value=suggestions[0]["recipe_id"], key_field="recipe_id", fields=columns,
+                                    include_ingredients=include_ingredients)
+        if not result:
+            content = {"detail": "Recipe not found"}
+            if suggestions is not None:
+                content["did_you_mean"] = suggestions
+            return JSONResponse(status_code=404, content=content)
 
-    recipe_data = result.dict()
-    recipe_data["links"] = {
-        "self": {"href": f"/recipes/name/{name}"},
-        "update": {"href": f"/recipes/name/{name}", "method": "PUT"},
-        "delete": {"href": f"/recipes/name/{name}", "method": "DELETE"}
-    }
+    recipe_data = result.dict() if isinstance(result, Recipe) else dict(result)
+    if exact:
+        recipe_data["links"] = {
+            "self": {"href": f"/recipes/name/{name}"},
+            "update": {"href": f"/recipes/name/{name}", "method": "PUT"},
+            "delete": {"href": f"/recipes/name/{name}", "method": "DELETE"}
+        }
+    else:
+        # Writes by name only take the exact name, so link to the recipe by id
+        href = f"/recipes/id/{recipe_data['recipe_id']}"
+        recipe_data["links"] = {
+            "self": {"href": href},
+            "update": {"href": href, "method": "PUT"},
+            "delete": {"href": href, "method": "DELETE"}
+        }
+        response.headers["Content-Location"] = href
+    if recipe_data.get("version") is not None:
+        response.headers["ETag"] = make_etag(recipe_data["version"])
+    mark_stale(response)
 
+    if nutrition:
+        add_nutrition([recipe_data])
+    if nutrition or not isinstance(result, Recipe):
+        return sparse_response(recipe_data, response)
     return Recipe(**recipe_data)
 
 @router.get("/recipes/id/{recipe_id}", tags=["recipes"], response_model=Recipe)
-async def get_recipe_by_id(recipe_id: int, request: Request) -> Recipe:
+def get_recipe_by_id(recipe_id: int, request: Request, response: Response,
+                     fields: Optional[str] = FIELDS_QUERY, expand: Optional[str] = EXPAND_QUERY) -> Recipe:
     """
     Retrieve a recipe by its ID.
     - **recipe_id**: The ID of the recipe.
+    - **fields**: Optional comma-separated fields to return (sparse fieldset).
+    - **expand**: Optional "ingredients" to include ingredients with a sparse fieldset, "nutrition" to
+      include nutrition facts.
     """
+    columns, include_ingredients = parse_fieldset(fields, expand)
+    nutrition = expands_nutrition(expand)
     res = ServiceFactory.get_service("RecipeResource")
-    result = res.get_by_key(key_value=recipe_id, key_field="recipe_id")
+    result = res.get_by_key(key_value=recipe_id, key_field="recipe_id", fields=columns,
+                            include_ingredients=include_ingredients)
 
     if not result:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
-    recipe_data = result.dict()
+    recipe_data = result.dict() if isinstance(result, Recipe) else dict(result)
     recipe_data["links"] = {
         "self": {"href": f"/recipes/id/{recipe_id}"},
         "update": {"href": f"/recipes/id/{recipe_id}", "method": "PUT"},
         "delete": {"href": f"/recipes/id/{recipe_id}", "method": "DELETE"}
     }
+    if recipe_data.get("version") is not None:
+        response.headers["ETag"] = make_etag(recipe_data["version"])
+    mark_stale(response)
+    if nutrition:
+        add_nutrition([recipe_data])
+    if nutrition or not isinstance(result, Recipe):
+        return sparse_response(recipe_data, response)
     return Recipe(**recipe_data)
 
 @router.put("/recipes/id/{recipe_id}", tags=["recipes"], response_model=Recipe)
-async def update_recipe_by_id(recipe_id: int, recipe: Recipe, request: Request) -> Recipe:
+def update_recipe_by_id(recipe_id: int, recipe: Recipe, request: Request, response: Response,
+                              if_match: Optional[str] = Header(None)) -> Recipe:
     """
     Update a recipe by its ID.
     - **recipe_id**: The ID of the recipe to update.
     - **recipe**: Recipe object containing the updated data.
+    - **If-Match**: Optional ETag from a previous read. The update fails with 412 if the recipe changed since.
     """
     print("update by id")
+    expected_version = parse_if_match(if_match)
     res = ServiceFactory.get_service("RecipeResource")
     update_data = recipe.dict(exclude_unset=True)
-    result = res.update_by_key(key_value=recipe_id, key_field="recipe_id", data=update_data)
+    try:
+        result = res.update_by_key(key_value=recipe_id, key_field="recipe_id", data=update_data,
+                                   expected_version=expected_version)
+    except VersionConflictException as e:
+        raise version_conflict(e)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     print("result: ", result)
     result_data = result.dict()
+    if result.version is not None:
+        response.headers["ETag"] = make_etag(result.version)
     return Recipe(**result_data)
 
+@router.patch("/recipes/id/{recipe_id}", tags=["recipes"], response_model=Recipe,
+              responses={202: {"description": "Update accepted and buffered for a batched write"}})
+def patch_recipe_by_id(recipe_id: int, patch: RecipePatch, request: Request, response: Response,
+                       if_match: Optional[str] = Header(None)):
+    """
+    Update some fields of a recipe by its ID.
+    - **recipe_id**: The ID of the recipe to update.
+    - **patch**: The fields to change.
+    - **If-Match**: Optional ETag from a previous read. The update fails with 412 if the recipe changed since.
+
+    When write-behind is enabled, a patch of only rating without If-Match is buffered and answered with
+    202 Accepted: it is written within about a second, coalesced with other updates of the recipe (the
+    last one wins). It is not checked that the recipe exists. Any other patch is applied immediately.
+    """
+    update_data = patch.dict(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    res = ServiceFactory.get_service("RecipeResource")
+
+    if res.write_buffer is not None and if_match is None and set(update_data) <= set(WRITE_BEHIND_FIELDS):
+        res.update_deferred(recipe_id, update_data)
+        return JSONResponse(status_code=202, content={"recipe_id": recipe_id, "pending": update_data})
+
+    expected_version = parse_if_match(if_match)
+    try:
+        result = res.update_by_key(key_value=recipe_id, key_field="recipe_id", data=update_data,
+                                   expected_version=expected_version)
+    except VersionConflictException as e:
+        raise version_conflict(e)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    if result.version is not None:
+        response.headers["ETag"] = make_etag(result.version)
+    return result
+
 @router.put("/recipes/name/{name}", tags=["recipes"], response_model=Recipe)
-async def update_recipe_by_name(name: str, recipe: Recipe, request: Request) -> Recipe:
+def update_recipe_by_name(name: str, recipe: Recipe, request: Request, response: Response,
+                                if_match: Optional[str] = Header(None)) -> Recipe:
     """
     Update a recipe by its name.
     - **name**: The name of the recipe to update.
     - **recipe**: Recipe object containing the updated data.
+    - **If-Match**: Optional ETag from a previous read. The update fails with 412 if the recipe changed since.
     """
+    expected_version = parse_if_match(if_match)
     res = ServiceFactory.get_service("RecipeResource")
     update_data = recipe.dict(exclude_unset=True)
-    result = res.update_by_key(key_value=name, key_field="name", data=update_data)
+    try:
+        result = res.update_by_key(key_value=name, key_field="name", data=update_data,
+                                   expected_version=expected_version)
+    except VersionConflictException as e:
+        raise version_conflict(e)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     result_data = result.dict()
+    if result.version is not None:
+        response.headers["ETag"] = make_etag(result.version)
     return Recipe(**result_data)
 
 @router.delete("/recipes/id/{recipe_id}", tags=["recipes"])
-async def delete_recipe_by_id(recipe_id: int, request: Request):
+def delete_recipe_by_id(recipe_id: int, request: Request, if_match: Optional[str] = Header(None)):
     """
     Delete a recipe by its ID.
     - **recipe_id**: The ID of the recipe to delete.
+    - **If-Match**: Optional ETag from a previous read. The delete fails with 412 if the recipe changed since.
     """
+    expected_version = parse_if_match(if_match)
     res = ServiceFactory.get_service("RecipeResource")
-    res.delete_by_key(key_value=recipe_id, key_field="recipe_id")
+    try:
+        res.delete_by_key(key_value=recipe_id, key_field="recipe_id", expected_version=expected_version)
+    except VersionConflictException as e:
+        raise version_conflict(e)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     return {"message": f"Recipe with id {recipe_id} has been deleted"}
 
 @router.delete("/recipes/name/{name}", tags=["recipes"])
-async def delete_recipe_by_name(name: str, request: Request):
+def delete_recipe_by_name(name: str, request: Request, if_match: Optional[str] = Header(None)):
     """
     Delete a recipe by its name.
     - **name**: The name of the recipe to delete.
+    - **If-Match**: Optional ETag from a previous read. The delete fails with 412 if the recipe changed since.
     """
+    expected_version = parse_if_match(if_match)
     res = ServiceFactory.get_service("RecipeResource")
-    res.delete_by_key(key_value=name, key_field="name")
+    try:
+        res.delete_by_key(key_value=name, key_field="name", expected_version=expected_version)
+    except VersionConflictException as e:
+        raise version_conflict(e)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     return {"message": f"Recipe with name {name} has been deleted"}
 
+# Maximum ids per bulk delete request; use a filter for more.
+MAX_BULK_DELETE_IDS = 1000
+
+
+def parse_ids(ids: Optional[str]) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids is empty")
+    if len(parsed) > MAX_BULK_DELETE_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_DELETE_IDS} ids per request")
+    return parsed
+
+
+@router.delete("/recipes", tags=["recipes"])
+def delete_recipes(ids: Optional[str] = Query(None, description="Comma-separated recipe ids, e.g. 1,2,3"),
+                   meal_type: Optional[str] = Query(None, description="Only recipes of this meal type")):
+    """
+    Delete many recipes at once: those in ids, all of a meal type, or those in ids of that meal type.
+    Recipes are deleted in chunks, each committed on its own, so a failed request may have deleted some.
+    - **ids**: Up to 1000 recipe ids; ids that do not exist are ignored.
+    - **meal_type**: Delete (only) recipes of this meal type.
+    """
+    recipe_ids = parse_ids(ids)
+    if recipe_ids is None and meal_type is None:
+        raise HTTPException(status_code=400, detail="Give ids and/or meal_type")
+    res = ServiceFactory.get_service("RecipeResource")
+    deleted = res.delete_many(recipe_ids=recipe_ids, filters={"meal_type": meal_type} if meal_type else None)
+    return {"deleted": deleted}
+
+def check_operation(operation: RecipeOperation) -> Optional[str]:
+    """
+    :return: What is missing from or superfluous in a transaction operation, or None if it is well-formed.
+    """
+    if operation.op == "create":
+        if operation.recipe is None or operation.recipe_id is not None or operation.changes is not None:
+            return "create takes recipe only"
+    elif operation.recipe_id is None or operation.recipe is not None:
+        return f"{operation.op} takes recipe_id" + (" and changes" if operation.op == "update" else "")
+    elif operation.op == "update" and not (operation.changes and operation.changes.dict(exclude_unset=True)):
+        return "update needs changes"
+    elif operation.op == "delete" and operation.changes is not None:
+        return "delete takes recipe_id only"
+    return None
+
+
+def apply_operation(res: RecipeResource, operation: RecipeOperation) -> dict:
+    if operation.op == "create":
+        recipe = res.create_by_key(operation.recipe.dict())
+        recipe_id, version = recipe.recipe_id, recipe.version
+    elif operation.op == "update":
+        recipe = res.update_by_key(key_value=operation.recipe_id, key_field="recipe_id",
+                                   data=operation.changes.dict(exclude_unset=True),
+                                   expected_version=operation.expected_version)
+        recipe_id, version = recipe.recipe_id, recipe.version
+    else:
+        res.delete_by_key(key_value=operation.recipe_id, key_field="recipe_id",
+                          expected_version=operation.expected_version)
+        return {"op": "delete", "recipe_id": operation.recipe_id}
+    return {"op": operation.op, "recipe_id": recipe_id, "version": version,
+            "links": {"self": {"href": f"/recipes/id/{recipe_id}"}}}
+
+
+@router.post("/recipes/transactions", tags=["recipes"])
+def apply_recipe_transaction(transaction: RecipeTransaction, request: Request):
+    """
+    Apply a list of create/update/delete operations atomically: in order, in one database transaction.
+    Either all of them are applied or none is. When one fails, the error detail gives its index:
+    404 if its recipe does not exist, 412 if its expected_version is stale (with the current version
+    as ETag), 409 if it conflicts with another recipe (e.g. a duplicate name) or failed in the database.
+    - **operations**: Up to 100 operations, see RecipeOperation.
+    """
+    for index, operation in enumerate(transaction.operations):
+        problem = check_operation(operation)
+        if problem:
+            raise HTTPException(status_code=400, detail={"operation": index, "detail": problem})
+
+    res = ServiceFactory.get_service("RecipeResource")
+    results = []
+    index = 0
+    try:
+        with res.unit_of_work():
+            for index, operation in enumerate(transaction.operations):
+                results.append(apply_operation(res, operation))
+                # An error handled inside the operation still dooms the transaction: stop at it
+                if res.data_service.unit_of_work_aborted():
+                    raise UnitOfWorkAbortedException("The operation failed; the transaction was rolled back")
+    except VersionConflictException as e:
+        error = version_conflict(e)
+        raise HTTPException(status_code=error.status_code, detail={"operation": index, "detail": str(e)},
+                            headers=error.headers)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail={"operation": index, "detail": "Recipe not found"})
+    except (ConstraintViolationException, UnitOfWorkAbortedException) as e:
+        raise HTTPException(status_code=409, detail={"operation": index, "detail": str(e)})
+    return {"results": results}
+
+@router.get("/recipes/search", tags=["recipes"])
+def search_recipes(meal_type: Optional[str] = None,
+                   ingredient: Optional[str] = Query(None, description="Only recipes using this ingredient"),
+                   min_calories: Optional[int] = None, max_calories: Optional[int] = None,
+                   max_time_to_cook: Optional[int] = None,
+                   min_rating: Optional[float] = None,
+                   sort: str = Query("recipe_id", description="Sort column, prefixed with - for descending: "
+                                                              "rating, calories, time_to_cook, name, recipe_id"),
+                   skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
+    """
+    Filter and rank the whole catalog, e.g. ?meal_type=dinner&max_time_to_cook=30&sort=-rating&limit=5.
+    Served from the in-memory catalog snapshot (CATALOG_SNAPSHOT=1), which follows writes within a few
+    seconds.
+    """
+    snapshot = ServiceFactory.get_service("RecipeSnapshot")
+    if snapshot is None:
+        raise HTTPException(status_code=501, detail="Catalog search is not enabled")
+    if not snapshot.ready:
+        raise ServiceUnavailableException("The catalog snapshot is loading", retry_after=5)
+
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-")
+    if sort_key not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort {sort}. Available: {', '.join(SORT_KEYS)}")
+
+    total, items = snapshot.search(meal_type=meal_type, ingredient=ingredient,
+                                   min_calories=min_calories, max_calories=max_calories,
+                                   max_time_to_cook=max_time_to_cook, min_rating=min_rating,
+                                   sort=sort_key, descending=descending, skip=skip, limit=limit)
+    for item in items:
+        item["links"] = {"self": {"href": f"/recipes/id/{item['recipe_id']}"}}
+    return {"total": total, "items": items}
+
+@router.get("/recipes/top", tags=["recipes"])
+def get_top_rated_recipes(response: Response,
+                          limit: int = Query(5, ge=1, le=50, description="Recipes per meal type"),
+                          meal_type: Optional[str] = Query(None, description="Only this meal type")):
+    """
+    The highest rated recipes of every meal type (or of one), best first, without ingredients.
+    """
+    res = ServiceFactory.get_service("RecipeResource")
+    top = res.get_top_rated(limit=limit, meal_type=meal_type)
+    mark_stale(response)
+    return {
+        "meal_types": {
+            meal_type: [dict(recipe, links={"self": {"href": f"/recipes/id/{recipe['recipe_id']}"}})
+                        for recipe in recipes]
+            for meal_type, recipes in top.items()
+        }
+    }
+
+@router.get("/recipes/stats", tags=["recipes"])
+def get_recipe_stats(response: Response,
+                     top_ingredients: int = Query(10, ge=1, le=100, description="Number of top ingredients")):
+    """
+    Catalog statistics for dashboards, read from rollups maintained on every write:
+    - **meal_types**: recipe count, average rating and average calories per meal type.
+    - **calories**: histogram of recipes per 100 kcal bucket.
+    - **top_ingredients**: the most used ingredients and the number of recipes using each.
+    """
+    res = ServiceFactory.get_service("RecipeResource")
+    stats = res.get_stats(top_ingredients=top_ingredients)
+    mark_stale(response)
+    return stats
+
 @router.get("/recipes", tags=["recipes"], response_model=PaginatedResponse)
-async def get_all_recipes(
+def get_all_recipes(
         request: Request,
+        response: Response,
         skip: int = Query(0, ge=0, description="Number of records to skip"),
-        limit: int = Query(10, ge=1, le=100, description="Number of records to retrieve")
+        limit: int = Query(10, ge=1, le=100, description="Number of records to retrieve"),
+        fields: Optional[str] = FIELDS_QUERY,
+        expand: Optional[str] = EXPAND_QUERY,
+        sort: Optional[str] = Query(None, description="Sort column, prefixed with - for descending: "
+                                                      "rating, calories, time_to_cook, name, recipe_id"),
+        cursor: Optional[str] = Query(None, description="Keyset cursor from a previous page's next link")
 ) -> PaginatedResponse:
     """
-    Retrieve all recipes with pagination.
+    Retrieve all recipes with pagination, in recipe_id order unless sorted.
     - **skip**: The number of records to skip.
     - **limit**: The maximum number of records to retrieve.
+    - **fields**: Optional comma-separated fields to return (sparse fieldset), e.g. name,rating.
+    - **expand**: Optional "ingredients" to include ingredients with a sparse fieldset, "nutrition" to
+      include nutrition facts, looked up for all recipes of the page concurrently.
+    - **sort**: Optional sort order, e.g. -rating. Ties are ordered by recipe_id. Recipes without a value
+      come first ascending and last descending. A sparse fieldset always includes the sort column.
+    - **cursor**: Continue after the page the cursor came from. With sort or cursor, the next link
+      carries a cursor instead of skip: every page costs the same however deep it is, and pages do not
+      shift when recipes are added or removed.
     """
+    columns, include_ingredients = parse_fieldset(fields, expand)
+    nutrition = expands_nutrition(expand)
+    sort_column, descending = parse_sort(sort)
+    keyset = sort is not None or cursor is not None
+    after = None
+    if cursor is not None:
+        if skip:
+            raise HTTPException(status_code=400, detail="Use either skip or cursor")
+        after = decode_cursor(cursor, sort_column or "recipe_id", descending)
     res: RecipeResource = ServiceFactory.get_service("RecipeResource")
-    recipes = res.get_all(skip=skip, limit=limit)
+    recipes = res.get_all(skip=skip, limit=limit, fields=columns, include_ingredients=include_ingredients,
+                          sort=sort_column, descending=descending, after=after)
     total_count = res.get_total_count()
+    mark_stale(response)
 
     base_url = str(request.url).split('?')[0]
+    # Keep the fieldset and sort order in the pagination links
+    list_query = urlencode({k: v for k, v in (("fields", fields), ("expand", expand), ("sort", sort))
+                            if v is not None})
+    link_prefix = f"{base_url}?{list_query}&" if list_query else f"{base_url}?"
 
-    current_query = f"skip={skip}&limit={limit}"
-    current_url = f"{base_url}?{current_query}"
+    if keyset:
+        current_query = f"cursor={cursor}&limit={limit}" if cursor else f"skip={skip}&limit={limit}"
+        links = {
+            "current": {"href": f"{link_prefix}{current_query}"},
+            "first": {"href": f"{link_prefix}limit={limit}"},
+        }
+        if len(recipes) == limit:
+            last = recipes[-1] if isinstance(recipes[-1], dict) else recipes[-1].dict()
+            next_cursor = encode_cursor(sort_column or "recipe_id", descending, last)
+            links["next"] = {"href": f"{link_prefix}cursor={next_cursor}&limit={limit}"}
+    else:
+        current_query = f"skip={skip}&limit={limit}"
+        current_url = f"{link_prefix}{current_query}"
 
-    next_skip = skip + limit
-    previous_skip = skip - limit if skip - limit >= 0 else 0
-    last_skip = ((total_count - 1) // limit) * limit if limit > 0 else 0
+        next_skip = skip + limit
+        previous_skip = skip - limit if skip - limit >= 0 else 0
+        last_skip = ((total_count - 1) // limit) * limit if limit > 0 else 0
 
-    links = {
-        "current": {"href": current_url},
-        "first": {"href": f"{base_url}?skip=0&limit={limit}"},
-        "last": {"href": f"{base_url}?skip={last_skip}&limit={limit}"}
-    }
+        links = {
+            "current": {"href": current_url},
+            "first": {"href": f"{link_prefix}skip=0&limit={limit}"},
+            "last": {"href": f"{link_prefix}skip={last_skip}&limit={limit}"}
+        }
 
-    if next_skip < total_count:
-        links["next"] = {"href": f"{base_url}?skip={next_skip}&limit={limit}"}
-    if skip > 0:
-        links["previous"] = {"href": f"{base_url}?skip={previous_skip}&limit={limit}"}
+        if next_skip < total_count:
+            links["next"] = {"href": f"{link_prefix}skip={next_skip}&limit={limit}"}
+        if skip > 0:
+            links["previous"] = {"href": f"{link_prefix}skip={previous_skip}&limit={limit}"}
 
     updated_recipes = []
     for recipe in recipes:
-        recipe_data = recipe.dict()
+        sparse = not isinstance(recipe, Recipe)
+        recipe_data = dict(recipe) if sparse else recipe.dict()
         recipe_id = recipe_data['recipe_id']
         recipe_data["links"] = {
             "self": {"href": f"/recipes/id/{recipe_id}"},
             "update": {"href": f"/recipes/id/{recipe_id}", "method": "PUT"},
             "delete": {"href": f"/recipes/id/{recipe_id}", "method": "DELETE"}
         }
-        updated_recipes.append(Recipe(**recipe_data))
+        updated_recipes.append(recipe_data if sparse or nutrition else Recipe(**recipe_data))
+    if nutrition:
+        add_nutrition(updated_recipes)
 
     return PaginatedResponse(items=updated_recipes, links=links)
@@ -1,31 +1,149 @@
+import os
+import threading
+
 from framework.services.service_factory import BaseServiceFactory
-import app.resources.recipe_resource as recipe_resource
-from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
 
 
 # TODO -- Implement this class
 class ServiceFactory(BaseServiceFactory):
 
+    # Services that hold per-process state (connection pools), created once per worker process.
+    _singletons = {}
+    _lock = threading.RLock()
+
     def __init__(self):
         super().__init__()
 
+    @classmethod
+    def _get_singleton(cls, service_name, create):
+        service = cls._singletons.get(service_name)
+        if service is None:
+            with cls._lock:
+                service = cls._singletons.get(service_name)
+                if service is None:
+                    service = create()
+                    cls._singletons[service_name] = service
+        return service
+
+    @classmethod
+    def peek_service(cls, service_name):
+        """
+        The per-process service if it has been created, else None. Never creates it.
+        """
+        return cls._singletons.get(service_name)
+
     @classmethod
     def get_service(cls, service_name):
         #
         # TODO -- The terrible, hardcoding and hacking continues.
         #
         if service_name == 'RecipeResource':
+            # Imported here because recipe_resource imports this module.
+            import app.resources.recipe_resource as recipe_resource
             result = recipe_resource.RecipeResource(config=None)
         elif service_name == 'RecipeResourceDataService':
-            context = dict(user="root", password="dbuserdbuser",
-                           host="35.196.59.220", port=3306)
-            data_service = MySQLRDBDataService(context=context)
-            result = data_service
+            def create():
+                # Services are imported when first created, not with this module: pymysql stays off the
+                # import path of a new worker until something needs the database. (ssl does not: the web
+                # stack imports it anyway.)
+                from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
+                from framework.utils.request_profiler import record_statement
+                from framework.utils.tracing import record_statement_span
+                context = dict(user="root", password="dbuserdbuser",
+                               host="35.196.59.220", port=3306,
+                               pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+                               pool_min_size=int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+                               change_outbox="recipe_changes",
+                               stats_rollups=True,
+                               connect_timeout=float(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+                               timeouts={"read": float(os.getenv("DB_READ_TIMEOUT", 5)),
+                                         "write": float(os.getenv("DB_WRITE_TIMEOUT", 10))})
+                data_service = MySQLRDBDataService(context=context)
+                # Add statement time to the profile of the request being profiled and a span to its trace, if any
+                data_service.statement_listeners.append(record_statement)
+                data_service.statement_listeners.append(record_statement_span)
+                return data_service
+            result = cls._get_singleton(service_name, create)
+        elif service_name == 'RecipeCache':
+            def create():
+                from app.resources.recipe_cache import RecipeCache
+                from framework.services.cache.InMemoryCacheService import InMemoryCacheService
+                from framework.services.cache.NetworkCacheService import NetworkCacheService
+                local = InMemoryCacheService(max_entries=int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 10000)))
+                # CACHE_URL (e.g. redis://10.0.0.3:6379/0) enables the cache shared by all instances
+                cache_url = os.getenv("CACHE_URL")
+                shared = NetworkCacheService.from_url(cache_url, key_prefix="recipe-service:") if cache_url else None
+                return RecipeCache(local, shared,
+                                   ttl=float(os.getenv("CACHE_TTL", 60)),
+                                   local_ttl=float(os.getenv("CACHE_LOCAL_TTL", 5)),
+                                   # How long past ttl a value may still be served, see RecipeCache
+                                   max_stale=float(os.getenv("CACHE_MAX_STALE", 300)))
+            result = cls._get_singleton(service_name, create)
+        elif service_name == 'RecipeChangeFeed':
+            def create():
+                from app.resources.recipe_change_feed import RecipeChangeFeed
+                cache = cls.get_service("RecipeCache")
+                # Wake-ups go through the shared cache's pub/sub when there is one, so every instance hears them
+                return RecipeChangeFeed(cls.get_service("RecipeResourceDataService"), cache.shared or cache.local,
+                                        # Longer than any write transaction can run (DB_WRITE_TIMEOUT)
+                                        gap_timeout=float(os.getenv("CHANGE_FEED_GAP_TIMEOUT", 30)))
+            result = cls._get_singleton(service_name, create)
+        elif service_name == 'RecipeSnapshot':
+            def create():
+                from app.resources.recipe_snapshot import RecipeSnapshot
+                return RecipeSnapshot(cls.get_service("RecipeResourceDataService"),
+                                      cls.get_service("RecipeChangeFeed"),
+                                      refresh_interval=float(os.getenv("CATALOG_SNAPSHOT_REFRESH", 5)))
+            # The columnar catalog snapshot behind GET /recipes/search is opt-in: None unless CATALOG_SNAPSHOT=1
+            result = cls._get_singleton(service_name, create) if os.getenv("CATALOG_SNAPSHOT", "0") == "1" else None
+        elif service_name == 'RecipeWriteBuffer':
+            def create():
+                from framework.services.data_access.WriteBehindBuffer import WriteBehindBuffer
+
+                def flush(updates):
+                    cls.get_service("RecipeResource").apply_buffered_updates(updates)
+
+                return WriteBehindBuffer(flush,
+                                         max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", 1000)),
+                                         flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0)),
+                                         journal_dir=os.getenv("WRITE_BEHIND_JOURNAL_DIR", "/tmp/recipe-write-behind"),
+                                         fsync=os.getenv("WRITE_BEHIND_FSYNC", "0") == "1")
+            # Write-behind for rating updates is opt-in: None unless WRITE_BEHIND=1
+            result = cls._get_singleton(service_name, create) if os.getenv("WRITE_BEHIND", "0") == "1" else None
+        elif service_name == 'RecipeReadBatcher':
+            def create():
+                from framework.utils.micro_batcher import MicroBatcher
+                data_service = cls.get_service("RecipeResourceDataService")
+                return MicroBatcher(lambda recipe_ids: data_service.get_data_objects("recipes_database", "recipes",
+                                                                                    recipe_ids),
+                                    window=float(os.getenv("READ_BATCH_WINDOW_MS", 2)) / 1000,
+                                    max_batch=int(os.getenv("READ_BATCH_MAX_SIZE", 64)))
+            # Batching concurrent reads by id is opt-in: None unless READ_BATCH=1
+            result = cls._get_singleton(service_name, create) if os.getenv("READ_BATCH", "0") == "1" else None
+        elif service_name == 'NutritionClient':
+            def create():
+                from framework.services.nutrition.NutritionClient import NutritionClient
+                return NutritionClient(os.getenv("NUTRITION_SERVICE_URL"),
+                                       timeout=float(os.getenv("NUTRITION_TIMEOUT", 0.5)),
+                                       ttl=float(os.getenv("NUTRITION_CACHE_TTL", 3600)),
+                                       max_connections=int(os.getenv("NUTRITION_MAX_CONNECTIONS", 20)))
+            # ?expand=nutrition needs the nutrition service: None unless NUTRITION_SERVICE_URL is set
+            result = cls._get_singleton(service_name, create) if os.getenv("NUTRITION_SERVICE_URL") else None
+        elif service_name == 'IdempotencyStore':
+            def create():
+                from framework.utils.idempotency import IdempotencyStore, SharedIdempotencyStore
+                ttl = float(os.getenv("IDEMPOTENCY_TTL", 3600))
+                wait_timeout = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+                local = IdempotencyStore(ttl=ttl, max_entries=int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000)),
+                                         wait_timeout=wait_timeout)
+                # With a shared cache (CACHE_URL), a retry is recognised whichever worker or instance it reaches
+                shared = cls.get_service("RecipeCache").shared
+                if shared is None:
+                    return local
+                return SharedIdempotencyStore(shared, local, ttl=ttl, wait_timeout=wait_timeout,
+                                              lease=float(os.getenv("IDEMPOTENCY_LEASE", 60)))
+            result = cls._get_singleton(service_name, create)
         else:
             result = None
 
         return result
-
-
-
-
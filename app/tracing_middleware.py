@@ -0,0 +1,47 @@
+# tracing_middleware.py
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request, Response
+
+from framework.utils.tracing import current_span, tracer
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Run each traced request in a server span, continuing the caller's trace from its W3C traceparent
+    header. Add it inside CorrelationIdMiddleware: a request that starts a new trace uses its correlation
+    id as the trace id when it is a UUID.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        correlation_id = getattr(request.state, "correlation_id", None)
+        span = tracer.start_request_span(f"{request.method} {request.url.path}",
+                                         traceparent=request.headers.get("traceparent"),
+                                         correlation_id=correlation_id,
+                                         attributes={"http.method": request.method,
+                                                     "http.target": request.url.path,
+                                                     "correlation_id": correlation_id})
+        if span is None:
+            return await call_next(request)
+
+        token = current_span.set(span)
+        response = None
+        try:
+            response: Response = await call_next(request)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            # Name the span after the route template, so requests for different ids group together
+            route = request.scope.get("route")
+            if route is not None:
+                span.name = f"{request.method} {route.path}"
+                span.set_attribute("http.route", route.path)
+            if response is not None:
+                span.set_attribute("http.status_code", response.status_code)
+                if response.status_code >= 500:
+                    span.status = "error"
+            span.end()
+
+        response.headers["traceparent"] = span.context.traceparent()
+        return response
@@ -0,0 +1,71 @@
+# warmup.py
+import logging
+import os
+import threading
+import time
+
+from app.services.service_factory import ServiceFactory
+
+logger = logging.getLogger(__name__)
+
+# Warmup hooks run in registration order. Caches register theirs so a new worker fills them
+# before it reports ready.
+_hooks = []
+
+state = {"ready": False, "warmup_seconds": None, "errors": []}
+
+# Held while the hooks run, so the App Engine warmup request waits for a warmup already in progress
+# instead of running the hooks a second time.
+_run_lock = threading.Lock()
+
+
+def register(hook):
+    _hooks.append(hook)
+    return hook
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP", "0").lower() in ("1", "true", "yes")
+
+
+def run():
+    """
+    Run every warmup hook. A failing hook is logged and recorded but does not stop the worker from
+    starting; readiness still reflects whether the database is reachable. Returns at once if warmup has
+    already finished, and waits for it if it is running in another thread.
+    """
+    with _run_lock:
+        if state["ready"]:
+            return
+        start = time.perf_counter()
+        for hook in _hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Warmup hook {hook.__name__} failed: {e}")
+                state["errors"].append(f"{hook.__name__}: {e}")
+        state["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        state["ready"] = True
+    logger.info(f"Warmup finished in {state['warmup_seconds']}s (pid {os.getpid()})")
+
+
+def start() -> threading.Thread:
+    """
+    Run the warmup in a background thread, so the worker accepts requests while it warms up.
+    """
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+@register
+def warm_connection_pool():
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    data_service.pool.warmup()
+
+
+@register
+def warm_first_page():
+    res = ServiceFactory.get_service("RecipeResource")
+    res.get_all(skip=0, limit=10)
+    res.get_total_count()
@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+
+
+class CacheService(ABC):
+    """
+    Abstract base class for cache backends. A local in-memory backend and a network key-value
+    backend implement the same interface, so application code can use either as a shared tier.
+
+    Network backends store strings; callers serialize values (e.g. JSON) before set().
+    """
+
+    @abstractmethod
+    def get(self, key: str):
+        """
+        :return: The cached value, or None on a miss or if the backend is unavailable.
+        """
+        raise NotImplementedError('Abstract method get()')
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float = None):
+        """
+        Store a value. ttl is in seconds; None means the backend's default.
+        """
+        raise NotImplementedError('Abstract method set()')
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        raise NotImplementedError('Abstract method delete()')
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """
+        Atomically increment an integer counter (starting from 0) and return the new value.
+        Used for versioned keys.
+        """
+        raise NotImplementedError('Abstract method incr()')
+
+    @abstractmethod
+    def publish(self, channel: str, message: str):
+        """
+        Send a message to every subscriber of the channel, on every instance sharing this backend.
+        """
+        raise NotImplementedError('Abstract method publish()')
+
+    @abstractmethod
+    def subscribe(self, channel: str, callback):
+        """
+        Call callback(message) for every message published on the channel.
+        """
+        raise NotImplementedError('Abstract method subscribe()')
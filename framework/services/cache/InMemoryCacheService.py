@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .BaseCacheService import CacheService
+
+
+class InMemoryCacheService(CacheService):
+    """
+    A bounded, thread-safe LRU cache with per-entry TTL, local to the process.
+    Values are stored as-is (no serialization). Publish/subscribe only reaches subscribers
+    in the same process.
+    """
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            value = int(entry[0]) + 1 if entry else 1
+            # Counters do not expire
+            self._entries[key] = (value, float("inf"))
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def publish(self, channel: str, message: str):
+        for callback in list(self._subscribers.get(channel, [])):
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"Error in cache subscriber for {channel}: {e}")
+
+    def subscribe(self, channel: str, callback):
+        self._subscribers.setdefault(channel, []).append(callback)
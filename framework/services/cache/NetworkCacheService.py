@@ -0,0 +1,207 @@
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from .BaseCacheService import CacheService
+
+
+class CacheProtocolError(Exception):
+    pass
+
+
+class NetworkCacheService(CacheService):
+    """
+    A cache backend on a network key-value server that speaks the Redis protocol (RESP), such as
+    Redis, Valkey or Memorystore. Several instances of the service share it as a second-level cache.
+
+    The client is deliberately small: one socket per thread, short timeouts, and every failure is
+    treated as a cache miss, so an unavailable cache never fails a request.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 timeout: float = 0.25, default_ttl: float = 60.0, key_prefix: str = ""):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        self._local = threading.local()
+        self._subscriptions = {}
+        self._subscriber_thread = None
+        self._subscriber_socket = None
+        self._subscriber_lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        """
+        Create a client from a URL like redis://host:6379/0.
+        """
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(host=parsed.hostname or "localhost", port=parsed.port or 6379, db=db, **kwargs)
+
+    # -- protocol -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @classmethod
+    def _read_reply(cls, stream):
+        line = stream.readline()
+        if not line:
+            raise ConnectionError("Cache server closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise CacheProtocolError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = stream.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [cls._read_reply(stream) for _ in range(length)]
+        raise CacheProtocolError(f"Unexpected reply {line!r}")
+
+    def _open(self, timeout):
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = sock.makefile("rb")
+        if self.db:
+            sock.sendall(self._encode("SELECT", self.db))
+            self._read_reply(stream)
+        return sock, stream
+
+    def _command(self, *args):
+        connection = getattr(self._local, "connection", None)
+        try:
+            if connection is None:
+                connection = self._open(self.timeout)
+                self._local.connection = connection
+            sock, stream = connection
+            sock.sendall(self._encode(*args))
+            return self._read_reply(stream)
+        except (OSError, ConnectionError, CacheProtocolError):
+            self._drop_connection()
+            raise
+
+    def _drop_connection(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection:
+            try:
+                connection[0].close()
+            except OSError:
+                pass
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    # -- CacheService ---------------------------------------------------------------------------
+
+    def get(self, key: str):
+        try:
+            return self._command("GET", self._key(key))
+        except Exception as e:
+            print(f"Cache get failed for {key}: {e}")
+            return None
+
+    def set(self, key: str, value, ttl: float = None):
+        ttl_ms = int((self.default_ttl if ttl is None else ttl) * 1000)
+        try:
+            self._command("SET", self._key(key), value, "PX", max(ttl_ms, 1))
+        except Exception as e:
+            print(f"Cache set failed for {key}: {e}")
+
+    def add(self, key: str, value, ttl: float = None) -> bool:
+        """
+        Set the key only if it does not exist (SET NX), atomically across all clients.
+        :return: Whether the key was set. Unlike set, failures are raised: the caller must not assume
+            it holds the key.
+        """
+        ttl_ms = int((self.default_ttl if ttl is None else ttl) * 1000)
+        return self._command("SET", self._key(key), value, "PX", max(ttl_ms, 1), "NX") == "OK"
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            self._command("DEL", *[self._key(key) for key in keys])
+        except Exception as e:
+            print(f"Cache delete failed for {keys}: {e}")
+
+    def incr(self, key: str) -> int:
+        # Unlike get/set, a failed increment is raised: the caller must not assume a new version.
+        return self._command("INCR", self._key(key))
+
+    def eval(self, script: str, keys: list, args: list):
+        """
+        Run a Lua script on the server. Keys are prefixed like all others. Failures are raised.
+        """
+        return self._command("EVAL", script, len(keys), *[self._key(key) for key in keys], *args)
+
+    def publish(self, channel: str, message: str):
+        try:
+            self._command("PUBLISH", self._key(channel), message)
+        except Exception as e:
+            print(f"Cache publish failed on {channel}: {e}")
+
+    def subscribe(self, channel: str, callback):
+        channel = self._key(channel)
+        with self._subscriber_lock:
+            is_new = channel not in self._subscriptions
+            self._subscriptions.setdefault(channel, []).append(callback)
+            if self._subscriber_thread is None:
+                self._subscriber_thread = threading.Thread(
+                    target=self._listen, name="cache-subscriber", daemon=True
+                )
+                self._subscriber_thread.start()
+            elif is_new and self._subscriber_socket is not None:
+                try:
+                    self._subscriber_socket.sendall(self._encode("SUBSCRIBE", channel))
+                except OSError:
+                    pass  # the listener reconnects and subscribes to every channel
+
+    def _listen(self):
+        """
+        Subscriber loop on a dedicated, blocking connection. Reconnects with backoff; messages published
+        while disconnected are lost, so users of invalidations should also bound staleness by TTL.
+        """
+        backoff = 0.1
+        while True:
+            try:
+                sock, stream = self._open(self.timeout)
+                sock.settimeout(None)
+                with self._subscriber_lock:
+                    sock.sendall(self._encode("SUBSCRIBE", *self._subscriptions))
+                    self._subscriber_socket = sock
+                while True:
+                    reply = self._read_reply(stream)
+                    backoff = 0.1
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == "message":
+                        for callback in list(self._subscriptions.get(reply[1], [])):
+                            try:
+                                callback(reply[2])
+                            except Exception as e:
+                                print(f"Error in cache subscriber for {reply[1]}: {e}")
+            except Exception as e:
+                print(f"Cache subscriber disconnected: {e}")
+                with self._subscriber_lock:
+                    self._subscriber_socket = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
@@ -1,6 +1,55 @@
 from abc import ABC, abstractmethod, abstractclassmethod
 
-# TODO -- Add support for standard exceptions.
+
+class DataServiceException(Exception):
+    """
+    Base class for the standard exceptions raised by data services.
+    """
+    pass
+
+
+class NotFoundException(DataServiceException):
+    """
+    The data object identified by the key field/value does not exist.
+    """
+    pass
+
+
+class VersionConflictException(DataServiceException):
+    """
+    An optimistic concurrency check failed. The data object exists, but its version is
+    no longer the version the caller read.
+    """
+
+    def __init__(self, message: str, current_version: int = None):
+        super().__init__(message)
+        self.current_version = current_version
+
+
+class ConstraintViolationException(DataServiceException):
+    """
+    A write would break a constraint of the database, e.g. a second recipe with the same name.
+    """
+    pass
+
+
+class UnitOfWorkAbortedException(DataServiceException):
+    """
+    An operation inside a unit of work failed, and the error was caught inside it: the unit of work was
+    rolled back instead of committed.
+    """
+    pass
+
+
+class ServiceUnavailableException(DataServiceException):
+    """
+    The database cannot serve the request right now (unreachable, timed out, or shed by a circuit
+    breaker). The request may succeed if retried after retry_after seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class DataDataService(ABC):
@@ -26,6 +75,26 @@ class DataDataService(ABC):
         """
         raise NotImplementedError('Abstract method _get_connection()')
 
+    def _release_connection(self, connection):
+        """
+        Return a connection obtained from _get_connection(). Services that pool connections
+        override this; the default simply closes it.
+        :param connection: The connection.
+        """
+        connection.close()
+
+    @abstractmethod
+    def unit_of_work(self):
+        """
+        A context manager that runs the operations of this service called inside it in one transaction,
+        committed when the block exits and rolled back if it raises.
+
+        Every data service must define it. A service that cannot share a transaction between operations
+        defines it to raise NotImplementedError, so that callers needing atomic writes fail before writing
+        anything; it must not run the block without a transaction.
+        """
+        raise NotImplementedError('Abstract method unit_of_work()')
+
     @abstractmethod
     def get_data_object(self,
                         database_name: str,
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+
+from .BaseDataService import ServiceUnavailableException
+
+
+class CircuitOpenException(ServiceUnavailableException):
+    """
+    The circuit breaker is open: calls fail immediately instead of waiting on a database
+    that is already failing or too slow.
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker over the outcomes of recent database calls.
+
+    closed:    calls go through. Each outcome is recorded in a sliding time window. Once the window
+               holds at least min_calls outcomes and the failure rate or the slow call rate reaches its
+               threshold, the breaker opens.
+    open:      calls raise CircuitOpenException for open_seconds.
+    half-open: one probe call at a time goes through. A successful, fast probe closes the breaker;
+               a failing or slow probe opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window_seconds: float = 10.0, min_calls: int = 20,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 2.0,
+                 slow_call_rate_threshold: float = 0.8, open_seconds: float = 5.0):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at = None
+        # (timestamp, failed, slow) per recorded call
+        self._outcomes = deque()
+        self._failures = 0
+        self._slow = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise CircuitOpenException if the call must not be attempted.
+        """
+        if self.state == self.CLOSED:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    raise CircuitOpenException(
+                        f"Database circuit breaker is open; retry in {remaining:.1f}s", retry_after=remaining
+                    )
+                self.state = self.HALF_OPEN
+                self._probe_started_at = None
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back (e.g. its request was cancelled) does not block forever.
+                if self._probe_started_at is not None and now - self._probe_started_at < self.open_seconds:
+                    raise CircuitOpenException(
+                        "Database circuit breaker is half-open and waiting for a probe", retry_after=1.0
+                    )
+                self._probe_started_at = now
+
+    def record(self, elapsed: float, failed: bool = False):
+        """
+        Record the outcome of a call that before_call() let through.
+        """
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self.state != self.CLOSED:
+                if self.state == self.HALF_OPEN:
+                    if failed or slow:
+                        self._open(now)
+                    else:
+                        self._close()
+                return
+
+            self._outcomes.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            cutoff = now - self.window_seconds
+            while self._outcomes and self._outcomes[0][0] < cutoff:
+                _, old_failed, old_slow = self._outcomes.popleft()
+                self._failures -= old_failed
+                self._slow -= old_slow
+
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and (
+                    self._failures / calls >= self.failure_rate_threshold
+                    or self._slow / calls >= self.slow_call_rate_threshold):
+                self._open(now)
+
+    def record_success(self, elapsed: float = 0.0):
+        self.record(elapsed, failed=False)
+
+    def record_failure(self, elapsed: float = 0.0):
+        self.record(elapsed, failed=True)
+
+    def _open(self, now):
+        print(f"Database circuit breaker opened ({self._failures} failed, {self._slow} slow "
+              f"of {len(self._outcomes)} recent calls)")
+        self.state = self.OPEN
+        self._opened_at = now
+        self._probe_started_at = None
+
+    def _close(self):
+        print("Database circuit breaker closed")
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow = 0
+        self._probe_started_at = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._failures,
+                "recent_slow_calls": self._slow,
+            }
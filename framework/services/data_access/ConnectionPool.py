@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+from .BaseDataService import ServiceUnavailableException
+
+
+class PoolTimeoutException(ServiceUnavailableException):
+    """
+    No connection became available within the pool's acquire timeout.
+    """
+    pass
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of database connections.
+
+    Idle connections are reused most-recently-used first, so a quiet pool keeps a few warm
+    connections instead of cycling through all of them. A connection that has been idle longer
+    than ping_interval is pinged (and reconnected if needed) before it is handed out.
+
+    The pool belongs to one process. If the process forks (e.g. gunicorn with preload), the child
+    starts with an empty pool instead of sharing the parent's sockets.
+    """
+
+    def __init__(self, connect, max_size: int = 10, min_size: int = 0,
+                 timeout: float = 5.0, ping_interval: float = 30.0):
+        """
+        :param connect: A no-argument callable that opens a new connection.
+        :param max_size: Maximum number of open connections, idle or in use.
+        :param min_size: Number of connections opened by warmup().
+        :param timeout: Seconds acquire() waits for a connection before raising PoolTimeoutException.
+        :param ping_interval: Idle seconds after which a connection is pinged before reuse.
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._idle = []
+        self._size = 0
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+
+    def _check_pid(self):
+        # Called with the condition held. After a fork the idle sockets belong to the parent:
+        # forget them without closing, since closing would also shut the parent's connection.
+        if self._pid != os.getpid():
+            self._idle = []
+            self._size = 0
+            self._pid = os.getpid()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_pid()
+            while True:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutException(
+                        f"No database connection available after {self.timeout}s (pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        if connection is None:
+            return self._open()
+
+        if time.monotonic() - last_used > self.ping_interval:
+            try:
+                connection.ping(reconnect=True)
+            except Exception as e:
+                # Replace the stale connection, keeping its slot
+                print(f"Replacing stale pooled connection: {e}")
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                return self._open()
+        return connection
+
+    def _open(self):
+        # The slot for this connection has already been counted in _size.
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection):
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if not getattr(connection, "open", True):
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, connection):
+        """
+        Close a connection that must not be reused and free its slot.
+        """
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def warmup(self, count: int = None) -> int:
+        """
+        Open connections until count (default min_size) are open, so the first requests do not pay
+        for connection setup.
+        :return: The number of connections open afterwards.
+        """
+        count = self.min_size if count is None else min(count, self.max_size)
+        acquired = []
+        try:
+            while len(acquired) < count:
+                acquired.append(self.acquire())
+        finally:
+            for connection in acquired:
+                self.release(connection)
+        return self._size
+
+    def health_check(self) -> bool:
+        """
+        Check out a connection and ping it. Raises if the database cannot be reached.
+        """
+        connection = self.acquire()
+        try:
+            connection.ping(reconnect=False)
+        except Exception:
+            self.discard(connection)
+            raise
+        self.release(connection)
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._check_pid()
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
@@ -1,5 +1,45 @@
+import json
+import logging
+import struct
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 import pymysql
-from .BaseDataService import DataDataService
+from .BaseDataService import (
+    ConstraintViolationException, DataDataService, NotFoundException, ServiceUnavailableException,
+    UnitOfWorkAbortedException, VersionConflictException
+)
+from .CircuitBreaker import CircuitBreaker
+from .ConnectionPool import ConnectionPool
+from .StatementCache import StatementCache, pad_in_list, render_int_args
+from .StatsRollup import CALORIE_BUCKET_WIDTH, ROLLUP_COLUMNS, StatsDelta
+from framework.utils.name_matching import normalize_name
+
+logger = logging.getLogger(__name__)
+
+
+class _UnitOfWorkConnection:
+    """
+    The connection of a unit of work, as the operations inside it see it. The unit of work begins and
+    commits the transaction, so the operations' own begin() and commit() do nothing, and their rollback()
+    marks the unit of work rollback-only: it rolls back even if the caller catches the error.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rollback_only = False
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollback_only = True
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
 
 
 class MySQLRDBDataService(DataDataService):
@@ -9,27 +49,200 @@ class MySQLRDBDataService(DataDataService):
     can subclass, reuse methods and extend.
     """
 
+    # SQL text only depends on the cache key, so all instances share one cache.
+    statement_cache = StatementCache()
+
+    # Columns of the recipes table that can be requested as a sparse fieldset.
+    RECIPE_COLUMNS = ("recipe_id", "name", "steps", "time_to_cook", "meal_type", "calories", "rating", "version")
+
+    # Columns get_all_data can order by. Each has an index (see migration 006); with the recipe_id that
+    # InnoDB appends to secondary indexes it serves ORDER BY col, recipe_id in either direction.
+    SORT_COLUMNS = ("rating", "calories", "time_to_cook", "name", "recipe_id")
+    NULLABLE_SORT_COLUMNS = ("rating", "calories", "time_to_cook")
+
     def __init__(self, context):
         super().__init__(context)
 
-    def _get_connection(self):
-        connection = pymysql.connect(
-            host=self.context["host"],
-            port=self.context["port"],
-            user=self.context["user"],
-            passwd=self.context["password"],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
+        # Callables invoked as listener(sql, args, elapsed_seconds) after every statement this
+        # service executes. Used by tools such as the QueryPlanChecker.
+        self.statement_listeners = []
+
+        self.pool = ConnectionPool(
+            self._connect,
+            max_size=context.get("pool_size", 10),
+            min_size=context.get("pool_min_size", 0),
+            timeout=context.get("pool_timeout", 5.0),
         )
+
+        # Socket read/write timeouts in seconds per kind of operation; None waits forever.
+        # "default" applies to callers that do not name an operation, such as migrations.
+        self.timeouts = {"read": 5.0, "write": 10.0, "default": None}
+        self.timeouts.update(context.get("timeouts", {}))
+
+        self.circuit_breaker = CircuitBreaker(**context.get("circuit_breaker", {}))
+
+        # Name of the change outbox table. When set, every insert/update/delete also appends a row to it
+        # in the same transaction, so the change feed never misses or invents a change. change_ids are
+        # assigned on insert but become visible on commit, not necessarily in order: RecipeChangeFeed.read
+        # holds back changes behind a gap until the gap is filled or has timed out.
+        self.change_outbox = context.get("change_outbox")
+
+        # When set, writes keep the recipe statistics rollup tables (see migration 005) up to date in the
+        # same transaction, so get_recipe_stats() reads a few summary rows instead of the catalog.
+        self.stats_rollups = context.get("stats_rollups", False)
+
+        # The unit of work open in the current thread/task, if any; see unit_of_work()
+        self._unit_of_work = ContextVar(f"unit_of_work_{id(self)}", default=None)
+
+    def _get_connection(self, operation: str = None):
+        """
+        Check out a connection from this service's pool. Return it with _release_connection().
+        Fails fast with CircuitOpenException while the circuit breaker is open. Inside a unit of work,
+        returns the unit of work's connection.
+        :param operation: "read" or "write"; selects the statement timeouts for this checkout.
+        """
+        unit_of_work = self._unit_of_work.get()
+        if unit_of_work is not None:
+            return unit_of_work
+        self.circuit_breaker.before_call()
+        start = time.perf_counter()
+        try:
+            connection = self.pool.acquire()
+        except ServiceUnavailableException:
+            self.circuit_breaker.record_failure(time.perf_counter() - start)
+            raise
+
+        # pymysql reads these before every socket read/write, so a pooled connection
+        # can take different timeouts for each checkout.
+        timeout = self.timeouts.get(operation or "default")
+        connection._read_timeout = timeout
+        connection._write_timeout = timeout
         return connection
 
+    def _release_connection(self, connection):
+        if isinstance(connection, _UnitOfWorkConnection):
+            return  # released by the unit of work
+        self.pool.release(connection)
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Run the operations of this service called inside the block (in this thread or task) on one pooled
+        connection and in one transaction: committed when the block exits, rolled back if it raises.
+        Reads inside the block see its writes. An operation that fails dooms the unit of work: if the caller
+        catches the error and carries on, the block exit rolls back and raises UnitOfWorkAbortedException.
+        A unit of work opened inside another one joins it.
+        """
+        if self._unit_of_work.get() is not None:
+            yield
+            return
+
+        connection = self._get_connection("write")
+        unit_of_work = _UnitOfWorkConnection(connection)
+        token = self._unit_of_work.set(unit_of_work)
+        try:
+            connection.begin()
+            yield
+            if unit_of_work.rollback_only:
+                raise UnitOfWorkAbortedException("An operation in the unit of work failed; it was rolled back")
+            connection.commit()
+        except BaseException:
+            self._rollback(connection)
+            raise
+        finally:
+            self._unit_of_work.reset(token)
+            self._release_connection(connection)
+
+    def unit_of_work_aborted(self) -> bool:
+        """
+        Whether an operation of the unit of work open in this thread/task failed, so that it will roll back.
+        """
+        unit_of_work = self._unit_of_work.get()
+        return unit_of_work is not None and unit_of_work.rollback_only
+
+    def _connect(self):
+        try:
+            connection = pymysql.connect(
+                host=self.context["host"],
+                port=self.context["port"],
+                user=self.context["user"],
+                passwd=self.context["password"],
+                cursorclass=pymysql.cursors.DictCursor,
+                autocommit=True,
+                connect_timeout=self.context.get("connect_timeout", 5)
+            )
+        except pymysql.err.OperationalError as e:
+            raise ServiceUnavailableException(f"Cannot connect to the database: {e}") from e
+        return connection
+
+    @staticmethod
+    def _rollback(connection):
+        # A connection lost to a timeout is already closed and has nothing to roll back.
+        if connection.open:
+            connection.rollback()
+
+    def _sql(self, operation: str, database_name: str, collection_name: str, shape, builder) -> str:
+        """
+        Return the SQL text for a statement from the statement cache, building it on first use.
+        pymysql has no server-side prepared statements, so this saves the statement build on every call
+        and keeps the set of distinct statements sent to the server small and stable.
+        """
+        return self.statement_cache.get(operation, database_name, collection_name, shape, builder)
+
+    def _notify_listeners(self, sql, args, elapsed):
+        for listener in self.statement_listeners:
+            try:
+                listener(sql, args, elapsed)
+            except Exception as e:
+                print(f"Error in statement listener: {e}")
+
+    def _execute(self, cursor, sql, args=None):
+        """
+        Execute a single statement. All SQL issued by this service goes through _execute/_executemany.
+        Lost connections and timeouts are recorded by the circuit breaker and raised as
+        ServiceUnavailableException; constraint violations are raised as ConstraintViolationException.
+        """
+        start = time.perf_counter()
+        try:
+            rendered = render_int_args(sql, args)
+            if rendered is not None:
+                result = cursor.execute(rendered)
+            else:
+                result = cursor.execute(sql, args)
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+            self.circuit_breaker.record_failure(time.perf_counter() - start)
+            raise ServiceUnavailableException(f"Database statement failed: {e}") from e
+        except pymysql.err.IntegrityError as e:
+            raise ConstraintViolationException(str(e)) from e
+        finally:
+            if self.statement_listeners:
+                self._notify_listeners(sql, args, time.perf_counter() - start)
+        self.circuit_breaker.record_success(time.perf_counter() - start)
+        return result
+
+    def _executemany(self, cursor, sql, args):
+        start = time.perf_counter()
+        try:
+            result = cursor.executemany(sql, args)
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+            self.circuit_breaker.record_failure(time.perf_counter() - start)
+            raise ServiceUnavailableException(f"Database statement failed: {e}") from e
+        except pymysql.err.IntegrityError as e:
+            raise ConstraintViolationException(str(e)) from e
+        finally:
+            if self.statement_listeners:
+                self._notify_listeners(sql, args, time.perf_counter() - start)
+        self.circuit_breaker.record_success(time.perf_counter() - start)
+        return result
+
     def get_total_count(self, database_name: str, collection_name: str) -> int:
         connection = None
         try:
-            connection = self._get_connection()
+            connection = self._get_connection("read")
             cursor = connection.cursor()
-            sql = f"SELECT COUNT(*) as count FROM `{database_name}`.`{collection_name}`"
-            cursor.execute(sql)
+            sql = self._sql("count", database_name, collection_name, 0,
+                            lambda: f"SELECT COUNT(*) as count FROM `{database_name}`.`{collection_name}`")
+            self._execute(cursor, sql)
             result = cursor.fetchone()
             if result:
                 return result["count"]
@@ -39,98 +252,282 @@ class MySQLRDBDataService(DataDataService):
             raise e
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
+
+    def _recipe_columns(self, fields=None) -> tuple:
+        """
+        The recipe columns to select for a sparse fieldset, in table order and always including recipe_id.
+        Column names end up in SQL text, so only known columns are accepted.
+        """
+        if fields is None:
+            return self.RECIPE_COLUMNS
+        unknown = set(fields) - set(self.RECIPE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown recipe fields: {', '.join(sorted(unknown))}")
+        return tuple(c for c in self.RECIPE_COLUMNS if c == "recipe_id" or c in fields)
 
     def get_data_object(self,
                         database_name: str,
                         collection_name: str,
                         key_field: str,
-                        key_value: any):
+                        key_value: any,
+                        fields=None,
+                        include_ingredients: bool = True):
+        """
+        Fetch one recipe by recipe_id or name with two statements: the recipe row, then its ingredients
+        by recipe_id. Unlike a JOIN, the recipe columns (including the long steps text) cross the wire once
+        instead of once per ingredient.
+
+        :param fields: Recipe columns to return (recipe_id is always returned). None for all of them.
+        :param include_ingredients: If False, ingredients are not read and the result has no "ingredients".
+        """
 
         connection = None
         result = None
+        columns = self._recipe_columns(fields)
 
         try:
-            sql_statement = f"""SELECT r.recipe_id, r.name, r.steps, r.time_to_cook, r.meal_type, r.calories, r.rating,
-                                i.ingredient_id, i.ingredient_name, i.quantity
-                                FROM `{database_name}`.`{collection_name}` r
-                                LEFT JOIN `{database_name}`.`ingredients` i ON r.recipe_id = i.recipe_id
-                                WHERE r.{key_field}=%s"""
+            recipe_sql = self._sql("get_data_object", database_name, collection_name, (key_field, columns), lambda: (
+                f"SELECT {', '.join(f'r.`{column}`' for column in columns)} "
+                f"FROM `{database_name}`.`{collection_name}` r WHERE r.`{key_field}`=%s"
+            ))
 
-            connection = self._get_connection()
+            connection = self._get_connection("read")
             cursor = connection.cursor()
-            cursor.execute(sql_statement, [key_value])
-            rows = cursor.fetchall()
-            print(rows)
-
-            if rows:
-                recipe = {
-                    "recipe_id": rows[0]["recipe_id"],
-                    "name": rows[0]["name"],
-                    "steps": rows[0]["steps"],
-                    "time_to_cook": rows[0]["time_to_cook"],
-                    "meal_type": rows[0]["meal_type"],
-                    "calories": rows[0]["calories"],
-                    "rating": rows[0]["rating"],
-                    "ingredients": []
-                }
-                
-
-                for row in rows:
-                    if row["ingredient_name"] is not None:
-                        recipe["ingredients"].append({
-                            "ingredient_id": row["ingredient_id"],
-                            "ingredient_name": row["ingredient_name"],
-                            "quantity": row["quantity"]
-                        })
-
-                result = recipe
+            self._execute(cursor, recipe_sql, [key_value])
+            row = cursor.fetchone()
+
+            if row:
+                result = {column: row[column] for column in columns}
+
+                if include_ingredients:
+                    ingredients_sql = self._sql("get_ingredients", database_name, "ingredients", 1, lambda: (
+                        f"SELECT i.ingredient_id, i.ingredient_name, i.quantity "
+                        f"FROM `{database_name}`.`ingredients` i WHERE i.recipe_id=%s"
+                    ))
+                    self._execute(cursor, ingredients_sql, [row["recipe_id"]])
+                    result["ingredients"] = [
+                        {
+                            "ingredient_id": ingredient["ingredient_id"],
+                            "ingredient_name": ingredient["ingredient_name"],
+                            "quantity": ingredient["quantity"]
+                        }
+                        for ingredient in cursor.fetchall()
+                    ]
 
         except Exception as e:
             print(f"An error occurred: {e}")
-            if connection:
-                connection.close()
             raise
 
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
 
         return result
 
-    def get_all_data(self, database_name: str, collection_name: str, skip: int = 0, limit: int = 10) -> list[dict]:
+    def get_data_objects(self, database_name: str, collection_name: str, recipe_ids: list) -> dict:
+        """
+        Fetch many recipes by recipe_id, as get_data_object returns them, with two statements: the recipe
+        rows, then their ingredients, both by recipe_id IN (...). Used to serve concurrent single-recipe
+        reads with one round of queries (see MicroBatcher).
+        :return: {recipe_id: recipe} for the recipes that exist.
+        """
+        if not recipe_ids:
+            return {}
+        connection = None
+        columns = self.RECIPE_COLUMNS
+        # Pad the id list to a bucketed size so only a few distinct IN statements exist
+        padded = pad_in_list(list(recipe_ids))
+        size = len(padded)
+        try:
+            recipes_sql = self._sql("get_data_objects", database_name, collection_name, size, lambda: (
+                f"SELECT {', '.join(f'r.`{column}`' for column in columns)} "
+                f"FROM `{database_name}`.`{collection_name}` r WHERE r.`recipe_id` IN ({', '.join(['%s'] * size)})"
+            ))
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+            self._execute(cursor, recipes_sql, padded)
+            results = {row["recipe_id"]: {column: row[column] for column in columns} for row in cursor.fetchall()}
+            if not results:
+                return {}
+
+            found = pad_in_list(list(results))
+            ingredients_sql = self._sql("ingredients_in", database_name, "ingredients", len(found), lambda: (
+                f"SELECT i.ingredient_id, i.recipe_id, i.ingredient_name, i.quantity "
+                f"FROM `{database_name}`.ingredients i "
+                f"WHERE i.recipe_id IN ({','.join(['%s'] * len(found))})"
+            ))
+            self._execute(cursor, ingredients_sql, found)
+            for recipe in results.values():
+                recipe["ingredients"] = []
+            for ingredient in cursor.fetchall():
+                results[ingredient["recipe_id"]]["ingredients"].append({
+                    "ingredient_id": ingredient["ingredient_id"],
+                    "ingredient_name": ingredient["ingredient_name"],
+                    "quantity": ingredient["quantity"]
+                })
+            return results
+        except Exception as e:
+            print(f"Error in get_data_objects: {e}")
+            raise
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def get_recipe_id_by_normalized_name(self, database_name: str, collection_name: str, name: str):
+        """
+        Find a recipe whose name is the same as name after normalization (case, accents and whitespace,
+        see normalize_name), with one lookup on the name_normalized index. When several names normalize
+        alike, the one spelled exactly like name wins, then the oldest.
+        :return: The recipe_id, or None.
+        """
+        connection = None
+        try:
+            lookup_sql = self._sql("get_recipe_id_by_normalized_name", database_name, collection_name, 2, lambda: (
+                f"SELECT `recipe_id` FROM `{database_name}`.`{collection_name}` WHERE `name_normalized`=%s "
+                f"ORDER BY `name`=%s DESC, `recipe_id` LIMIT 1"
+            ))
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+            self._execute(cursor, lookup_sql, [normalize_name(name), name])
+            row = cursor.fetchone()
+            return row["recipe_id"] if row else None
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def backfill_normalized_names(self, database_name: str, collection_name: str, batch_size: int = 1000) -> int:
+        """
+        Fill in name_normalized for recipes written before it existed (see migration 008), in recipe_id
+        order, one transaction per batch. This does not change the recipes' versions or the change feed.
+        :return: The number of recipes filled in.
+        """
+        connection = None
+        total = 0
+        after = 0
+        try:
+            select_sql = self._sql("select_unnormalized_names", database_name, collection_name, 2, lambda: (
+                f"SELECT `recipe_id`, `name` FROM `{database_name}`.`{collection_name}` "
+                f"WHERE `recipe_id` > %s AND `name_normalized` IS NULL ORDER BY `recipe_id` LIMIT %s"
+            ))
+            update_sql = self._sql("set_normalized_name", database_name, collection_name, 2, lambda: (
+                f"UPDATE `{database_name}`.`{collection_name}` SET `name_normalized`=%s WHERE `recipe_id`=%s"
+            ))
+            connection = self._get_connection("write")
+            cursor = connection.cursor()
+            while True:
+                connection.begin()
+                self._execute(cursor, select_sql, [after, batch_size])
+                rows = cursor.fetchall()
+                if rows:
+                    self._executemany(cursor, update_sql, [(normalize_name(row["name"]), row["recipe_id"])
+                                                           for row in rows])
+                connection.commit()
+                total += len(rows)
+                if len(rows) < batch_size:
+                    return total
+                after = rows[-1]["recipe_id"]
+        except Exception as e:
+            print(f"Error in backfill_normalized_names after {total} recipes: {e}")
+            if connection:
+                self._rollback(connection)
+            raise
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    @staticmethod
+    def _keyset_condition(column: str, descending: bool, nullable: bool, after_null: bool) -> str:
+        """
+        The WHERE condition for rows after (value, recipe_id) in ORDER BY column, recipe_id order.
+        MySQL sorts NULLs first ascending and last descending, as they are stored in the index.
+        """
+        if column == "recipe_id":
+            return f"r.`recipe_id` {'<' if descending else '>'} %s"
+        col = f"r.`{column}`"
+        if not descending:
+            if after_null:
+                return f"(({col} IS NULL AND r.`recipe_id` > %s) OR {col} IS NOT NULL)"
+            return f"({col} > %s OR ({col} = %s AND r.`recipe_id` > %s))"
+        if after_null:
+            return f"({col} IS NULL AND r.`recipe_id` < %s)"
+        condition = f"{col} < %s OR ({col} = %s AND r.`recipe_id` < %s)"
+        return f"({condition} OR {col} IS NULL)" if nullable else f"({condition})"
+
+    @staticmethod
+    def _keyset_args(column: str, after: tuple) -> list:
+        value, recipe_id = after
+        if column == "recipe_id":
+            return [recipe_id]
+        if value is None:
+            return [recipe_id]
+        if column == "rating":
+            # rating is a FLOAT column: compare with the exact single-precision value, or equality fails
+            value = struct.unpack("f", struct.pack("f", value))[0]
+        return [value, value, recipe_id]
+
+    def get_all_data(self, database_name: str, collection_name: str, skip: int = 0, limit: int = 10,
+                     fields=None, include_ingredients: bool = True, sort: str = None, descending: bool = False,
+                     after: tuple = None) -> list[dict]:
         """
         Retrieve all data objects from the specified database and collection/table with pagination,
         including related ingredients.
+
+        :param fields: Recipe columns to return (recipe_id is always returned). None for all of them.
+        :param include_ingredients: If False, the ingredients query is skipped and results have no "ingredients".
+        :param sort: A SORT_COLUMNS column to order by, with recipe_id as the tie-breaker. Defaults to
+            recipe_id, so pages are stable. The sort column is always returned.
+        :param after: (sort value, recipe_id) of the last row of the previous page, for keyset pagination:
+            the page starts right after it, however deep it is, instead of skipping rows.
         """
         connection = None
         results = []
+        sort = sort or "recipe_id"
+        if sort not in self.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort}")
+        columns = self._recipe_columns(fields if fields is None or sort in fields else list(fields) + [sort])
+        nullable = sort in self.NULLABLE_SORT_COLUMNS
+        after_null = after is not None and after[0] is None
+        direction = "DESC" if descending else "ASC"
 
         try:
-            connection = self._get_connection()
+            connection = self._get_connection("read")
             cursor = connection.cursor()
 
-            recipes_sql = (
-                f"SELECT r.recipe_id, r.name, r.steps, r.time_to_cook, r.meal_type, "
-                f"r.calories, r.rating "
-                f"FROM `{database_name}`.`{collection_name}` r "
-                f"LIMIT %s OFFSET %s"
-            )
-            cursor.execute(recipes_sql, (limit, skip))
+            def build_select():
+                where = ""
+                if after is not None:
+                    where = f"WHERE {self._keyset_condition(sort, descending, nullable, after_null)} "
+                order = f"r.`recipe_id` {direction}"
+                if sort != "recipe_id":
+                    order = f"r.`{sort}` {direction}, {order}"
+                return (
+                    f"SELECT {', '.join(f'r.`{column}`' for column in columns)} "
+                    f"FROM `{database_name}`.`{collection_name}` r "
+                    f"{where}ORDER BY {order} LIMIT %s OFFSET %s"
+                )
+
+            recipes_sql = self._sql("get_all_data", database_name, collection_name,
+                                    (columns, sort, descending, after is not None, after_null), build_select)
+            args = self._keyset_args(sort, after) if after is not None else []
+            self._execute(cursor, recipes_sql, args + [limit, skip])
             recipes = cursor.fetchall()
 
             if not recipes:
                 return []
 
-            recipe_ids = [recipe["recipe_id"] for recipe in recipes]
+            if not include_ingredients:
+                return [{column: recipe[column] for column in columns} for recipe in recipes]
+
+            # Pad the id list to a bucketed size so only a few distinct IN statements exist
+            recipe_ids = pad_in_list([recipe["recipe_id"] for recipe in recipes])
 
-            format_strings = ','.join(['%s'] * len(recipe_ids))
-            ingredients_sql = (
+            ingredients_sql = self._sql("ingredients_in", database_name, "ingredients", len(recipe_ids), lambda: (
                 f"SELECT i.ingredient_id, i.recipe_id, i.ingredient_name, i.quantity "
                 f"FROM `{database_name}`.ingredients i "
-                f"WHERE i.recipe_id IN ({format_strings})"
-            )
-            cursor.execute(ingredients_sql, recipe_ids)
+                f"WHERE i.recipe_id IN ({','.join(['%s'] * len(recipe_ids))})"
+            ))
+            self._execute(cursor, ingredients_sql, recipe_ids)
             ingredients = cursor.fetchall()
 
             ingredients_map = {}
@@ -145,28 +542,129 @@ class MySQLRDBDataService(DataDataService):
                 })
 
             for recipe in recipes:
-                recipe_dict = {
-                    "recipe_id": recipe["recipe_id"],
-                    "name": recipe["name"],
-                    "steps": recipe["steps"],
-                    "time_to_cook": recipe["time_to_cook"],
-                    "meal_type": recipe["meal_type"],
-                    "calories": recipe["calories"],
-                    "rating": recipe["rating"],
-                    "ingredients": ingredients_map.get(recipe["recipe_id"], [])
-                }
+                recipe_dict = {column: recipe[column] for column in columns}
+                recipe_dict["ingredients"] = ingredients_map.get(recipe["recipe_id"], [])
                 results.append(recipe_dict)
 
+        except ServiceUnavailableException:
+            raise
         except Exception as e:
             print(f"Error in get_all_data: {e}")
             if connection:
-                connection.rollback()
+                self._rollback(connection)
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
 
         return results
 
+    def get_top_rated(self, database_name: str, collection_name: str, limit: int = 5,
+                      meal_types: list = None) -> dict:
+        """
+        The highest rated recipes of each meal type (recipes without a rating are left out).
+
+        Each meal type is a separate ORDER BY rating DESC LIMIT n branch of one UNION ALL statement, which
+        the (meal_type, rating) index answers by reading n index entries per meal type, however many
+        recipes there are. Without meal_types, the meal types are found with a loose scan of that index.
+
+        :return: {meal_type: [recipes without ingredients, best first]}
+        """
+        columns = self.RECIPE_COLUMNS
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+
+            if meal_types is None:
+                meal_types_sql = self._sql("meal_types", database_name, collection_name, 0, lambda: (
+                    f"SELECT DISTINCT `meal_type` FROM `{database_name}`.`{collection_name}` "
+                    f"WHERE `meal_type` IS NOT NULL"
+                ))
+                self._execute(cursor, meal_types_sql)
+                meal_types = sorted(row["meal_type"] for row in cursor.fetchall())
+            if not meal_types:
+                return {}
+
+            count = len(meal_types)
+            top_sql = self._sql("top_rated", database_name, collection_name, count, lambda: " UNION ALL ".join(
+                [f"(SELECT {', '.join(f'`{column}`' for column in columns)} "
+                 f"FROM `{database_name}`.`{collection_name}` "
+                 f"WHERE `meal_type` = %s AND `rating` IS NOT NULL "
+                 f"ORDER BY `rating` DESC, `recipe_id` DESC LIMIT %s)"] * count
+            ))
+            args = []
+            for meal_type in meal_types:
+                args.extend((meal_type, limit))
+            self._execute(cursor, top_sql, args)
+
+            top = {meal_type: [] for meal_type in meal_types}
+            # The collation matches meal types case-insensitively
+            requested = {meal_type.casefold(): meal_type for meal_type in meal_types}
+            for row in cursor.fetchall():
+                top[requested[row["meal_type"].casefold()]].append(row)
+            # UNION ALL keeps each branch's rows together, but does not promise their order
+            for rows in top.values():
+                rows.sort(key=lambda row: (row["rating"], row["recipe_id"]), reverse=True)
+            return top
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    # Recipe columns held by the columnar catalog snapshot.
+    SNAPSHOT_COLUMNS = ("recipe_id", "name", "meal_type", "calories", "time_to_cook", "rating")
+
+    def get_catalog_rows(self, database_name: str, collection_name: str, after_recipe_id: int = 0,
+                         limit: int = 5000, recipe_ids: list = None) -> tuple:
+        """
+        Read recipes for the catalog snapshot: either the next chunk of up to limit recipes with
+        recipe_id > after_recipe_id, in recipe_id order (keyset pagination, so a full load is a series of
+        short primary key range scans), or the given recipe_ids.
+
+        :return: (recipes, ingredients): recipes with the SNAPSHOT_COLUMNS, and (recipe_id, ingredient_name)
+            rows for them.
+        """
+        columns = ", ".join(f"`{column}`" for column in self.SNAPSHOT_COLUMNS)
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+
+            if recipe_ids is None:
+                chunk_sql = self._sql("catalog_chunk", database_name, collection_name, 2, lambda: (
+                    f"SELECT {columns} FROM `{database_name}`.`{collection_name}` "
+                    f"WHERE `recipe_id` > %s ORDER BY `recipe_id` LIMIT %s"
+                ))
+                self._execute(cursor, chunk_sql, (after_recipe_id, limit))
+            else:
+                recipe_ids = pad_in_list(list(recipe_ids))
+                rows_sql = self._sql("catalog_rows", database_name, collection_name, len(recipe_ids), lambda: (
+                    f"SELECT {columns} FROM `{database_name}`.`{collection_name}` "
+                    f"WHERE `recipe_id` IN ({', '.join(['%s'] * len(recipe_ids))})"
+                ))
+                self._execute(cursor, rows_sql, recipe_ids)
+            recipes = list(cursor.fetchall())
+            if not recipes:
+                return [], []
+
+            if recipe_ids is None:
+                # The chunk is a contiguous recipe_id range, which the (recipe_id, ingredient_name) index covers
+                ingredients_sql = self._sql("catalog_ingredients_range", database_name, "ingredients", 2, lambda: (
+                    f"SELECT `recipe_id`, `ingredient_name` FROM `{database_name}`.`ingredients` "
+                    f"WHERE `recipe_id` BETWEEN %s AND %s"
+                ))
+                self._execute(cursor, ingredients_sql, (recipes[0]["recipe_id"], recipes[-1]["recipe_id"]))
+            else:
+                ingredients_sql = self._sql("catalog_ingredients_in", database_name, "ingredients",
+                                            len(recipe_ids), lambda: (
+                    f"SELECT `recipe_id`, `ingredient_name` FROM `{database_name}`.`ingredients` "
+                    f"WHERE `recipe_id` IN ({', '.join(['%s'] * len(recipe_ids))})"
+                ))
+                self._execute(cursor, ingredients_sql, recipe_ids)
+            return recipes, list(cursor.fetchall())
+        finally:
+            if connection:
+                self._release_connection(connection)
+
     # def update_data(self,
     #                 database_name: str,
     #                 collection_name: str,
@@ -243,20 +741,320 @@ class MySQLRDBDataService(DataDataService):
     #             connection.close()
     #             print("Database connection closed.")
 
+    def _record_change(self, cursor, database_name: str, collection_name: str, recipe_id: int,
+                       operation: str, payload: dict = None):
+        """
+        Append a change event for a recipe to the outbox table, if one is configured. Must run inside the
+        write's transaction, while the recipe row still exists; the event carries the row's version.
+        """
+        if not self.change_outbox:
+            return
+        outbox = self.change_outbox
+        record_sql = self._sql("record_change", database_name, collection_name, outbox, lambda: (
+            f"INSERT INTO `{database_name}`.`{outbox}` (`recipe_id`, `operation`, `version`, `payload`) "
+            f"SELECT `recipe_id`, %s, `version`, %s FROM `{database_name}`.`{collection_name}` WHERE `recipe_id`=%s"
+        ))
+        self._execute(cursor, record_sql, [
+            operation, json.dumps(payload, default=str) if payload is not None else None, recipe_id
+        ])
+
+    def get_change_bounds(self, database_name: str) -> tuple:
+        """
+        :return: (first, last) change_id in the outbox, or (None, None) if it is empty.
+        """
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+            outbox = self.change_outbox
+            bounds_sql = self._sql("change_bounds", database_name, outbox, 0, lambda: (
+                f"SELECT MIN(`change_id`) AS first_id, MAX(`change_id`) AS last_id FROM `{database_name}`.`{outbox}`"
+            ))
+            self._execute(cursor, bounds_sql)
+            row = cursor.fetchone()
+            return row["first_id"], row["last_id"]
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def get_changes(self, database_name: str, after_change_id: int, limit: int = 100) -> list:
+        """
+        Read change events in order, starting after the given change_id (a primary key range scan).
+        """
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+            outbox = self.change_outbox
+            changes_sql = self._sql("get_changes", database_name, outbox, 2, lambda: (
+                f"SELECT `change_id`, `recipe_id`, `operation`, `version`, `payload`, `created_at` "
+                f"FROM `{database_name}`.`{outbox}` WHERE `change_id` > %s ORDER BY `change_id` LIMIT %s"
+            ))
+            self._execute(cursor, changes_sql, (after_change_id, limit))
+            changes = cursor.fetchall()
+            for change in changes:
+                if isinstance(change["payload"], (str, bytes)):
+                    change["payload"] = json.loads(change["payload"])
+            return list(changes)
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def get_pruned_change_id(self, database_name: str) -> int:
+        """
+        :return: The highest change_id deleted by prune_changes, or 0. Consumers whose offset is below it
+            missed changes; a gap in change_ids above it is a rolled back (or still running) write.
+        """
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+            outbox = self.change_outbox
+            pruned_sql = self._sql("get_pruned_change_id", database_name, outbox, 0, lambda: (
+                f"SELECT `through_change_id` FROM `{database_name}`.`{outbox}_pruned` WHERE `id`=1"
+            ))
+            self._execute(cursor, pruned_sql)
+            row = cursor.fetchone()
+            return row["through_change_id"] if row else 0
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def prune_changes(self, database_name: str, older_than_days: int) -> int:
+        """
+        Delete change events older than the given number of days, and record the highest change_id
+        deleted (see get_pruned_change_id). Consumers that resume from a pruned offset are told to
+        resynchronise, see GET /recipes/changes.
+        :return: The number of events deleted.
+        """
+        connection = None
+        try:
+            connection = self._get_connection()
+            cursor = connection.cursor()
+            outbox = self.change_outbox
+            connection.begin()
+            through_sql = self._sql("prune_changes_through", database_name, outbox, 1, lambda: (
+                f"SELECT MAX(`change_id`) AS through_change_id FROM `{database_name}`.`{outbox}` "
+                f"WHERE `created_at` < NOW() - INTERVAL %s DAY"
+            ))
+            self._execute(cursor, through_sql, [older_than_days])
+            through = cursor.fetchone()["through_change_id"]
+            if through is None:
+                connection.commit()
+                return 0
+            # By change_id, so that everything up to the recorded watermark is gone
+            prune_sql = self._sql("prune_changes", database_name, outbox, 1, lambda: (
+                f"DELETE FROM `{database_name}`.`{outbox}` WHERE `change_id` <= %s"
+            ))
+            deleted = self._execute(cursor, prune_sql, [through])
+            watermark_sql = self._sql("record_pruned_change_id", database_name, outbox, 1, lambda: (
+                f"INSERT INTO `{database_name}`.`{outbox}_pruned` (`id`, `through_change_id`) VALUES (1, %s) "
+                f"ON DUPLICATE KEY UPDATE `through_change_id` = GREATEST(`through_change_id`, "
+                f"VALUES(`through_change_id`))"
+            ))
+            self._execute(cursor, watermark_sql, [through])
+            connection.commit()
+            return deleted
+        except Exception:
+            if connection:
+                self._rollback(connection)
+            raise
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def _lock_rollup_rows(self, cursor, database_name: str, collection_name: str, recipe_ids: list) -> dict:
+        """
+        Read and lock the columns the statistics rollups depend on, before a write changes them.
+        :return: {recipe_id: {meal_type, rating, calories}} for the recipes that exist.
+        """
+        padded = pad_in_list(recipe_ids)
+        select_sql = self._sql("lock_rollup_rows", database_name, collection_name, len(padded), lambda: (
+            f"SELECT `recipe_id`, `meal_type`, `rating`, `calories` FROM `{database_name}`.`{collection_name}` "
+            f"WHERE `recipe_id` IN ({', '.join(['%s'] * len(padded))}) FOR UPDATE"
+        ))
+        self._execute(cursor, select_sql, padded)
+        return {row["recipe_id"]: row for row in cursor.fetchall()}
+
+    def _apply_stats(self, cursor, database_name: str, delta: StatsDelta):
+        """
+        Add a write's net effect to the rollup tables. Called last in the write's transaction, so the
+        (few, hot) meal type rows stay locked as briefly as possible.
+        """
+        meal_type_rows = delta.meal_type_rows()
+        if meal_type_rows:
+            # executemany sends a single multi-row INSERT
+            meal_types_sql = self._sql("apply_meal_type_stats", database_name, "recipe_stats_meal_types", 6, lambda: (
+                f"INSERT INTO `{database_name}`.`recipe_stats_meal_types` "
+                f"(`meal_type`, `recipe_count`, `rating_count`, `rating_sum`, `calorie_count`, `calorie_sum`) "
+                f"VALUES (%s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+                f"`recipe_count`=`recipe_count`+VALUES(`recipe_count`), "
+                f"`rating_count`=`rating_count`+VALUES(`rating_count`), "
+                f"`rating_sum`=`rating_sum`+VALUES(`rating_sum`), "
+                f"`calorie_count`=`calorie_count`+VALUES(`calorie_count`), "
+                f"`calorie_sum`=`calorie_sum`+VALUES(`calorie_sum`)"
+            ))
+            self._executemany(cursor, meal_types_sql, meal_type_rows)
+
+        calorie_rows = delta.calorie_rows()
+        if calorie_rows:
+            calories_sql = self._sql("apply_calorie_stats", database_name, "recipe_stats_calories", 2, lambda: (
+                f"INSERT INTO `{database_name}`.`recipe_stats_calories` (`bucket`, `recipe_count`) "
+                f"VALUES (%s, %s) ON DUPLICATE KEY UPDATE `recipe_count`=`recipe_count`+VALUES(`recipe_count`)"
+            ))
+            self._executemany(cursor, calories_sql, calorie_rows)
+
+        ingredient_rows = delta.ingredient_rows()
+        if ingredient_rows:
+            ingredients_sql = self._sql("apply_ingredient_stats", database_name, "recipe_stats_ingredients", 2, lambda: (
+                f"INSERT INTO `{database_name}`.`recipe_stats_ingredients` (`ingredient_name`, `recipe_count`) "
+                f"VALUES (%s, %s) ON DUPLICATE KEY UPDATE `recipe_count`=`recipe_count`+VALUES(`recipe_count`)"
+            ))
+            self._executemany(cursor, ingredients_sql, ingredient_rows)
+
+    def get_recipe_stats(self, database_name: str, top_ingredients: int = 10) -> dict:
+        """
+        Read the statistics rollups: per meal type counts and averages, the calorie histogram and the
+        most used ingredients. Reads a few summary rows, however large the catalog is.
+        """
+        connection = None
+        try:
+            connection = self._get_connection("read")
+            cursor = connection.cursor()
+
+            meal_types_sql = self._sql("get_meal_type_stats", database_name, "recipe_stats_meal_types", 0, lambda: (
+                f"SELECT `meal_type`, `recipe_count`, `rating_count`, `rating_sum`, `calorie_count`, `calorie_sum` "
+                f"FROM `{database_name}`.`recipe_stats_meal_types` WHERE `recipe_count` > 0 ORDER BY `meal_type`"
+            ))
+            self._execute(cursor, meal_types_sql)
+            meal_types = [{
+                "meal_type": row["meal_type"] or None,
+                "count": row["recipe_count"],
+                "average_rating": row["rating_sum"] / row["rating_count"] if row["rating_count"] else None,
+                "average_calories": row["calorie_sum"] / row["calorie_count"] if row["calorie_count"] else None,
+            } for row in cursor.fetchall()]
+
+            calories_sql = self._sql("get_calorie_stats", database_name, "recipe_stats_calories", 0, lambda: (
+                f"SELECT `bucket`, `recipe_count` FROM `{database_name}`.`recipe_stats_calories` "
+                f"WHERE `recipe_count` > 0 ORDER BY `bucket`"
+            ))
+            self._execute(cursor, calories_sql)
+            calories = [{"min": row["bucket"], "max": row["bucket"] + CALORIE_BUCKET_WIDTH, "count": row["recipe_count"]}
+                        for row in cursor.fetchall()]
+
+            # Both keys descending: a backward scan of the count index, whose entries end with the primary
+            # key, returns the rows in this order without a sort. Ties list names in reverse order.
+            ingredients_sql = self._sql("get_ingredient_stats", database_name, "recipe_stats_ingredients", 1, lambda: (
+                f"SELECT `ingredient_name`, `recipe_count` FROM `{database_name}`.`recipe_stats_ingredients` "
+                f"WHERE `recipe_count` > 0 ORDER BY `recipe_count` DESC, `ingredient_name` DESC LIMIT %s"
+            ))
+            self._execute(cursor, ingredients_sql, [top_ingredients])
+            ingredients = [{"ingredient_name": row["ingredient_name"], "count": row["recipe_count"]}
+                           for row in cursor.fetchall()]
+
+            return {
+                "total_recipes": sum(m["count"] for m in meal_types),
+                "meal_types": meal_types,
+                "calories": calories,
+                "top_ingredients": ingredients,
+            }
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def rebuild_stats(self, database_name: str, collection_name: str):
+        """
+        Recompute the rollup tables from the recipes and ingredients tables, in one transaction. Used to
+        seed them and to repair drift; writes wait on the rollup row locks while it runs.
+        """
+        meal_types_sql = (
+            f"INSERT INTO `{database_name}`.`recipe_stats_meal_types` "
+            f"(`meal_type`, `recipe_count`, `rating_count`, `rating_sum`, `calorie_count`, `calorie_sum`) "
+            f"SELECT COALESCE(`meal_type`, ''), COUNT(*), COUNT(`rating`), COALESCE(SUM(`rating`), 0), "
+            f"COUNT(`calories`), COALESCE(SUM(`calories`), 0) "
+            f"FROM `{database_name}`.`{collection_name}` GROUP BY COALESCE(`meal_type`, '')"
+        )
+        calories_sql = (
+            f"INSERT INTO `{database_name}`.`recipe_stats_calories` (`bucket`, `recipe_count`) "
+            f"SELECT FLOOR(`calories` / {CALORIE_BUCKET_WIDTH}) * {CALORIE_BUCKET_WIDTH} AS `bucket`, COUNT(*) "
+            f"FROM `{database_name}`.`{collection_name}` WHERE `calories` IS NOT NULL GROUP BY `bucket`"
+        )
+        ingredients_sql = (
+            f"INSERT INTO `{database_name}`.`recipe_stats_ingredients` (`ingredient_name`, `recipe_count`) "
+            f"SELECT `ingredient_name`, COUNT(*) FROM `{database_name}`.`ingredients` GROUP BY `ingredient_name`"
+        )
+        connection = None
+        try:
+            connection = self._get_connection()
+            cursor = connection.cursor()
+            connection.begin()
+            for table in ("recipe_stats_meal_types", "recipe_stats_calories", "recipe_stats_ingredients"):
+                self._execute(cursor, f"DELETE FROM `{database_name}`.`{table}`")
+            self._execute(cursor, meal_types_sql)
+            self._execute(cursor, calories_sql)
+            self._execute(cursor, ingredients_sql)
+            connection.commit()
+        except Exception:
+            if connection:
+                self._rollback(connection)
+            raise
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    def _get_recipe_id(self, cursor, database_name: str, collection_name: str, key_field: str, key_value: any):
+        """
+        Resolve the recipe_id for a key field/value. Raises NotFoundException if there is no such recipe.
+        """
+        select_sql = self._sql(
+            "get_recipe_id", database_name, collection_name, key_field,
+            lambda: f"SELECT recipe_id FROM `{database_name}`.`{collection_name}` WHERE `{key_field}`=%s"
+        )
+        self._execute(cursor, select_sql, [key_value])
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundException(f"Recipe with {key_field}={key_value} not found")
+        return result['recipe_id']
+
+    def _check_version_conflict(self, cursor, database_name: str, collection_name: str, recipe_id: int):
+        """
+        Called when a version-checked statement matched no row. Raises NotFoundException if the recipe
+        is gone, otherwise VersionConflictException carrying the version that is stored now.
+        """
+        select_sql = self._sql(
+            "get_version", database_name, collection_name, 1,
+            lambda: f"SELECT `version` FROM `{database_name}`.`{collection_name}` WHERE `recipe_id`=%s"
+        )
+        self._execute(cursor, select_sql, [recipe_id])
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundException(f"Recipe with recipe_id={recipe_id} not found")
+        raise VersionConflictException(
+            f"Recipe with recipe_id={recipe_id} has been modified (current version {result['version']})",
+            current_version=result['version']
+        )
+
     def update_data(self,
                 database_name: str,
                 collection_name: str,
                 data: dict,
                 key_field: str,
-                key_value: any):
+                key_value: any,
+                expected_version: int = None):
         """
         Update a data object in the specified database and collection/table,
         and properly update related ingredients if provided.
+
+        Every update increments the recipe's version column. If expected_version is given, the update
+        only applies when the stored version still matches it (optimistic concurrency); otherwise
+        VersionConflictException is raised and the transaction is rolled back.
+
+        :return: The recipe_id of the updated recipe.
         """
         connection = None
 
         try:
-            connection = self._get_connection()
+            connection = self._get_connection("write")
             cursor = connection.cursor()
             connection.begin()
 
@@ -264,6 +1062,7 @@ class MySQLRDBDataService(DataDataService):
             ingredients = data.pop('ingredients', None)
             data.pop('links', None)
             data.pop('recipe_id', None)
+            data.pop('version', None)
 
             # Remove fields with non-serializable values
             for key in list(data.keys()):
@@ -271,33 +1070,54 @@ class MySQLRDBDataService(DataDataService):
                     print(f"Removing field '{key}' with non-serializable value: {data[key]}")
                     data.pop(key)
 
-            # Update the main recipe data
-            if data:
-                set_clause = ", ".join([f"`{field}`=%s" for field in data.keys()])
-                sql_statement = f"UPDATE `{database_name}`.`{collection_name}` SET {set_clause} WHERE `{key_field}`=%s"
-                values = list(data.values()) + [key_value]
-
-                print("Data before SQL execution:", data)
-                print("Values before SQL execution:", values)
-
-                cursor.execute(sql_statement, values)
-                print(f"Updated recipes table for {key_field}={key_value}")
-
             # Get the recipe ID
-            select_sql = f"SELECT recipe_id FROM `{database_name}`.`{collection_name}` WHERE `{key_field}`=%s"
-            cursor.execute(select_sql, [key_value])
-            result = cursor.fetchone()
-            if not result:
-                raise Exception(f"Recipe with {key_field}={key_value} not found")
-            recipe_id = result['recipe_id']
+            if key_field != 'recipe_id':
+                recipe_id = self._get_recipe_id(cursor, database_name, collection_name, key_field, key_value)
+            else:
+                recipe_id = key_value
+
+            # Lock the recipe and read what the statistics rollups depend on before changing it
+            stats = StatsDelta() if self.stats_rollups else None
+            if stats is not None and set(data) & set(ROLLUP_COLUMNS):
+                before = self._lock_rollup_rows(cursor, database_name, collection_name, [recipe_id]).get(recipe_id)
+                if before:
+                    stats.remove_recipe(before)
+                    stats.add_recipe(dict(before, **data))
+
+            # Update the main recipe data and bump the version, even if only ingredients change
+            columns = dict(data)
+            if "name" in columns:
+                columns["name_normalized"] = normalize_name(columns["name"])
+            fields = tuple(columns.keys())
+            check_version = expected_version is not None
+
+            def build_update():
+                set_clause = ", ".join([f"`{field}`=%s" for field in fields] + ["`version`=`version`+1"])
+                sql = f"UPDATE `{database_name}`.`{collection_name}` SET {set_clause} WHERE `recipe_id`=%s"
+                if check_version:
+                    sql += " AND `version`=%s"
+                return sql
+
+            sql_statement = self._sql("update", database_name, collection_name, (fields, check_version), build_update)
+            values = list(columns.values()) + [recipe_id]
+            if check_version:
+                values.append(expected_version)
+
+            print("Data before SQL execution:", data)
+            print("Values before SQL execution:", values)
+
+            self._execute(cursor, sql_statement, values)
+            if cursor.rowcount == 0:
+                self._check_version_conflict(cursor, database_name, collection_name, recipe_id)
+            print(f"Updated recipes table for {key_field}={key_value}")
 
             # Update ingredients if provided
             if ingredients is not None:
                 # Get existing ingredients for the recipe
-                select_ingredients_sql = (
+                select_ingredients_sql = self._sql("select_ingredients", database_name, "ingredients", 1, lambda: (
                     f"SELECT `ingredient_name`, `quantity` FROM `{database_name}`.`ingredients` WHERE `recipe_id`=%s"
-                )
-                cursor.execute(select_ingredients_sql, [recipe_id])
+                ))
+                self._execute(cursor, select_ingredients_sql, [recipe_id])
                 existing_ingredients = {row['ingredient_name']: row['quantity'] for row in cursor.fetchall()}
 
                 # Separate ingredients into update, insert, and delete groups
@@ -321,44 +1141,56 @@ class MySQLRDBDataService(DataDataService):
 
                 # Perform updates
                 if ingredients_to_update:
-                    update_sql = (
+                    update_sql = self._sql("update_ingredient", database_name, "ingredients", 3, lambda: (
                         f"UPDATE `{database_name}`.`ingredients` "
                         f"SET `quantity`=%s WHERE `recipe_id`=%s AND `ingredient_name`=%s"
-                    )
-                    cursor.executemany(update_sql, ingredients_to_update)
+                    ))
+                    self._executemany(cursor, update_sql, ingredients_to_update)
                     print(f"Updated {len(ingredients_to_update)} ingredients.")
 
                 # Perform inserts
                 if ingredients_to_insert:
-                    insert_sql = (
+                    insert_sql = self._sql("insert_ingredient", database_name, "ingredients", 3, lambda: (
                         f"INSERT INTO `{database_name}`.`ingredients` (`recipe_id`, `ingredient_name`, `quantity`) "
                         f"VALUES (%s, %s, %s)"
-                    )
-                    cursor.executemany(insert_sql, ingredients_to_insert)
+                    ))
+                    self._executemany(cursor, insert_sql, ingredients_to_insert)
                     print(f"Inserted {len(ingredients_to_insert)} new ingredients.")
 
                 # Perform deletions
                 if ingredients_to_delete:
-                    delete_sql = (
+                    delete_sql = self._sql("delete_ingredient", database_name, "ingredients", 2, lambda: (
                         f"DELETE FROM `{database_name}`.`ingredients` "
                         f"WHERE `recipe_id`=%s AND `ingredient_name`=%s"
-                    )
-                    cursor.executemany(delete_sql, [(recipe_id, name) for name in ingredients_to_delete])
+                    ))
+                    self._executemany(cursor, delete_sql, [(recipe_id, name) for name in ingredients_to_delete])
                     print(f"Deleted {len(ingredients_to_delete)} ingredients.")
 
+                if stats is not None:
+                    stats.add_ingredients(name for _, name, _ in ingredients_to_insert)
+                    stats.remove_ingredients(ingredients_to_delete)
+
+            changes = dict(data)
+            if ingredients is not None:
+                changes["ingredients"] = ingredients
+            self._record_change(cursor, database_name, collection_name, recipe_id, "update", changes)
+            if stats:
+                self._apply_stats(cursor, database_name, stats)
+
             connection.commit()
             print("Transaction committed successfully.")
+            return recipe_id
 
         except Exception as e:
             print(f"Error in update_data: {e}")
             if connection:
-                connection.rollback()
+                self._rollback(connection)
                 print("Transaction rolled back due to error.")
             raise
 
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
                 print("Database connection closed.")
 
 
@@ -366,16 +1198,22 @@ class MySQLRDBDataService(DataDataService):
                     database_name: str,
                     collection_name: str,
                     key_field: str,
-                    key_value: any):
+                    key_value: any,
+                    expected_version: int = None):
         """
         Delete a data object from the specified database and collection/table,
         including related ingredients and nutrition information.
+
+        If expected_version is given, the delete only applies when the stored version still matches it;
+        otherwise VersionConflictException is raised and nothing is deleted.
+
+        :return: The recipe_id of the deleted recipe.
         """
 
         connection = None
 
         try:
-            connection = self._get_connection()
+            connection = self._get_connection("write")
             cursor = connection.cursor()
 
             # Start transaction
@@ -383,45 +1221,301 @@ class MySQLRDBDataService(DataDataService):
 
             # Get recipe_id if key_field is not 'recipe_id'
             if key_field != 'recipe_id':
-                select_sql = f"SELECT recipe_id FROM `{database_name}`.`{collection_name}` WHERE `{key_field}`=%s"
-                cursor.execute(select_sql, [key_value])
-                result = cursor.fetchone()
-                if not result:
-                    raise Exception(f"Recipe with {key_field}={key_value} not found")
-                recipe_id = result['recipe_id']
+                recipe_id = self._get_recipe_id(cursor, database_name, collection_name, key_field, key_value)
             else:
                 recipe_id = key_value
 
+            # Claim the expected version before deleting, so a concurrent writer makes one of us fail
+            if expected_version is not None:
+                claim_sql = self._sql("claim_version", database_name, collection_name, 2, lambda: (
+                    f"UPDATE `{database_name}`.`{collection_name}` SET `version`=`version`+1 "
+                    f"WHERE `recipe_id`=%s AND `version`=%s"
+                ))
+                self._execute(cursor, claim_sql, [recipe_id, expected_version])
+                if cursor.rowcount == 0:
+                    self._check_version_conflict(cursor, database_name, collection_name, recipe_id)
+
+            stats = None
+            if self.stats_rollups:
+                stats = StatsDelta()
+                before = self._lock_rollup_rows(cursor, database_name, collection_name, [recipe_id]).get(recipe_id)
+                if before:
+                    stats.remove_recipe(before)
+                names_sql = self._sql("select_ingredient_names", database_name, "ingredients", 1, lambda: (
+                    f"SELECT `ingredient_name` FROM `{database_name}`.`ingredients` WHERE `recipe_id`=%s"
+                ))
+                self._execute(cursor, names_sql, [recipe_id])
+                stats.remove_ingredients(row["ingredient_name"] for row in cursor.fetchall())
+
             # Delete related records from 'nutrition' table
             # delete_nutrition_sql = f"DELETE FROM `nutrition_db`.`nutrition` WHERE `recipe_id`=%s"
             # cursor.execute(delete_nutrition_sql, [recipe_id])
             # print(f"Deleted nutrition information for recipe_id={recipe_id}")
 
             # Delete related records from 'ingredients' table
-            delete_ingredients_sql = f"DELETE FROM `{database_name}`.`ingredients` WHERE `recipe_id`=%s"
-            cursor.execute(delete_ingredients_sql, [recipe_id])
+            delete_ingredients_sql = self._sql(
+                "delete_ingredients", database_name, "ingredients", 1,
+                lambda: f"DELETE FROM `{database_name}`.`ingredients` WHERE `recipe_id`=%s"
+            )
+            self._execute(cursor, delete_ingredients_sql, [recipe_id])
             print(f"Deleted ingredients for recipe_id={recipe_id}")
 
+            self._record_change(cursor, database_name, collection_name, recipe_id, "delete")
+
             # Delete recipe from 'recipes' table
-            delete_recipe_sql = f"DELETE FROM `{database_name}`.`{collection_name}` WHERE `recipe_id`=%s"
-            cursor.execute(delete_recipe_sql, [recipe_id])
+            delete_recipe_sql = self._sql(
+                "delete", database_name, collection_name, 1,
+                lambda: f"DELETE FROM `{database_name}`.`{collection_name}` WHERE `recipe_id`=%s"
+            )
+            self._execute(cursor, delete_recipe_sql, [recipe_id])
             print(f"Deleted recipe with recipe_id={recipe_id}")
+            if stats and cursor.rowcount:
+                self._apply_stats(cursor, database_name, stats)
 
             # Commit transaction
             connection.commit()
             print("Transaction committed successfully.")
+            return recipe_id
 
         except Exception as e:
             print(f"Error in delete_data: {e}")
             if connection:
-                connection.rollback()
+                self._rollback(connection)
                 print("Transaction rolled back due to error.")
             raise e
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
                 print("Database connection closed.")
 
+    # Recipes deleted per transaction by delete_data_bulk(). A power of two, so full chunks share one statement.
+    BULK_DELETE_CHUNK_SIZE = 512
+
+    def delete_data_bulk(self, database_name: str, collection_name: str, recipe_ids=None, filters: dict = None,
+                         progress=None, chunk_size: int = None) -> int:
+        """
+        Delete many recipes with their ingredients: those in recipe_ids, or all that match filters, or those
+        in recipe_ids that also match filters.
+
+        Recipes are deleted in chunks of chunk_size (BULK_DELETE_CHUNK_SIZE by default), in recipe_id
+        order. Each chunk is its own transaction: its rows are selected and locked, then deleted with one
+        statement per table, with their change events and statistics, and committed. Locks are never held
+        on more than one chunk, but a delete that fails part-way leaves the chunks committed so far deleted.
+
+        :param recipe_ids: Recipes to delete; ids that do not exist are ignored.
+        :param filters: {column: value} equality conditions, None matching NULL.
+        :param progress: Called as progress(recipe_ids, names, total_deleted) after each chunk is committed.
+        :return: The number of recipes deleted.
+        """
+        filters = dict(filters or {})
+        for column in filters:
+            if column not in self.RECIPE_COLUMNS or column in ("recipe_id", "version"):
+                raise ValueError(f"Cannot filter deletes on {column}")
+        if recipe_ids is None and not filters:
+            raise ValueError("A bulk delete needs recipe_ids or filters")
+        chunk_size = chunk_size or self.BULK_DELETE_CHUNK_SIZE
+
+        columns = tuple(sorted(filters))
+        nulls = tuple(filters[column] is None for column in columns)
+        filter_args = [filters[column] for column in columns if filters[column] is not None]
+        filter_sql = "".join(
+            f" AND `{column}` IS NULL" if is_null else f" AND `{column}`=%s" for column, is_null in zip(columns, nulls)
+        )
+        id_chunks = None
+        if recipe_ids is not None:
+            ids = sorted(set(recipe_ids))
+            id_chunks = iter([ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)])
+
+        def in_list(size):
+            return ", ".join(["%s"] * size)
+
+        connection = None
+        total = 0
+        after = 0
+        try:
+            connection = self._get_connection("write")
+            cursor = connection.cursor()
+            while True:
+                # Select and lock the next chunk
+                if id_chunks is not None:
+                    chunk = next(id_chunks, None)
+                    if chunk is None:
+                        break
+                    padded = pad_in_list(chunk)
+                    select_sql = self._sql("bulk_delete_select_ids", database_name, collection_name,
+                                           (columns, nulls, len(padded)), lambda: (
+                        f"SELECT `recipe_id`, `name`, `meal_type`, `rating`, `calories` "
+                        f"FROM `{database_name}`.`{collection_name}` "
+                        f"WHERE `recipe_id` IN ({in_list(len(padded))}){filter_sql} FOR UPDATE"
+                    ))
+                    select_args = padded + filter_args
+                else:
+                    select_sql = self._sql("bulk_delete_select", database_name, collection_name,
+                                           (columns, nulls), lambda: (
+                        f"SELECT `recipe_id`, `name`, `meal_type`, `rating`, `calories` "
+                        f"FROM `{database_name}`.`{collection_name}` "
+                        f"WHERE `recipe_id` > %s{filter_sql} ORDER BY `recipe_id` LIMIT %s FOR UPDATE"
+                    ))
+                    select_args = [after] + filter_args + [chunk_size]
+
+                connection.begin()
+                self._execute(cursor, select_sql, select_args)
+                rows = cursor.fetchall()
+                if not rows:
+                    connection.commit()
+                    if id_chunks is not None:
+                        continue
+                    break
+                deleted = [row["recipe_id"] for row in rows]
+                after = deleted[-1]
+                padded = pad_in_list(deleted)
+                size = len(padded)
+
+                stats = None
+                if self.stats_rollups:
+                    stats = StatsDelta()
+                    for row in rows:
+                        stats.remove_recipe(row)
+                    names_sql = self._sql("select_ingredient_names_in", database_name, "ingredients", size, lambda: (
+                        f"SELECT `ingredient_name` FROM `{database_name}`.`ingredients` "
+                        f"WHERE `recipe_id` IN ({in_list(size)})"
+                    ))
+                    self._execute(cursor, names_sql, padded)
+                    stats.remove_ingredients(row["ingredient_name"] for row in cursor.fetchall())
+
+                delete_ingredients_sql = self._sql("delete_ingredients_in", database_name, "ingredients", size, lambda: (
+                    f"DELETE FROM `{database_name}`.`ingredients` WHERE `recipe_id` IN ({in_list(size)})"
+                ))
+                self._execute(cursor, delete_ingredients_sql, padded)
+
+                if self.change_outbox:
+                    outbox = self.change_outbox
+                    record_sql = self._sql("record_deletes", database_name, collection_name, size, lambda: (
+                        f"INSERT INTO `{database_name}`.`{outbox}` (`recipe_id`, `operation`, `version`, `payload`) "
+                        f"SELECT `recipe_id`, 'delete', `version`, NULL FROM `{database_name}`.`{collection_name}` "
+                        f"WHERE `recipe_id` IN ({in_list(size)})"
+                    ))
+                    self._execute(cursor, record_sql, padded)
+
+                delete_sql = self._sql("delete_in", database_name, collection_name, size, lambda: (
+                    f"DELETE FROM `{database_name}`.`{collection_name}` WHERE `recipe_id` IN ({in_list(size)})"
+                ))
+                self._execute(cursor, delete_sql, padded)
+                if stats:
+                    self._apply_stats(cursor, database_name, stats)
+                connection.commit()
+
+                total += len(deleted)
+                logger.debug("Bulk delete: %d recipes deleted, %d so far", len(deleted), total)
+                if progress is not None:
+                    progress(deleted, [row["name"] for row in rows], total)
+            return total
+
+        except Exception as e:
+            logger.error("Bulk delete failed after %d recipes: %s", total, e)
+            if connection:
+                self._rollback(connection)
+            raise
+
+        finally:
+            if connection:
+                self._release_connection(connection)
+
+    # Maximum recipes per batched UPDATE statement.
+    BATCH_UPDATE_SIZE = 256
+
+    def update_fields_batch(self, database_name: str, collection_name: str, updates: dict) -> list:
+        """
+        Write scalar column updates for many recipes in one transaction, with one
+        UPDATE ... SET col = CASE recipe_id WHEN ... END statement per chunk of recipes that update the
+        same columns. Each updated recipe's version is incremented once, and one change event per recipe
+        is recorded. Recipes that no longer exist are skipped.
+
+        :param updates: {recipe_id: {column: value}}
+        :return: The recipe_ids written.
+        """
+        groups = {}
+        for recipe_id, fields in updates.items():
+            columns = tuple(sorted(fields))
+            for column in columns:
+                # name is left out: it would also have to update name_normalized
+                if column not in self.RECIPE_COLUMNS or column in ("recipe_id", "version", "name"):
+                    raise ValueError(f"Column {column} cannot be batch updated")
+            groups.setdefault(columns, []).append(recipe_id)
+
+        connection = None
+        try:
+            connection = self._get_connection("write")
+            cursor = connection.cursor()
+            connection.begin()
+
+            stats = StatsDelta() if self.stats_rollups else None
+            for columns, recipe_ids in groups.items():
+                for start in range(0, len(recipe_ids), self.BATCH_UPDATE_SIZE):
+                    # Padding repeats the last recipe, which sets the same values again
+                    chunk = pad_in_list(recipe_ids[start:start + self.BATCH_UPDATE_SIZE])
+                    size = len(chunk)
+
+                    if stats is not None and set(columns) & set(ROLLUP_COLUMNS):
+                        before = self._lock_rollup_rows(cursor, database_name, collection_name,
+                                                        recipe_ids[start:start + self.BATCH_UPDATE_SIZE])
+                        for recipe_id, row in before.items():
+                            stats.remove_recipe(row)
+                            stats.add_recipe(dict(row, **updates[recipe_id]))
+
+                    def build_update():
+                        cases = ", ".join(
+                            f"`{column}` = CASE `recipe_id` {' '.join(['WHEN %s THEN %s'] * size)} END"
+                            for column in columns
+                        )
+                        placeholders = ", ".join(["%s"] * size)
+                        return (
+                            f"UPDATE `{database_name}`.`{collection_name}` SET {cases}, `version`=`version`+1 "
+                            f"WHERE `recipe_id` IN ({placeholders})"
+                        )
+
+                    update_sql = self._sql("update_fields_batch", database_name, collection_name,
+                                           (columns, size), build_update)
+                    args = []
+                    for column in columns:
+                        for recipe_id in chunk:
+                            args.extend((recipe_id, updates[recipe_id][column]))
+                    args.extend(chunk)
+                    self._execute(cursor, update_sql, args)
+
+                    if self.change_outbox:
+                        outbox = self.change_outbox
+
+                        def build_record():
+                            payload = ", ".join(f"'{column}', `{column}`" for column in columns)
+                            placeholders = ", ".join(["%s"] * size)
+                            return (
+                                f"INSERT INTO `{database_name}`.`{outbox}` "
+                                f"(`recipe_id`, `operation`, `version`, `payload`) "
+                                f"SELECT `recipe_id`, 'update', `version`, JSON_OBJECT({payload}) "
+                                f"FROM `{database_name}`.`{collection_name}` WHERE `recipe_id` IN ({placeholders})"
+                            )
+
+                        record_sql = self._sql("record_changes_batch", database_name, collection_name,
+                                               (columns, size), build_record)
+                        self._execute(cursor, record_sql, chunk)
+
+            if stats:
+                self._apply_stats(cursor, database_name, stats)
+            connection.commit()
+            logger.debug("Batch updated %d recipes", len(updates))
+            return list(updates)
+
+        except Exception as e:
+            logger.error("Batch update of %d recipes failed: %s", len(updates), e)
+            if connection:
+                self._rollback(connection)
+            raise
+
+        finally:
+            if connection:
+                self._release_connection(connection)
+
     # def insert_data(self, database_name: str, collection_name: str, data: dict):
     #     """
     #     Insert a new recipe into the database, including its ingredients.
@@ -511,7 +1605,7 @@ class MySQLRDBDataService(DataDataService):
         connection = None
 
         try:
-            connection = self._get_connection()
+            connection = self._get_connection("write")
             cursor = connection.cursor()
 
             connection.begin()
@@ -519,6 +1613,7 @@ class MySQLRDBDataService(DataDataService):
             # Remove unwanted fields from data
             data.pop('links', None)
             data.pop('recipe_id', None)
+            data.pop('version', None)
             ingredients = data.pop('ingredients', [])
 
             # Remove non-serializable fields
@@ -527,54 +1622,70 @@ class MySQLRDBDataService(DataDataService):
                     print(f"Removing field '{key}' with non-serializable value: {data[key]}")
                     data.pop(key)
 
-            # Insert recipe
-            recipe_fields = list(data.keys())
-            recipe_values = list(data.values())
-            fields = ', '.join([f"`{field}`" for field in recipe_fields])
-            placeholders = ', '.join(['%s'] * len(recipe_fields))
-            insert_recipe_sql = f"INSERT INTO `{database_name}`.`{collection_name}` ({fields}) VALUES ({placeholders})"
+            # Insert recipe, with the lookup form of its name
+            columns = dict(data)
+            if "name" in columns:
+                columns["name_normalized"] = normalize_name(columns["name"])
+            recipe_fields = tuple(columns.keys())
+            recipe_values = list(columns.values())
+
+            def build_insert():
+                fields = ', '.join([f"`{field}`" for field in recipe_fields])
+                placeholders = ', '.join(['%s'] * len(recipe_fields))
+                return f"INSERT INTO `{database_name}`.`{collection_name}` ({fields}) VALUES ({placeholders})"
 
-            cursor.execute(insert_recipe_sql, recipe_values)
+            insert_recipe_sql = self._sql("insert", database_name, collection_name, recipe_fields, build_insert)
+
+            self._execute(cursor, insert_recipe_sql, recipe_values)
             recipe_id = cursor.lastrowid
             print(f"Inserted recipe '{data.get('name')}' with ID {recipe_id} into '{collection_name}' table.")
 
             ingredient_ids = []
             if ingredients:
                 # Insert ingredients and fetch their IDs
-                insert_ingredient_sql = (
+                insert_ingredient_sql = self._sql("insert_ingredient", database_name, "ingredients", 3, lambda: (
                     f"INSERT INTO `{database_name}`.`ingredients` (`recipe_id`, `ingredient_name`, `quantity`) "
                     f"VALUES (%s, %s, %s)"
-                )
+                ))
                 for ingredient in ingredients:
-                    cursor.execute(insert_ingredient_sql, (recipe_id, ingredient['ingredient_name'], ingredient['quantity']))
+                    self._execute(cursor, insert_ingredient_sql, (recipe_id, ingredient['ingredient_name'], ingredient['quantity']))
                     ingredient_id = cursor.lastrowid
                     ingredient['ingredient_id'] = ingredient_id  # Add generated ID to ingredient
                     ingredient_ids.append(ingredient_id)
                     print(f"Inserted ingredient '{ingredient['ingredient_name']}' with ID {ingredient_id}.")
 
+            self._record_change(cursor, database_name, collection_name, recipe_id, "create",
+                                dict(data, ingredients=ingredients))
+            if self.stats_rollups:
+                stats = StatsDelta()
+                stats.add_recipe(data)
+                stats.add_ingredients(ingredient['ingredient_name'] for ingredient in ingredients)
+                self._apply_stats(cursor, database_name, stats)
+
             connection.commit()
             print("Transaction committed successfully.")
 
             # Return recipe data including generated IDs
             data['recipe_id'] = recipe_id
+            data['version'] = 1
             data['ingredients'] = ingredients
             return data
 
-        except pymysql.err.IntegrityError as e:
+        except ConstraintViolationException as e:
             print(f"Integrity error in insert_data: {e}")
             if connection:
-                connection.rollback()
+                self._rollback(connection)
                 print("Transaction rolled back due to integrity error.")
             raise e
         except Exception as e:
             print(f"Error in insert_data: {e}")
             if connection:
-                connection.rollback()
+                self._rollback(connection)
                 print("Transaction rolled back due to error.")
             raise e
         finally:
             if connection:
-                connection.close()
+                self._release_connection(connection)
                 print("Database connection closed.")
 
 
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+
+# EXPLAIN access types that read the whole table or the whole index.
+FULL_SCAN_TYPES = {"ALL": "full table scan", "index": "full index scan"}
+
+# Extra notes worth a warning even when an index is used.
+EXPENSIVE_EXTRAS = ("Using filesort", "Using temporary")
+
+
+class QueryPlanChecker:
+    """
+    Records the statements a MySQLRDBDataService issues and runs EXPLAIN on each of them,
+    flagging full scans, filesorts and temporary tables.
+
+    Usage:
+        checker = QueryPlanChecker(data_service)
+        with checker.recording():
+            ... exercise the data service ...
+        findings = checker.check()
+    """
+
+    def __init__(self, data_service):
+        self.data_service = data_service
+        self.statements = {}
+
+    def _record(self, sql, args, elapsed):
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        if verb not in ("SELECT", "UPDATE", "DELETE"):
+            return
+        # executemany() passes a sequence of parameter tuples; one is enough for a plan.
+        if isinstance(args, list) and args and isinstance(args[0], (list, tuple)):
+            args = args[0]
+        key = " ".join(sql.split())
+        if key not in self.statements:
+            self.statements[key] = (sql, args)
+
+    @contextmanager
+    def recording(self):
+        self.data_service.statement_listeners.append(self._record)
+        try:
+            yield self
+        finally:
+            self.data_service.statement_listeners.remove(self._record)
+
+    def explain(self, sql, args=None) -> list:
+        connection = None
+        try:
+            connection = self.data_service._get_connection()
+            cursor = connection.cursor()
+            cursor.execute("EXPLAIN " + sql, args)
+            return cursor.fetchall()
+        finally:
+            if connection:
+                self.data_service._release_connection(connection)
+
+    def check(self) -> list:
+        """
+        EXPLAIN every recorded statement.
+
+        :return: A list of findings, one dict per recorded statement, with keys
+            sql, plan (the EXPLAIN rows), problems (list of strings, empty if the plan is fine).
+        """
+        findings = []
+        for key, (sql, args) in self.statements.items():
+            plan = self.explain(sql, args)
+            problems = []
+            for row in plan:
+                table = row.get("table")
+                access_type = row.get("type")
+                if access_type in FULL_SCAN_TYPES:
+                    problems.append(f"{FULL_SCAN_TYPES[access_type]} on {table} (rows={row.get('rows')})")
+                extra = row.get("Extra") or ""
+                for note in EXPENSIVE_EXTRAS:
+                    if note in extra:
+                        problems.append(f"{note.lower()} on {table}")
+            findings.append({"sql": key, "plan": plan, "problems": problems})
+        return findings
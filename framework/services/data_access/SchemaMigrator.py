@@ -0,0 +1,137 @@
+import os
+import re
+
+DEFAULT_MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "migrations"
+)
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+def split_statements(sql_text: str) -> list:
+    """
+    Split a migration script into individual statements. Supports the mysql client's
+    DELIMITER directive so that trigger and procedure bodies can contain ';'.
+    Lines starting with '--' are comments.
+    """
+    statements = []
+    delimiter = ";"
+    current = []
+
+    for line in sql_text.splitlines():
+        stripped = line.strip()
+        if not current and (not stripped or stripped.startswith("--")):
+            continue
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = "\n".join(current).rstrip()
+            statement = statement[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            current = []
+
+    leftover = "\n".join(current).strip()
+    if leftover:
+        statements.append(leftover)
+    return statements
+
+
+class SchemaMigrator:
+    """
+    Applies the versioned SQL scripts in the migrations directory in order and records each
+    applied version in a schema_migrations table, so every environment converges to the same schema.
+    """
+
+    def __init__(self, data_service, database_name: str, migrations_dir: str = DEFAULT_MIGRATIONS_DIR):
+        self.data_service = data_service
+        self.database_name = database_name
+        self.migrations_dir = migrations_dir
+
+    def discover(self) -> list:
+        """
+        :return: A list of (version, name, path) for every migration file, sorted by version.
+        """
+        migrations = []
+        for file_name in os.listdir(self.migrations_dir):
+            match = MIGRATION_FILE_PATTERN.match(file_name)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2),
+                                   os.path.join(self.migrations_dir, file_name)))
+        migrations.sort()
+
+        versions = [m[0] for m in migrations]
+        if len(versions) != len(set(versions)):
+            raise ValueError(f"Duplicate migration versions in {self.migrations_dir}")
+        return migrations
+
+    def _ensure_migrations_table(self, cursor):
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.database_name}`")
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS `{self.database_name}`.`schema_migrations` ("
+            f"`version` INT NOT NULL PRIMARY KEY, "
+            f"`name` VARCHAR(255) NOT NULL, "
+            f"`applied_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+
+    def applied_versions(self) -> set:
+        connection = None
+        try:
+            connection = self.data_service._get_connection()
+            cursor = connection.cursor()
+            self._ensure_migrations_table(cursor)
+            cursor.execute(f"SELECT `version` FROM `{self.database_name}`.`schema_migrations`")
+            return {row["version"] for row in cursor.fetchall()}
+        finally:
+            if connection:
+                self.data_service._release_connection(connection)
+
+    def pending(self) -> list:
+        applied = self.applied_versions()
+        return [m for m in self.discover() if m[0] not in applied]
+
+    def migrate(self, target_version: int = None, dry_run: bool = False) -> list:
+        """
+        Apply pending migrations up to and including target_version (all of them if None).
+        MySQL commits DDL implicitly, so a failing migration is not rolled back; it is left
+        unrecorded and the error is raised so it can be fixed and re-run.
+
+        :return: The list of (version, name) that were applied (or would be, for a dry run).
+        """
+        applied = []
+        for version, name, path in self.pending():
+            if target_version is not None and version > target_version:
+                break
+
+            with open(path, encoding="utf-8") as f:
+                statements = split_statements(f.read())
+
+            if dry_run:
+                print(f"Would apply migration {version:03d}_{name} ({len(statements)} statements)")
+                applied.append((version, name))
+                continue
+
+            connection = None
+            try:
+                connection = self.data_service._get_connection()
+                cursor = connection.cursor()
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    f"INSERT INTO `{self.database_name}`.`schema_migrations` (`version`, `name`) VALUES (%s, %s)",
+                    [version, name]
+                )
+                print(f"Applied migration {version:03d}_{name}")
+                applied.append((version, name))
+            except Exception as e:
+                print(f"Error applying migration {version:03d}_{name}: {e}")
+                raise
+            finally:
+                if connection:
+                    self.data_service._release_connection(connection)
+
+        return applied
@@ -0,0 +1,83 @@
+import threading
+
+
+def bucket_size(n: int) -> int:
+    """
+    Round an IN-list length up to the next power of two, so that lists of 1..100 ids
+    map to at most 8 distinct statements.
+    """
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+
+def pad_in_list(values: list) -> list:
+    """
+    Pad a non-empty list of IN-list parameters to its bucket size by repeating the last value.
+    Duplicates in an IN list do not change the result.
+    """
+    padding = bucket_size(len(values)) - len(values)
+    if padding:
+        return list(values) + [values[-1]] * padding
+    return values
+
+
+def render_int_args(sql: str, args):
+    """
+    Client-side interpolation fast path. If every parameter is an int (ids, versions, LIMIT/OFFSET),
+    the literal is just str(value), which is what pymysql's escaping produces, at a fraction of the cost.
+
+    :return: The SQL with the parameters substituted, or None if some parameter is not an int.
+    """
+    if not args or not isinstance(args, (list, tuple)):
+        return None
+    for value in args:
+        if type(value) is not int:
+            return None
+    return sql % tuple(map(str, args))
+
+
+class StatementCache:
+    """
+    A bounded cache of SQL text keyed on (operation, database, table, shape).
+
+    shape is the number of parameters for statements with a fixed column list, or a tuple of
+    column names for statements whose column list depends on the data (UPDATE ... SET, INSERT).
+    The SQL text for a key never changes, so it is built once and reused by every call.
+    Lookups take no lock; only inserts do, and the oldest entry is evicted when the cache is full.
+    """
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def get(self, operation: str, database_name: str, collection_name: str, shape, builder) -> str:
+        """
+        :param builder: A no-argument callable that returns the SQL text. Only called on a miss.
+        """
+        key = (operation, database_name, collection_name, shape)
+        sql = self._statements.get(key)
+        if sql is not None:
+            self.hits += 1
+            return sql
+
+        sql = builder()
+        with self._lock:
+            self.misses += 1
+            if key not in self._statements and len(self._statements) >= self.max_size:
+                self._statements.pop(next(iter(self._statements)))
+            self._statements[key] = sql
+        return sql
+
+    def __len__(self):
+        return len(self._statements)
+
+    def clear(self):
+        with self._lock:
+            self._statements.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+# Width of the calorie histogram buckets; a bucket is named by its lower bound.
+CALORIE_BUCKET_WIDTH = 100
+
+# Recipe columns the rollups are computed from. Writes that change none of them leave the rollups alone.
+ROLLUP_COLUMNS = ("meal_type", "rating", "calories")
+
+
+def calorie_bucket(calories):
+    return None if calories is None else int(calories) // CALORIE_BUCKET_WIDTH * CALORIE_BUCKET_WIDTH
+
+
+class StatsDelta:
+    """
+    The change a write makes to the recipe statistics rollups.
+
+    A write removes the old state of a recipe (sign -1) and adds the new one (sign +1); the delta keeps
+    the net effect per rollup row, so a write that changes nothing the rollups depend on produces no
+    statements. Rows are returned sorted by key, so concurrent transactions lock rollup rows in the same
+    order and cannot deadlock on them.
+    """
+
+    def __init__(self):
+        # meal_type ('' for none) -> [recipe_count, rating_count, rating_sum, calorie_count, calorie_sum]
+        self.meal_types = defaultdict(lambda: [0, 0, 0.0, 0, 0])
+        self.calories = defaultdict(int)
+        self.ingredients = defaultdict(int)
+
+    def add_recipe(self, row: dict, sign: int = 1):
+        """
+        :param row: A recipe's meal_type, rating and calories.
+        """
+        counts = self.meal_types[row.get("meal_type") or ""]
+        counts[0] += sign
+        if row.get("rating") is not None:
+            counts[1] += sign
+            counts[2] += sign * float(row["rating"])
+        bucket = calorie_bucket(row.get("calories"))
+        if bucket is not None:
+            counts[3] += sign
+            counts[4] += sign * int(row["calories"])
+            self.calories[bucket] += sign
+
+    def remove_recipe(self, row: dict):
+        self.add_recipe(row, sign=-1)
+
+    def add_ingredients(self, names, sign: int = 1):
+        for name in names:
+            self.ingredients[name] += sign
+
+    def remove_ingredients(self, names):
+        self.add_ingredients(names, sign=-1)
+
+    def meal_type_rows(self) -> list:
+        return [(meal_type, *counts) for meal_type, counts in sorted(self.meal_types.items())
+                if any(counts)]
+
+    def calorie_rows(self) -> list:
+        return [(bucket, count) for bucket, count in sorted(self.calories.items()) if count]
+
+    def ingredient_rows(self) -> list:
+        return [(name, count) for name, count in sorted(self.ingredients.items()) if count]
+
+    def __bool__(self):
+        return bool(self.meal_type_rows() or self.calorie_rows() or self.ingredient_rows())
@@ -0,0 +1,208 @@
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import uuid
+
+SEGMENT_PATTERN = re.compile(r"^write-behind-(\w+)\.(\d+)\.log$")
+
+
+class WriteBehindBuffer:
+    """
+    Buffers idempotent field updates in memory and writes them in batches.
+
+    put(key, fields) merges the fields into the pending update for key (last write wins per field), so
+    a hot key costs one write per flush however often it changes. A background thread calls
+    flush(updates) with {key: {field: value}} every flush_interval seconds, or sooner once max_pending
+    keys are waiting. If the flush callable raises, the batch is merged back under any newer values and
+    retried on the next flush.
+
+    Durability: with a journal_dir, every put is appended to a journal segment before it returns, and
+    segments are deleted only after the updates in them have been flushed. Each process owns its segments
+    through a lock file it holds while running; on start, a process claims and replays the segments of
+    processes that died without flushing. fsync=True also survives a machine crash, at the cost of an
+    fsync per put. close() flushes whatever is pending.
+    """
+
+    def __init__(self, flush, max_pending: int = 1000, flush_interval: float = 1.0,
+                 journal_dir: str = None, fsync: bool = False):
+        self._flush = flush
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.journal_dir = journal_dir
+        self.fsync = fsync
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+        self._token = None
+        self._lock_file = None
+        self._segment = None
+        self._segment_seq = 0
+        self._closed_segments = []
+
+    # -- journal ----------------------------------------------------------------------------------
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.journal_dir, f"write-behind-{self._token}.{seq}.log")
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        self._segment = open(self._segment_path(self._segment_seq), "a", encoding="utf-8")
+
+    def _rotate_segment(self):
+        # Called with _lock held: the current segment now belongs to the batch being flushed.
+        self._segment.close()
+        self._closed_segments.append(self._segment.name)
+        self._open_segment()
+
+    def _recover(self):
+        """
+        Claim the journal segments of dead processes (their lock file is no longer held) and load them.
+        """
+        for lock_path in sorted(glob.glob(os.path.join(self.journal_dir, "write-behind-*.lock"))):
+            owner = os.path.basename(lock_path)[len("write-behind-"):-len(".lock")]
+            if owner == self._token:
+                continue
+            with open(lock_path, "a") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # its owner is alive
+
+                segments = []
+                for path in glob.glob(os.path.join(self.journal_dir, f"write-behind-{owner}.*.log")):
+                    match = SEGMENT_PATTERN.match(os.path.basename(path))
+                    if match:
+                        segments.append((int(match.group(2)), path))
+                for _, path in sorted(segments):
+                    # Renaming is atomic, so a segment is claimed by exactly one process.
+                    self._segment_seq += 1
+                    claimed = self._segment_path(self._segment_seq)
+                    os.rename(path, claimed)
+                    self._closed_segments.append(claimed)
+                    self._replay(claimed)
+                os.remove(lock_path)
+        if self._closed_segments:
+            print(f"Recovered {len(self._pending)} buffered updates from {len(self._closed_segments)} journal segments")
+
+    def _replay(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # a torn last line from a crash
+                self._pending.setdefault(entry["k"], {}).update(entry["f"])
+
+    # -- lifecycle --------------------------------------------------------------------------------
+
+    def start(self):
+        """
+        Take ownership of a journal, recover orphaned updates and start the flush thread. Called
+        automatically by the first put(); call it at startup to recover without waiting for one.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # New process (first start, or a fork of a started buffer): nothing inherited is ours.
+            self._pid = os.getpid()
+            self._pending = {}
+            self._closed_segments = []
+            if self.journal_dir:
+                os.makedirs(self.journal_dir, exist_ok=True)
+                self._token = uuid.uuid4().hex
+                self._segment_seq = 0
+                self._lock_file = open(os.path.join(self.journal_dir, f"write-behind-{self._token}.lock"), "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self._recover()
+                self._open_segment()
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            if self._pending:
+                self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write-behind flush failed, will retry: {e}")
+
+    def close(self):
+        """
+        Stop the flush thread and flush everything pending. Raises if the final flush fails; the journal
+        is kept so the updates are recovered by the next process.
+        """
+        if self._pid != os.getpid():
+            return
+        self._stopped = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        if self.journal_dir:
+            with self._lock:
+                self._segment.close()
+                os.remove(self._segment.name)
+                self._lock_file.close()
+                os.remove(self._lock_file.name)
+                self._pid = None
+
+    # -- buffering --------------------------------------------------------------------------------
+
+    def put(self, key, fields: dict):
+        if self._pid != os.getpid():
+            self.start()
+        with self._lock:
+            if self.journal_dir:
+                self._segment.write(json.dumps({"k": key, "f": fields}) + "\n")
+                self._segment.flush()
+                if self.fsync:
+                    os.fsync(self._segment.fileno())
+            self._pending.setdefault(key, {}).update(fields)
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Write everything pending now.
+        :return: The number of keys written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                segments = []
+                if self.journal_dir:
+                    self._rotate_segment()
+                    segments = list(self._closed_segments)
+
+            try:
+                self._flush(batch)
+            except Exception:
+                with self._lock:
+                    for key, fields in batch.items():
+                        self._pending[key] = dict(fields, **self._pending.get(key, {}))
+                raise
+
+            with self._lock:
+                for path in segments:
+                    os.remove(path)
+                    self._closed_segments.remove(path)
+            return len(batch)
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Iterable, Optional
+
+import httpx
+
+from framework.services.cache.InMemoryCacheService import InMemoryCacheService
+
+# Cached for recipes the nutrition service has no data for, told apart from a cache miss (None)
+_MISSING = False
+
+
+class NutritionClient:
+    """
+    Reads nutrition facts per recipe from the nutrition service (GET {base_url}/nutrition/{recipe_id},
+    which returns a JSON object, or 404 when it has no data for the recipe).
+
+    Requests share one pooled async HTTP client, so connections are kept alive between calls and at most
+    max_connections are open; get_many() runs its calls concurrently. Every call must finish within
+    timeout seconds, including the wait for a pooled connection. Results are cached for ttl seconds,
+    recipes without data for missing_ttl seconds; failures are not cached.
+
+    The nutrition service is optional: a call that fails or times out gives None, like a recipe without
+    data, and never fails the request.
+
+    The HTTP client is bound to the event loop it was created in: start() and close() it with the
+    application (lifespan).
+    """
+
+    def __init__(self, base_url: str, timeout: float = 0.5, ttl: float = 3600.0, missing_ttl: float = 60.0,
+                 max_connections: int = 20, max_entries: int = 10000):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_connections = max_connections
+        self.cache = InMemoryCacheService(max_entries=max_entries, default_ttl=ttl)
+        self.calls = 0
+        self.failures = 0
+        self._client = None
+
+    async def start(self):
+        await self.close()
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            headers={"Accept": "application/json"}
+        )
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def get(self, recipe_id: int, headers: Optional[dict] = None) -> Optional[dict]:
+        """
+        :param headers: Added to the request, e.g. the traceparent of the current trace.
+        :return: The nutrition facts of the recipe, or None if there are none or the call failed.
+        """
+        cached = self.cache.get(str(recipe_id))
+        if cached is not None:
+            return cached or None
+        if self._client is None:
+            await self.start()
+
+        self.calls += 1
+        try:
+            # The httpx timeout applies per phase (pool, connect, read); this bounds the whole call
+            response = await asyncio.wait_for(self._client.get(f"/nutrition/{recipe_id}", headers=headers),
+                                              self.timeout)
+            if response.status_code == 404:
+                self.cache.set(str(recipe_id), _MISSING, ttl=self.missing_ttl)
+                return None
+            response.raise_for_status()
+            nutrition = response.json()
+        except (asyncio.TimeoutError, httpx.HTTPError, ValueError) as e:
+            self.failures += 1
+            print(f"Nutrition lookup failed for recipe_id={recipe_id}: {e!r}")
+            return None
+
+        self.cache.set(str(recipe_id), nutrition)
+        return nutrition
+
+    async def get_many(self, recipe_ids: Iterable[int], headers: Optional[dict] = None) -> dict:
+        """
+        Look up several recipes concurrently, e.g. for a page of a list.
+        :return: {recipe_id: nutrition facts or None}
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        results = await asyncio.gather(*(self.get(recipe_id, headers) for recipe_id in recipe_ids))
+        return dict(zip(recipe_ids, results))
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "failures": self.failures, "cached": len(self.cache)}
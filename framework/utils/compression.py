@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Preferred first when the client accepts several with the same q-value.
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported=SUPPORTED_ENCODINGS) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header, honouring q-values and "*".
+    :return: One of supported, or None for the identity coding.
+    """
+    if not accept_encoding:
+        return None
+
+    qvalues = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = qvalues.get(coding, qvalues.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=brotli_quality)
+    raise ValueError(f"Unsupported content coding {encoding}")
+
+
+class CompressedBodyCache:
+    """
+    An LRU cache of compressed response bodies keyed by a digest of the uncompressed body and the
+    coding. Responses rebuilt from cached data serialize to the same bytes, so hot pages are
+    compressed once instead of on every request.
+    """
+
+    def __init__(self, max_entries: int = 256, max_body_size: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, body: bytes, encoding: str, **kwargs) -> bytes:
+        if len(body) > self.max_body_size:
+            return compress(body, encoding, **kwargs)
+
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+
+        compressed = compress(body, encoding, **kwargs)
+        with self._lock:
+            self._entries[key] = compressed
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def __len__(self):
+        return len(self._entries)
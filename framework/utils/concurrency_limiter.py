@@ -0,0 +1,96 @@
+import math
+import threading
+import time
+from typing import Optional
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of requests in flight, adapting the limit to the observed latency (AIMD).
+
+    The limiter tracks a baseline latency: the lowest latency seen over the last two windows. A request
+    that completes within tolerance times the baseline plus latency_slack seconds (so jitter on very fast
+    requests is not read as congestion), while the limiter is at least half used, raises the limit by
+    about one per limit's worth of requests. A slower request, or one that failed because the backend is
+    unavailable, cuts the limit by the backoff factor (at most once per request latency, so a burst of
+    slow requests counts as one signal).
+
+    Requests over the limit are rejected right away rather than queued: when the backend slows down, the
+    service sheds the excess load and keeps serving the rest quickly.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 2, max_limit: int = 200,
+                 tolerance: float = 2.0, latency_slack: float = 0.005, backoff: float = 0.9,
+                 baseline_window: float = 30.0):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.latency_slack = latency_slack
+        self.backoff = backoff
+        self.baseline_window = baseline_window
+
+        self.in_flight = 0
+        self.rejected = 0
+        self._window_started = time.monotonic()
+        self._window_min = math.inf
+        self._previous_window_min = math.inf
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> Optional[float]:
+        """
+        :return: A token to pass to release(), or None if the request must be rejected.
+        """
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    def baseline(self) -> float:
+        return min(self._window_min, self._previous_window_min)
+
+    def release(self, token: float, dropped: bool = False):
+        """
+        :param token: The value returned by try_acquire().
+        :param dropped: True if the request failed because the backend was unavailable or timed out.
+        """
+        now = time.monotonic()
+        latency = now - token
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+
+            if now - self._window_started > self.baseline_window:
+                self._previous_window_min = self._window_min
+                self._window_min = math.inf
+                self._window_started = now
+            if not dropped:
+                self._window_min = min(self._window_min, latency)
+
+            baseline = self.baseline()
+            if dropped or latency > self.tolerance * baseline + self.latency_slack:
+                if now - self._last_decrease >= latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif in_flight >= self.limit / 2:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def cancel(self, token: float):
+        """
+        Release a request without using its latency, e.g. one that failed before reaching the backend.
+        """
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            baseline = self.baseline()
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "baseline_latency_ms": round(baseline * 1000, 1) if baseline != math.inf else None,
+            }
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+
+class IdempotencyKeyReusedException(Exception):
+    """
+    The key was already used for a different request.
+    """
+    pass
+
+
+class IdempotencyKeyInProgressException(Exception):
+    """
+    The first request with the key is still running and did not finish within the wait timeout.
+    """
+    pass
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "response")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyStore:
+    """
+    Runs each request with an idempotency key once and keeps its response for ttl seconds, so retries of
+    it get the same response without running it again.
+
+    A retry that arrives while the first request is still running waits for it (up to wait_timeout) and
+    then gets its response. If the first request failed, nothing is stored and the retry runs it again.
+    A key sent with a different request (fingerprint) is refused.
+
+    Keys are kept in insertion order, which is also their expiry order, so expired keys are dropped from
+    the front; above max_entries the oldest keys are dropped early. Keys are per process: a retry that
+    reaches another worker or instance is not recognised (see SharedIdempotencyStore).
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 10000, wait_timeout: float = 10.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.replayed = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fingerprint: str, execute: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        :param key: The idempotency key, scoped by the caller (e.g. prefixed with the route).
+        :param fingerprint: Identifies the request, e.g. a hash of its body.
+        :param execute: Runs the request and returns the response to keep. If it raises, nothing is kept.
+        :return: The response and whether it was replayed.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _Entry(fingerprint, now + self.ttl)
+                    self._entries[key] = entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                    break
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyKeyReusedException("The Idempotency-Key was already used for a different request")
+                if entry.done.is_set():
+                    self.replayed += 1
+                    return entry.response, True
+            if not entry.done.wait(max(0.0, deadline - time.monotonic())):
+                raise IdempotencyKeyInProgressException("A request with this Idempotency-Key is still in progress")
+            # The first request finished: replay its response, or run again if it failed
+
+        try:
+            response = execute()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.done.set()
+            raise
+        entry.response = response
+        entry.done.set()
+        return response, False
+
+    def _expire(self, now: float):
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.expires_at > now:
+                return
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedIdempotencyStore:
+    """
+    IdempotencyStore semantics across workers and instances: keys are kept in the shared cache, so a
+    retry that reaches another worker than the first request is still recognised.
+
+    The first request claims the key with an atomic SET NX holding an in-progress marker, which expires
+    after lease seconds if its worker dies; when it finishes, the marker is replaced by its response for
+    ttl seconds. Other requests with the key poll it until then (up to wait_timeout). Responses must be
+    JSON serializable.
+
+    If the shared cache cannot be reached, requests go to the fallback (a per-process IdempotencyStore).
+    """
+
+    PREFIX = "idempotency:"
+
+    def __init__(self, cache, fallback: IdempotencyStore, ttl: float = 3600.0, wait_timeout: float = 10.0,
+                 lease: float = 60.0, poll_interval: float = 0.05):
+        self.cache = cache
+        self.fallback = fallback
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.replayed = 0
+
+    def run(self, key: str, fingerprint: str, execute: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        See IdempotencyStore.run.
+        """
+        cache_key = self.PREFIX + key
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                claimed = self.cache.add(cache_key, json.dumps({"fingerprint": fingerprint}), ttl=self.lease)
+                entry = None if claimed else self.cache.get(cache_key)
+            except Exception as e:
+                print(f"Shared idempotency store unavailable, using the per-process store: {e}")
+                return self.fallback.run(key, fingerprint, execute)
+            if claimed:
+                break
+            if entry is None:
+                continue  # released or expired since the claim failed: claim again
+            entry = json.loads(entry)
+            if entry["fingerprint"] != fingerprint:
+                raise IdempotencyKeyReusedException("The Idempotency-Key was already used for a different request")
+            if "response" in entry:
+                self.replayed += 1
+                return entry["response"], True
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInProgressException("A request with this Idempotency-Key is still in progress")
+            time.sleep(self.poll_interval)
+
+        try:
+            response = execute()
+        except BaseException:
+            self.cache.delete(cache_key)
+            raise
+        self.cache.set(cache_key, json.dumps({"fingerprint": fingerprint, "response": response}), ttl=self.ttl)
+        return response, False
@@ -0,0 +1,77 @@
+import threading
+from typing import Callable, Hashable
+
+
+class _Batch:
+    __slots__ = ("keys", "full", "done", "results", "error")
+
+    def __init__(self):
+        self.keys = {}  # insertion ordered and without duplicates
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Gathers single-key loads made by concurrent threads over a short window into one load_many() call,
+    like a dataloader. Meant for the route handler threadpool, where many requests for different recipes
+    can arrive within the same millisecond.
+
+    The first caller of a batch is its leader: it waits up to window seconds, or less if max_batch keys
+    join, then closes the batch, calls load_many with its keys and hands every caller its own result. The
+    others wait for it. A key requested twice in a batch is loaded once. If load_many raises, every caller
+    of the batch gets the exception. There is no background thread, so a batcher survives a fork.
+
+    Each read waits up to window longer than it would alone, in exchange for one query per batch
+    instead of one per read.
+    """
+
+    def __init__(self, load_many: Callable[[list], dict], window: float = 0.002, max_batch: int = 64):
+        """
+        :param load_many: Called with a list of keys, returns {key: result}; keys it leaves out get None.
+        """
+        self.load_many = load_many
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.loads = 0
+        self._open = None
+        self._lock = threading.Lock()
+
+    def load(self, key: Hashable):
+        with self._lock:
+            self.loads += 1
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.keys[key] = None
+            if len(batch.keys) >= self.max_batch:
+                # Closed: the next caller starts a new batch
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+                self.batches += 1
+            try:
+                batch.results = self.load_many(list(batch.keys))
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(key)
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "batches": self.batches,
+                "average_batch": round(self.loads / self.batches, 2) if self.batches else None}
@@ -0,0 +1,85 @@
+import heapq
+import unicodedata
+from collections import Counter
+from typing import Hashable, List, Tuple
+
+# Length of the name_normalized column
+MAX_NORMALIZED_LENGTH = 255
+
+
+def normalize_name(name: str) -> str:
+    """
+    The lookup form of a name: case-folded, without accents and with runs of whitespace collapsed to one
+    space, e.g. "  Crème  Brûlée" -> "creme brulee". Names that only differ in these ways are the same
+    name to a reader, whatever the column collation says.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())[:MAX_NORMALIZED_LENGTH]
+
+
+def trigrams(text: str) -> set:
+    """
+    The three-character substrings of a normalized text, padded so that the start and end of every word
+    count, as in PostgreSQL's pg_trgm: "pie" -> {"  p", " pi", "pie", "ie "}.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    An in-memory index from trigrams to the keys of the texts that contain them, for "did you mean"
+    lookups. The similarity of two texts is the Jaccard index of their trigram sets: shared trigrams over
+    all distinct trigrams of both. A typo changes only the few trigrams around it.
+
+    Not thread-safe: callers synchronise.
+    """
+
+    def __init__(self):
+        self._postings = {}  # trigram -> set of keys
+        self._sizes = {}  # key -> number of trigrams
+
+    def add(self, key: Hashable, text: str):
+        self.remove(key)
+        grams = trigrams(normalize_name(text))
+        self._sizes[key] = len(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: Hashable, text: str = None):
+        """
+        :param text: The text the key was added with; without it every posting list is searched.
+        """
+        if self._sizes.pop(key, None) is None:
+            return
+        grams = trigrams(normalize_name(text)) if text is not None else list(self._postings)
+        for gram in grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def search(self, text: str, limit: int = 5, min_similarity: float = 0.3) -> List[Tuple[float, Hashable]]:
+        """
+        :return: Up to limit (similarity, key) pairs with at least min_similarity, most similar first.
+        """
+        grams = trigrams(normalize_name(text))
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = (
+            (count / (len(grams) + self._sizes[key] - count), key)
+            for key, count in shared.items()
+        )
+        return heapq.nlargest(limit, (pair for pair in scored if pair[0] >= min_similarity),
+                              key=lambda pair: pair[0])
+
+    def __len__(self):
+        return len(self._sizes)
@@ -0,0 +1,184 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class RateLimitPolicy:
+    """
+    A token bucket: up to limit requests at once, refilled at limit per period seconds.
+    """
+
+    def __init__(self, name: str, limit: int, period: float):
+        if limit < 1 or period <= 0:
+            raise ValueError(f"Invalid rate limit {limit}/{period} for {name}")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period  # tokens per second
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "RateLimitPolicy":
+        """
+        :param spec: "<limit>/<period seconds>", e.g. "120/60".
+        """
+        try:
+            limit, period = spec.split("/")
+            return cls(name, int(limit), float(period))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {spec!r} for {name}, expected <limit>/<seconds>")
+
+    def header(self) -> str:
+        """
+        :return: The policy as a RateLimit-Policy header value.
+        """
+        return f"{self.limit};w={self.period:g}"
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, policy: RateLimitPolicy, remaining: float, cost: float = 1):
+        self.allowed = allowed
+        self.policy = policy
+        self.remaining = remaining
+        self.cost = cost
+
+    @property
+    def reset(self) -> float:
+        """
+        Seconds until the bucket is full again.
+        """
+        return (self.policy.limit - self.remaining) / self.policy.rate
+
+    @property
+    def retry_after(self) -> float:
+        """
+        Seconds until the request would be allowed, 0 if it was.
+        """
+        return 0.0 if self.allowed else (self.cost - self.remaining) / self.policy.rate
+
+    def headers(self) -> dict:
+        headers = {
+            "RateLimit-Limit": str(self.policy.limit),
+            "RateLimit-Remaining": str(int(self.remaining)),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": self.policy.header(),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimitStore(ABC):
+    """
+    Where token buckets are kept. The in-memory store limits each worker process on its own; a store on
+    a shared backend limits a client across all instances.
+    """
+
+    # True if consume() does network I/O and must not run on the event loop
+    blocking = False
+
+    @abstractmethod
+    def consume(self, key: str, policy: RateLimitPolicy, cost: float = 1) -> RateLimitResult:
+        """
+        Take cost tokens from the key's bucket for the policy, if it has them.
+        """
+        raise NotImplementedError('Abstract method consume()')
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Token buckets in a dict, O(1) per request. A bucket only holds its token count and when it was last
+    updated; refilling is computed on the next request.
+
+    Memory is bounded: buckets are kept in least recently used order, every request drops up to two of the
+    oldest that have refilled completely (a full bucket is the same as no bucket), and above max_entries
+    the least recently used bucket is dropped even if it is not full, which lets that client start over.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()  # key -> [tokens, updated, full_at]
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, policy: RateLimitPolicy, cost: float = 1, now: Optional[float] = None) -> RateLimitResult:
+        now = time.monotonic() if now is None else now
+        key = f"{policy.name}:{key}"
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(policy.limit)
+            else:
+                tokens = min(float(policy.limit), bucket[0] + (now - bucket[1]) * policy.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if bucket is None:
+                self._buckets[key] = [tokens, now, now + (policy.limit - tokens) / policy.rate]
+            else:
+                bucket[0], bucket[1], bucket[2] = tokens, now, now + (policy.limit - tokens) / policy.rate
+                self._buckets.move_to_end(key)
+            self._expire(now)
+        return RateLimitResult(allowed, policy, tokens, cost)
+
+    def _expire(self, now: float):
+        for _ in range(2):
+            oldest = next(iter(self._buckets.values()))
+            if oldest[2] > now and len(self._buckets) <= self.max_entries:
+                return
+            self._buckets.popitem(last=False)
+            if not self._buckets:
+                return
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Refill and take tokens in one atomic step on the server, with the server's clock, so every instance
+# sees the same bucket. The token count is returned as a string: Lua numbers are truncated to integers.
+TOKEN_BUCKET_SCRIPT = """
+local limit, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = limit
+if bucket[1] then
+    tokens = math.min(limit, tonumber(bucket[1]) + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((limit - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class NetworkRateLimitStore(RateLimitStore):
+    """
+    Token buckets on a key-value server that speaks the Redis protocol, shared by all instances. Buckets
+    expire on the server once they have refilled.
+
+    Like the network cache, an unavailable server never fails a request: the request is allowed.
+    """
+
+    blocking = True
+
+    def __init__(self, client, key_prefix: str = "ratelimit:"):
+        """
+        :param client: A NetworkCacheService.
+        """
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def consume(self, key: str, policy: RateLimitPolicy, cost: float = 1) -> RateLimitResult:
+        try:
+            allowed, tokens = self.client.eval(TOKEN_BUCKET_SCRIPT, [f"{self.key_prefix}{policy.name}:{key}"],
+                                               [policy.limit, policy.rate, cost])
+            return RateLimitResult(bool(allowed), policy, float(tokens), cost)
+        except Exception as e:
+            print(f"Rate limit check failed for {key}: {e}")
+            return RateLimitResult(True, policy, float(policy.limit), cost)
@@ -0,0 +1,181 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# The profile of the request being handled, or None when it is not profiled. Synchronous route handlers
+# run in the threadpool with a copy of the request's context, so they add to the same RequestProfile.
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+# Only one cProfile profiler can be active at a time (Python 3.12 runs them on sys.monitoring), so
+# concurrent requests that ask for one get phase timings only.
+_cprofile_lock = threading.Lock()
+
+# Number of functions kept from a request's cProfile output, by cumulative time.
+CPROFILE_LINES = 30
+
+
+class RequestProfile:
+    """
+    Where the time of one request went.
+
+    The profiling middleware records start and end, the route records when FastAPI starts and finishes
+    handling the request (route_start, route_end) and the endpoint wrapper when the endpoint itself runs
+    (endpoint_start, endpoint_end); the data service adds the time of every statement. All timestamps are
+    time.perf_counter() values. phases() turns them into:
+
+    - middleware: everything outside the route (middleware and routing),
+    - validation: dependencies and request parameter/body validation, up to the endpoint call,
+    - router: the endpoint, less the SQL it waited for,
+    - sql: statements executed by the data service,
+    - serialization: response model validation and encoding, after the endpoint returned.
+    """
+
+    def __init__(self, correlation_id: Optional[str], method: str, path: str, use_cprofile: bool = False):
+        self.correlation_id = correlation_id
+        self.method = method
+        self.path = path
+        self.use_cprofile = use_cprofile
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.route_start = self.route_end = None
+        self.endpoint_start = self.endpoint_end = None
+        self.sql_seconds = 0.0
+        self.sql_statements = 0
+        self.status_code = None
+        self.cprofile = None  # cProfile report, when one was taken
+        self.notes = []
+        self._lock = threading.Lock()
+
+    def add_statement(self, elapsed: float):
+        with self._lock:
+            self.sql_seconds += elapsed
+            self.sql_statements += 1
+
+    def finish(self, status_code: Optional[int] = None):
+        self.end = time.perf_counter()
+        self.status_code = status_code
+
+    def phases(self) -> dict:
+        """
+        :return: Seconds per phase, in request order, and the total. Phases the request did not reach
+            (no matching route, or it failed validation) are left out.
+        """
+        total = (self.end or time.perf_counter()) - self.start
+        if self.route_start is None or self.route_end is None:
+            return {"middleware": total, "total": total}
+
+        route = self.route_end - self.route_start
+        phases = {"middleware": total - route}
+        if self.endpoint_start is None or self.endpoint_end is None:
+            phases["validation"] = route
+        else:
+            phases["validation"] = self.endpoint_start - self.route_start
+            phases["router"] = max(0.0, self.endpoint_end - self.endpoint_start - self.sql_seconds)
+            phases["sql"] = self.sql_seconds
+            phases["serialization"] = self.route_end - self.endpoint_end
+        phases["total"] = total
+        return phases
+
+    def server_timing(self) -> str:
+        """
+        :return: The phases as a Server-Timing header value, in milliseconds.
+        """
+        metrics = []
+        for phase, seconds in self.phases().items():
+            metric = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == "sql":
+                metric += f';desc="{self.sql_statements} statements"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+    def to_dict(self) -> dict:
+        return {
+            "correlation_id": self.correlation_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in self.phases().items()},
+            "sql_statements": self.sql_statements,
+            "cprofile": self.cprofile,
+            "notes": list(self.notes),
+        }
+
+
+def record_statement(sql, args, elapsed):
+    """
+    A data service statement listener that adds each statement's time to the current request's profile.
+    """
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_statement(elapsed)
+
+
+@contextmanager
+def cprofiled(profile: Optional[RequestProfile]):
+    """
+    Run the block under cProfile if the profile asked for it, and keep the report on the profile.
+
+    cProfile only sees the thread it is enabled in: for a synchronous endpoint that is the threadpool
+    thread running it; for an async one it is the event loop, so other requests' coroutines that run
+    while it awaits show up in the report too.
+    """
+    if profile is None or not profile.use_cprofile:
+        yield
+        return
+    if not _cprofile_lock.acquire(blocking=False):
+        profile.notes.append("cProfile skipped: another request is being profiled")
+        yield
+        return
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+    finally:
+        _cprofile_lock.release()
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(CPROFILE_LINES)
+    profile.cprofile = report.getvalue()
+
+
+class ProfileStore:
+    """
+    The most recent request profiles of this process, by correlation id.
+    """
+
+    def __init__(self, max_entries: int = 200):
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, profile: RequestProfile):
+        if profile.correlation_id is None:
+            return
+        with self._lock:
+            self._profiles[profile.correlation_id] = profile.to_dict()
+            self._profiles.move_to_end(profile.correlation_id)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def get(self, correlation_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(correlation_id)
+
+    def recent(self, limit: int = 20) -> list:
+        """
+        :return: The summaries of the last limit profiles, newest first, without cProfile reports.
+        """
+        with self._lock:
+            profiles = list(self._profiles.values())[-limit:]
+        return [{key: value for key, value in p.items() if key != "cprofile"} for p in reversed(profiles)]
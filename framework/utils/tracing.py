@@ -0,0 +1,365 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+# W3C Trace Context: version-trace_id-parent_id-flags
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SAMPLED_FLAG = 0x01
+
+# The span of the work being done, or None. Synchronous route handlers run in the threadpool with a copy
+# of the request's context, so their spans are children of the request span.
+current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """
+    The part of a span that crosses process boundaries in a traceparent header.
+    """
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG if self.sampled else 0:02x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """
+    :return: The remote parent described by a traceparent header, or None if it is missing or invalid
+        (the request then starts a new trace, as the specification requires).
+    """
+    if not header:
+        return None
+    match = TRACEPARENT_RE.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & SAMPLED_FLAG))
+
+
+def new_trace_id(correlation_id: Optional[str] = None) -> str:
+    """
+    A new trace id. A correlation id that is a UUID becomes the trace id, so a trace can be found from
+    the X-Correlation-ID in the logs.
+    """
+    if correlation_id:
+        candidate = correlation_id.replace("-", "").lower()
+        if len(candidate) == 32 and candidate != "0" * 32 and all(c in "0123456789abcdef" for c in candidate):
+            return candidate
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+class Span:
+    """
+    A timed operation in a trace. Times are nanoseconds since the epoch.
+    """
+
+    __slots__ = ("context", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "status",
+                 "_tracer")
+
+    def __init__(self, tracer, context: SpanContext, parent_id: Optional[str], name: str, kind: str = "internal",
+                 attributes: Optional[dict] = None, start_ns: Optional[int] = None):
+        self._tracer = tracer
+        self.context = context
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self._tracer.processor.on_end(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+# -- exporters ------------------------------------------------------------------------------------------
+# An exporter is any object with export(spans: list[dict]). It runs on the export thread, never on a
+# request, and may raise: the batch is then dropped and the error printed.
+
+class StdoutExporter:
+    def export(self, spans: list):
+        sys.stdout.write("".join(json.dumps(span) + "\n" for span in spans))
+        sys.stdout.flush()
+
+
+class FileExporter:
+    """
+    Appends spans to a file as JSON lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(span) + "\n" for span in spans))
+
+
+class HttpExporter:
+    """
+    POSTs batches as {"resource": {...}, "spans": [...]} JSON to a collector.
+    """
+
+    def __init__(self, url: str, service_name: str, timeout: float = 5.0):
+        self.url = url
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: list):
+        body = json.dumps({"resource": {"service.name": self.service_name}, "spans": spans}).encode()
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def exporter_from_spec(spec: Optional[str], service_name: str = "recipe-service"):
+    """
+    :param spec: "stdout", "file:<path>" or an http(s):// collector URL. Empty or None disables tracing.
+    """
+    if not spec:
+        return None
+    if spec == "stdout":
+        return StdoutExporter()
+    if spec.startswith("file:"):
+        return FileExporter(spec[len("file:"):])
+    if spec.startswith(("http://", "https://")):
+        return HttpExporter(spec, service_name)
+    raise ValueError(f"Unknown tracing exporter {spec!r}")
+
+
+class BatchSpanProcessor:
+    """
+    Queues ended spans and exports them in batches from a background thread, every interval seconds or
+    as soon as max_batch spans are waiting. When max_queue spans are waiting, new ones are dropped (and
+    counted) rather than slowing requests down.
+
+    The thread is started by the first span in each process, so a gunicorn master that imports the
+    app before forking does not leave its workers without one.
+    """
+
+    def __init__(self, exporter, max_batch: int = 512, max_queue: int = 4096, interval: float = 2.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.interval = interval
+        self.exported = 0
+        self.dropped = 0
+        self._queue = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def on_end(self, span: Span):
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span.to_dict())
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._queue) < self.max_batch:
+                    self._cond.wait(self.interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Export everything queued so far, in max_batch sized batches, on the calling thread.
+        """
+        while True:
+            with self._cond:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"Exporting {len(batch)} spans failed: {e}")
+
+    def stats(self) -> dict:
+        return {"queued": len(self._queue), "exported": self.exported, "dropped": self.dropped}
+
+
+class _NoopProcessor:
+    def on_end(self, span):
+        pass
+
+    def flush(self):
+        pass
+
+
+class Tracer:
+    """
+    Creates spans and keeps track of the current one. Until configure() gives it an exporter, it creates
+    no spans at all, so tracing costs a context variable lookup per traced call.
+
+    Only start_request_span() starts traces; span() and record_span() create children of the current span
+    and do nothing without one, so background work (warmup, cache refreshes) is not traced.
+    """
+
+    def __init__(self):
+        self.processor = _NoopProcessor()
+        self.enabled = False
+        self.sample_rate = 1.0
+
+    def configure(self, exporter, sample_rate: float = 1.0, **processor_options):
+        if exporter is None:
+            self.processor, self.enabled = _NoopProcessor(), False
+        else:
+            self.processor, self.enabled = BatchSpanProcessor(exporter, **processor_options), True
+        self.sample_rate = sample_rate
+
+    def start_request_span(self, name: str, traceparent: Optional[str] = None,
+                           correlation_id: Optional[str] = None, attributes: Optional[dict] = None) -> Optional[Span]:
+        """
+        Start the server span of an incoming request, continuing the caller's trace when traceparent is
+        valid. The caller sets it as the current span and ends it.
+        :return: The span, or None if tracing is off or the trace is not sampled.
+        """
+        if not self.enabled:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            if not parent.sampled:
+                return None
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            if random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = new_trace_id(correlation_id), None
+        return Span(self, SpanContext(trace_id, new_span_id()), parent_id, name, kind="server",
+                    attributes=attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", attributes: Optional[dict] = None):
+        """
+        Run the block in a child span of the current span. Yields the span, or None when not tracing.
+        """
+        parent = current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(self, SpanContext(parent.context.trace_id, new_span_id()), parent.context.span_id, name,
+                    kind=kind, attributes=attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start_ns: int, end_ns: int, kind: str = "internal",
+                    attributes: Optional[dict] = None):
+        """
+        Record a child span of the current span for an operation that already finished.
+        """
+        parent = current_span.get()
+        if parent is None:
+            return
+        span = Span(self, SpanContext(parent.context.trace_id, new_span_id()), parent.context.span_id, name,
+                    kind=kind, attributes=attributes, start_ns=start_ns)
+        span.end(end_ns)
+
+    def inject(self, headers: dict) -> dict:
+        """
+        Add the traceparent of the current span to the headers of an outgoing request.
+        """
+        span = current_span.get()
+        if span is not None:
+            headers["traceparent"] = span.context.traceparent()
+        return headers
+
+    def flush(self):
+        self.processor.flush()
+
+
+# One tracer per process, configured by the application at startup.
+tracer = Tracer()
+
+
+def traced(method):
+    """
+    Decorator: run the function in a child span named after it (e.g. "RecipeResource.get_all").
+    """
+    name = method.__qualname__
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if current_span.get() is None:
+            return method(*args, **kwargs)
+        with tracer.span(name):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+# Statements longer than this are truncated in span attributes.
+MAX_STATEMENT_LENGTH = 2000
+
+
+def record_statement_span(sql, args, elapsed):
+    """
+    A data service statement listener that records each statement as a span of the current request.
+    Only the SQL text is recorded, never the arguments.
+    """
+    if current_span.get() is None:
+        return
+    end_ns = time.time_ns()
+    sql = sql if isinstance(sql, str) else str(sql)
+    tracer.record_span(sql.split(None, 1)[0].upper() if sql.strip() else "SQL",
+                       end_ns - int(elapsed * 1e9), end_ns, kind="client",
+                       attributes={"db.system": "mysql", "db.statement": sql[:MAX_STATEMENT_LENGTH]})
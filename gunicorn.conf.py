@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+#
+# Production launcher: gunicorn -c gunicorn.conf.py app.main:app
+#
+# Runs one uvicorn worker process per CPU. The app is imported once in the master (preload) and
+# the workers are forked from it; every worker then builds its own connection pool and caches
+# (nothing is shared between workers) and starts accepting requests at once while the warmup runs in
+# the background; /health/ready answers 503 until it has finished.
+# Keep WEB_CONCURRENCY * DB_POOL_SIZE below the MySQL server's max_connections.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
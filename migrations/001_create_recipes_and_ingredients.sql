@@ -0,0 +1,22 @@
+-- Baseline schema for the recipe service, as used by MySQLRDBDataService.
+-- IF NOT EXISTS keeps this a no-op on databases that were created before migrations existed.
+CREATE DATABASE IF NOT EXISTS `recipes_database`;
+
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipes` (
+    `recipe_id` INT NOT NULL AUTO_INCREMENT,
+    `name` VARCHAR(255) NOT NULL,
+    `steps` TEXT,
+    `time_to_cook` INT,
+    `meal_type` VARCHAR(64),
+    `calories` INT,
+    `rating` FLOAT,
+    PRIMARY KEY (`recipe_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `recipes_database`.`ingredients` (
+    `ingredient_id` INT NOT NULL AUTO_INCREMENT,
+    `recipe_id` INT NOT NULL,
+    `ingredient_name` VARCHAR(255) NOT NULL,
+    `quantity` VARCHAR(64),
+    PRIMARY KEY (`ingredient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
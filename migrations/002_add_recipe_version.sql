@@ -0,0 +1,6 @@
+-- Optimistic concurrency for recipes.
+-- `version` is incremented by every update_data/delete_data call and is exposed to clients as the ETag.
+-- `updated_at` is maintained by MySQL on every row change.
+ALTER TABLE `recipes_database`.`recipes`
+    ADD COLUMN `version` INT NOT NULL DEFAULT 1,
+    ADD COLUMN `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
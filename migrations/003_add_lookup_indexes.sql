@@ -0,0 +1,18 @@
+-- Indexes for the lookups MySQLRDBDataService issues:
+--   recipes.name                             get_data_object/update_data/delete_data by name
+--   ingredients (recipe_id)                  get_data_object join, get_all_data IN (...), delete by recipe
+--   ingredients (recipe_id, ingredient_name) update_data per-ingredient UPDATE/DELETE
+-- The composite index also serves every recipe_id-only lookup (leftmost prefix), so no separate
+-- single-column recipe_id index is created. This migration only adds indexes; it changes no rows.
+--
+-- Adding uq_recipes_name fails with "Duplicate entry ... for key 'uq_recipes_name'" if two recipes
+-- share a name. Names compare with the column's collation (case-insensitive by default), so 'Stew' and
+-- 'stew' are duplicates too. Before migrating, list them with
+--     SELECT `name`, COUNT(*), GROUP_CONCAT(`recipe_id`) FROM `recipes_database`.`recipes`
+--     GROUP BY `name` HAVING COUNT(*) > 1;
+-- and rename or delete the extra recipes, then run the migration again.
+ALTER TABLE `recipes_database`.`recipes`
+    ADD UNIQUE KEY `uq_recipes_name` (`name`);
+
+ALTER TABLE `recipes_database`.`ingredients`
+    ADD KEY `ix_ingredients_recipe_name` (`recipe_id`, `ingredient_name`);
@@ -0,0 +1,13 @@
+-- Transactional outbox for the recipe change feed (GET /recipes/changes).
+-- MySQLRDBDataService appends one row per insert/update/delete in the same transaction as the write.
+-- change_id is the feed offset consumers resume from; created_at supports pruning old events.
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipe_changes` (
+    `change_id` BIGINT NOT NULL AUTO_INCREMENT,
+    `recipe_id` INT NOT NULL,
+    `operation` VARCHAR(16) NOT NULL,
+    `version` INT NULL,
+    `payload` JSON NULL,
+    `created_at` TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    PRIMARY KEY (`change_id`),
+    KEY `ix_recipe_changes_created_at` (`created_at`)
+);
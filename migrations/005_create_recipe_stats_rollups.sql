@@ -0,0 +1,42 @@
+-- Statistics rollups for GET /recipes/stats, maintained by MySQLRDBDataService in the same transaction
+-- as every recipe write (see StatsRollup.py). Rows are never deleted by writes; a count that drops to
+-- zero is filtered out on read. MySQLRDBDataService.rebuild_stats() recomputes them (tools/rebuild_stats.py).
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipe_stats_meal_types` (
+    `meal_type` VARCHAR(64) NOT NULL,  -- '' for recipes without a meal type
+    `recipe_count` INT NOT NULL DEFAULT 0,
+    `rating_count` INT NOT NULL DEFAULT 0,
+    `rating_sum` DOUBLE NOT NULL DEFAULT 0,
+    `calorie_count` INT NOT NULL DEFAULT 0,
+    `calorie_sum` BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`meal_type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Calorie histogram; bucket is the lower bound of a 100 kcal bucket.
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipe_stats_calories` (
+    `bucket` INT NOT NULL,
+    `recipe_count` INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- The count index serves the top-N read (ORDER BY recipe_count DESC, ingredient_name DESC) with a
+-- backward index scan: InnoDB appends the primary key to it, so no sort is needed.
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipe_stats_ingredients` (
+    `ingredient_name` VARCHAR(255) NOT NULL,
+    `recipe_count` INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`ingredient_name`),
+    KEY `ix_recipe_stats_ingredients_count` (`recipe_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Seed from the current catalog.
+INSERT INTO `recipes_database`.`recipe_stats_meal_types`
+    (`meal_type`, `recipe_count`, `rating_count`, `rating_sum`, `calorie_count`, `calorie_sum`)
+SELECT COALESCE(`meal_type`, ''), COUNT(*), COUNT(`rating`), COALESCE(SUM(`rating`), 0),
+       COUNT(`calories`), COALESCE(SUM(`calories`), 0)
+FROM `recipes_database`.`recipes` GROUP BY COALESCE(`meal_type`, '');
+
+INSERT INTO `recipes_database`.`recipe_stats_calories` (`bucket`, `recipe_count`)
+SELECT FLOOR(`calories` / 100) * 100 AS `bucket`, COUNT(*)
+FROM `recipes_database`.`recipes` WHERE `calories` IS NOT NULL GROUP BY `bucket`;
+
+INSERT INTO `recipes_database`.`recipe_stats_ingredients` (`ingredient_name`, `recipe_count`)
+SELECT `ingredient_name`, COUNT(*) FROM `recipes_database`.`ingredients` GROUP BY `ingredient_name`;
@@ -0,0 +1,11 @@
+-- Indexes behind GET /recipes?sort= (MySQLRDBDataService.get_all_data) and GET /recipes/top.
+-- InnoDB appends the primary key to every secondary index, so KEY (rating) is (rating, recipe_id):
+-- ORDER BY rating, recipe_id [DESC] and the keyset condition after a (rating, recipe_id) cursor are an
+-- index range read in either direction, with no filesort. name already has uq_recipes_name.
+-- (meal_type, rating) answers each "top N by rating for a meal type" branch with N index reads, and
+-- SELECT DISTINCT meal_type with a loose index scan.
+ALTER TABLE `recipes_database`.`recipes`
+    ADD KEY `ix_recipes_rating` (`rating`),
+    ADD KEY `ix_recipes_calories` (`calories`),
+    ADD KEY `ix_recipes_time_to_cook` (`time_to_cook`),
+    ADD KEY `ix_recipes_meal_type_rating` (`meal_type`, `rating`);
@@ -0,0 +1,6 @@
+-- Index behind filter-based bulk deletes (MySQLRDBDataService.delete_data_bulk), e.g. retiring a meal type.
+-- KEY (meal_type) is (meal_type, recipe_id) in InnoDB, so each chunk's
+-- SELECT ... WHERE recipe_id > ? AND meal_type = ? ORDER BY recipe_id LIMIT ? FOR UPDATE reads and locks
+-- only the chunk's rows, instead of every row of the primary key range it would scan without it.
+ALTER TABLE `recipes_database`.`recipes`
+    ADD KEY `ix_recipes_meal_type` (`meal_type`);
@@ -0,0 +1,9 @@
+-- Lookup form of recipe names, behind GET /recipes/name/{name} when the exact name is not found
+-- (MySQLRDBDataService.get_recipe_id_by_normalized_name). The service writes it on every insert and
+-- update of a name: case-folded, accent-stripped and whitespace-collapsed (normalize_name).
+-- The binary collation compares the normalized bytes as they are, whatever the table collation does.
+-- Not unique: "Crème Brûlée" and "creme brulee" can both exist.
+-- Recipes written before this migration have NULL until: python -m tools.backfill_normalized_names
+ALTER TABLE `recipes_database`.`recipes`
+    ADD COLUMN `name_normalized` VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL AFTER `name`,
+    ADD KEY `ix_recipes_name_normalized` (`name_normalized`);
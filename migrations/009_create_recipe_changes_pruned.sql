@@ -0,0 +1,8 @@
+-- Pruning watermark of the recipe change outbox: the highest change_id tools/prune_changes.py deleted.
+-- A consumer resuming below it missed changes and is sent a "reset"; change_id gaps above it are writes
+-- that rolled back (AUTO_INCREMENT ids are not reused), which consumers must not mistake for pruning.
+CREATE TABLE IF NOT EXISTS `recipes_database`.`recipe_changes_pruned` (
+    `id` TINYINT NOT NULL,
+    `through_change_id` BIGINT NOT NULL,
+    PRIMARY KEY (`id`)
+);
@@ -0,0 +1,128 @@
+"""
+A local stand-in for the network key-value server used by NetworkCacheService.
+It speaks the subset of the Redis protocol the client uses: PING, SELECT, GET, SET [PX|EX] [NX],
+DEL, INCR, PUBLISH and SUBSCRIBE. Run it standalone for local development:
+
+    python -m tests.kv_stub_server 6379
+"""
+import socketserver
+import sys
+import threading
+import time
+
+
+class KeyValueStubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, _Handler)
+        self.data = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _write(self, data: bytes):
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    @staticmethod
+    def _bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        value = value if isinstance(value, bytes) else str(value).encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        self.write_lock = threading.Lock()
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            command = args[0].upper()
+            with server.lock:
+                if command in (b"PING", b"SELECT"):
+                    reply = b"+OK\r\n" if command == b"SELECT" else b"+PONG\r\n"
+                elif command == b"GET":
+                    entry = server.data.get(args[1])
+                    if entry and entry[1] is not None and entry[1] <= time.monotonic():
+                        server.data.pop(args[1])
+                        entry = None
+                    reply = self._bulk(entry[0] if entry else None)
+                elif command == b"SET":
+                    expires_at, exists = None, False
+                    options = [arg.upper() for arg in args[3:]]
+                    for unit, scale in ((b"PX", 1000), (b"EX", 1)):
+                        if unit in options:
+                            ttl = float(args[3 + options.index(unit) + 1]) / scale
+                            expires_at = time.monotonic() + ttl
+                    if b"NX" in options:
+                        entry = server.data.get(args[1])
+                        exists = entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+                    if exists:
+                        reply = self._bulk(None)
+                    else:
+                        server.data[args[1]] = (args[2], expires_at)
+                        reply = b"+OK\r\n"
+                elif command == b"DEL":
+                    removed = sum(1 for key in args[1:] if server.data.pop(key, None) is not None)
+                    reply = b":%d\r\n" % removed
+                elif command == b"INCR":
+                    value = int(server.data.get(args[1], (b"0", None))[0]) + 1
+                    server.data[args[1]] = (str(value).encode(), None)
+                    reply = b":%d\r\n" % value
+                elif command == b"PUBLISH":
+                    receivers = list(server.subscribers.get(args[1], []))
+                    reply = b":%d\r\n" % len(receivers)
+                elif command == b"SUBSCRIBE":
+                    for channel in args[1:]:
+                        server.subscribers.setdefault(channel, []).append(self)
+                    reply = b"".join(b"*3\r\n" + self._bulk("subscribe") + self._bulk(channel) + b":%d\r\n" % i
+                                     for i, channel in enumerate(args[1:], start=1))
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            if command == b"PUBLISH":
+                message = b"*3\r\n" + self._bulk("message") + self._bulk(args[1]) + self._bulk(args[2])
+                for subscriber in receivers:
+                    try:
+                        subscriber._write(message)
+                    except OSError:
+                        pass
+            self._write(reply)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    server = KeyValueStubServer(("127.0.0.1", port))
+    print(f"Key-value stand-in listening on 127.0.0.1:{server.port}")
+    server.serve_forever()
@@ -0,0 +1,96 @@
+"""
+A stand-in for the pymysql connections of MySQLRDBDataService, for testing the data service without a
+database. Every statement is logged as sent; statements whose parameters are all ints arrive with them
+already filled in (see render_int_args). A statement is answered from the first (pattern, result) in
+responses whose regular expression is found in it: result is the list of rows a SELECT returns, an int
+rowcount for a write, or a callable taking (sql, args) that returns either. Other statements return no
+rows and affect one row.
+"""
+import re
+
+import pytest
+
+
+class MySQLStubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = connection.lastrowid
+
+    def execute(self, sql, args=None):
+        sql = " ".join(sql.split())
+        self.connection.statements.append((sql, args))
+        result = None
+        for pattern, response in self.connection.responses:
+            if re.search(pattern, sql):
+                result = response(sql, args) if callable(response) else response
+                break
+        if isinstance(result, int):
+            self.rows, self.rowcount = [], result
+        else:
+            self.rows = list(result or [])
+            self.rowcount = len(self.rows) if sql.startswith("SELECT") else 1
+        return self.rowcount
+
+    def executemany(self, sql, args):
+        self.connection.statements.append((" ".join(sql.split()), list(args)))
+        self.rowcount = len(args)
+        return self.rowcount
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class MySQLStubConnection:
+    def __init__(self, responses):
+        self.responses = responses
+        self.statements = []  # (sql, args)
+        self.transactions = []  # BEGIN, COMMIT and ROLLBACK in order
+        self.lastrowid = 1
+        self.open = True
+
+    def cursor(self):
+        return MySQLStubCursor(self)
+
+    def begin(self):
+        self.transactions.append("BEGIN")
+
+    def commit(self):
+        self.transactions.append("COMMIT")
+
+    def rollback(self):
+        self.transactions.append("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+    def sql(self, prefix=""):
+        """
+        :return: The statements sent that start with prefix.
+        """
+        return [sql for sql, _ in self.statements if sql.startswith(prefix)]
+
+
+def make_data_service(responses=(), **context):
+    """
+    :return: (MySQLRDBDataService, connections), the service opening a MySQLStubConnection answering
+        from responses whenever its pool connects; connections lists them in order.
+    """
+    pytest.importorskip("pymysql")
+    from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
+    service = MySQLRDBDataService(context=dict(host="localhost", port=3306, user="u", password="p", **context))
+    connections = []
+
+    def connect():
+        connections.append(MySQLStubConnection(list(responses)))
+        return connections[-1]
+
+    service.pool._connect = connect
+    return service, connections
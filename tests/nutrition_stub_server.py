@@ -0,0 +1,85 @@
+"""
+A local stand-in for the nutrition service used by NutritionClient. It answers
+GET /nutrition/{recipe_id} with made-up nutrition facts, or 404 for the ids in missing, after delay
+seconds. Run it standalone for local development (then set NUTRITION_SERVICE_URL=http://127.0.0.1:8081):
+
+    python -m tests.nutrition_stub_server 8081
+"""
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class NutritionStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, _Handler)
+        self.delay = 0.0
+        self.missing = set()
+        self.requests = []  # (path, headers) of every request
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @staticmethod
+    def nutrition(recipe_id: int) -> dict:
+        return {"recipe_id": recipe_id, "protein_g": recipe_id % 40, "fat_g": recipe_id % 25,
+                "carbohydrates_g": recipe_id % 90}
+
+    def handle_error(self, request, client_address):
+        # A client that gave up on a slow answer closed the connection; that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+        if server.delay:
+            time.sleep(server.delay)
+
+        match = re.fullmatch(r"/nutrition/(\d+)", self.path)
+        if match is None or int(match.group(1)) in server.missing:
+            status, body = 404, {"detail": "Not found"}
+        else:
+            status, body = 200, server.nutrition(int(match.group(1)))
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    server = NutritionStubServer(("127.0.0.1", port))
+    print(f"Nutrition service stand-in listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,214 @@
+import ast
+import re
+
+import pytest
+
+
+class TableCursor:
+    """
+    Answers the statements of delete_data_bulk from an in-memory recipes table. Statements are matched
+    with their parameters filled in, as the service sends all-int statements already rendered.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, sql, args=None):
+        sql = " ".join(sql.split())
+        if args:
+            sql = sql % tuple(repr(arg) for arg in args)
+        self.connection.log.append(sql)
+        table = self.connection.table
+        in_list = re.search(r"IN \(([^)]*)\)", sql)
+        ids = {int(value) for value in in_list.group(1).split(",")} if in_list else None
+        if sql.startswith("SELECT") and sql.endswith("FOR UPDATE"):
+            if ids is not None:
+                rows = [row for row in table if row["recipe_id"] in ids]
+            else:
+                after = int(re.search(r"`recipe_id` > (\d+)", sql).group(1))
+                rows = [row for row in table if row["recipe_id"] > after]
+            for column, value in re.findall(r"AND `(\w+)`=('[^']*'|\d+)", sql):
+                rows = [row for row in rows if row[column] == ast.literal_eval(value)]
+            for column in re.findall(r"AND `(\w+)` IS NULL", sql):
+                rows = [row for row in rows if row[column] is None]
+            limit = re.search(r"LIMIT (\d+)", sql)
+            self.rows = sorted(rows, key=lambda row: row["recipe_id"])[:int(limit.group(1)) if limit else None]
+        elif sql.startswith("DELETE FROM `db`.`recipes`"):
+            table[:] = [row for row in table if row["recipe_id"] not in ids]
+        return len(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+
+class TableConnection:
+    def __init__(self, table):
+        self.table = table
+        self.log = []
+        self.open = True
+
+    def cursor(self):
+        return TableCursor(self)
+
+    def begin(self):
+        self.log.append("BEGIN")
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+def make_service(recipes):
+    pytest.importorskip("pymysql")
+    from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
+    service = MySQLRDBDataService(context=dict(host="localhost", port=3306, user="u", password="p"))
+    table = [{"recipe_id": recipe_id, "name": f"Recipe {recipe_id}", "meal_type": meal_type, "rating": None,
+              "calories": None} for recipe_id, meal_type in recipes]
+    connections = []
+    service.pool._connect = lambda: connections.append(TableConnection(table)) or connections[-1]
+    return service, table, connections
+
+
+def keyset_conditions(connection):
+    return [re.search(r"WHERE (.*) ORDER BY", sql).group(1) for sql in connection.log if sql.startswith("SELECT")]
+
+
+def test_bulk_delete_validates_its_arguments():
+    service, _, connections = make_service([])
+    for filters in ({"recipe_id": 1}, {"version": 1}, {"colour": "red"}):
+        with pytest.raises(ValueError):
+            service.delete_data_bulk("db", "recipes", filters=filters)
+    with pytest.raises(ValueError):
+        service.delete_data_bulk("db", "recipes")
+    assert connections == []
+
+
+def test_bulk_delete_by_ids_commits_chunk_by_chunk(capsys):
+    service, table, connections = make_service([(n, "dinner" if n % 2 else "lunch") for n in range(1, 8)])
+    chunks = []
+    deleted = service.delete_data_bulk("db", "recipes", recipe_ids=[6, 1, 2, 2, 3, 99, 5, 98], chunk_size=2,
+                                       progress=lambda ids, names, total: chunks.append((ids, names, total)))
+
+    # Chunks are taken in recipe_id order; ids that do not exist are ignored
+    assert deleted == 5
+    assert chunks == [([1, 2], ["Recipe 1", "Recipe 2"], 2), ([3, 5], ["Recipe 3", "Recipe 5"], 4),
+                      ([6], ["Recipe 6"], 5)]
+    assert [row["recipe_id"] for row in table] == [4, 7]
+    transactions = [sql for sql in connections[0].log if sql in ("BEGIN", "COMMIT")]
+    assert transactions == ["BEGIN", "COMMIT"] * 4  # the last chunk, [99], is empty
+    assert capsys.readouterr().out == ""  # progress goes to the callback and the log, not stdout
+
+    # ids and filters together delete only the ids that match
+    assert service.delete_data_bulk("db", "recipes", recipe_ids=[4, 7], filters={"meal_type": "dinner"}) == 1
+    assert [row["recipe_id"] for row in table] == [4]
+
+
+def test_bulk_delete_by_filters_advances_past_each_chunk():
+    service, table, connections = make_service([(n, "dinner" if n % 2 else None) for n in range(1, 8)])
+    chunks = []
+    deleted = service.delete_data_bulk("db", "recipes", filters={"meal_type": "dinner"}, chunk_size=2,
+                                       progress=lambda ids, names, total: chunks.append(ids))
+
+    assert deleted == 4
+    assert chunks == [[1, 3], [5, 7]]
+    # Each chunk is selected after the last recipe_id of the one before
+    assert keyset_conditions(connections[0]) == [
+        "`recipe_id` > 0 AND `meal_type`='dinner'", "`recipe_id` > 3 AND `meal_type`='dinner'",
+        "`recipe_id` > 7 AND `meal_type`='dinner'",
+    ]
+
+    # None matches NULL
+    assert service.delete_data_bulk("db", "recipes", filters={"meal_type": None}) == 3
+    assert table == []
+
+
+def test_failed_chunk_rolls_back_and_keeps_the_committed_ones():
+    service, table, connections = make_service([(n, None) for n in range(1, 6)])
+    chunks = []
+
+    def progress(ids, names, total):
+        chunks.append(ids)
+        if len(chunks) == 2:
+            raise RuntimeError("progress failed")
+
+    with pytest.raises(RuntimeError):
+        service.delete_data_bulk("db", "recipes", recipe_ids=[1, 2, 3, 4, 5], chunk_size=2, progress=progress)
+    assert chunks == [[1, 2], [3, 4]]
+    assert [row["recipe_id"] for row in table] == [5]
+    assert connections[0].log[-1] == "ROLLBACK"
+
+
+class CacheStub:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, recipe_ids=(), names=()):
+        self.invalidated.append((list(recipe_ids), list(names)))
+
+
+class FeedStub:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, recipe_id):
+        self.published.append(recipe_id)
+
+
+class BulkDeleteStub:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    def delete_data_bulk(self, database_name, collection_name, recipe_ids=None, filters=None, progress=None):
+        self.calls.append((recipe_ids, filters))
+        total = 0
+        for ids, names in self.chunks:
+            total += len(ids)
+            progress(ids, names, total)
+        return total
+
+
+@pytest.fixture
+def resource(monkeypatch):
+    from app.resources.recipe_resource import RecipeResource
+    from app.services.service_factory import ServiceFactory
+    services = {"RecipeResourceDataService": BulkDeleteStub([([1, 2], ["Stew", "Soup"]), ([3], ["Pie"])]),
+                "RecipeCache": CacheStub(), "RecipeChangeFeed": FeedStub()}
+    monkeypatch.setattr(ServiceFactory, "get_service", classmethod(lambda cls, name: services.get(name)))
+    return RecipeResource(config=None)
+
+
+def test_delete_many_invalidates_caches_after_each_chunk(resource):
+    progress = []
+    assert resource.delete_many(recipe_ids=[1, 2, 3], progress=lambda ids, total: progress.append((ids, total))) == 3
+    assert resource.cache.invalidated == [([1, 2], ["Stew", "Soup"]), ([3], ["Pie"])]
+    assert resource.change_feed.published == [1, 3]
+    assert progress == [([1, 2], 2), ([3], 3)]
+
+
+def test_delete_recipes_checks_the_request(resource, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from app.routers import recipes
+
+    monkeypatch.setattr(recipes.ServiceFactory, "get_service", classmethod(lambda cls, name: resource))
+    for ids in ("1,x", ",", ",".join(str(n) for n in range(recipes.MAX_BULK_DELETE_IDS + 1))):
+        with pytest.raises(HTTPException) as error:
+            recipes.delete_recipes(ids=ids, meal_type=None)
+        assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        recipes.delete_recipes(ids=None, meal_type=None)
+    assert error.value.status_code == 400
+    assert resource.data_service.calls == []
+
+    assert recipes.delete_recipes(ids="3, 1,2", meal_type="dinner") == {"deleted": 3}
+    assert resource.data_service.calls == [([3, 1, 2], {"meal_type": "dinner"})]
@@ -0,0 +1,127 @@
+import contextvars
+import time
+
+import pytest
+
+from app.resources.recipe_cache import RecipeCache, served_stale_age
+from framework.services.cache.InMemoryCacheService import InMemoryCacheService
+from framework.services.cache.NetworkCacheService import NetworkCacheService
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+from tests.kv_stub_server import KeyValueStubServer
+
+
+@pytest.fixture
+def kv_server():
+    server = KeyValueStubServer().start()
+    yield server
+    server.stop()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_in_memory_cache_expires_and_evicts():
+    cache = InMemoryCacheService(max_entries=2)
+    cache.set("a", 1, ttl=0.01)
+    cache.set("b", 2)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+    cache.set("c", 3)
+    cache.get("b")
+    cache.set("d", 4)
+    assert cache.get("b") == 2
+    assert cache.get("c") is None
+    assert cache.incr("n") == 1 and cache.incr("n") == 2
+
+
+def test_network_cache_round_trip(kv_server):
+    cache = NetworkCacheService(port=kv_server.port, key_prefix="t:")
+    assert cache.get("missing") is None
+    cache.set("k", "v", ttl=5)
+    assert cache.get("k") == "v"
+    cache.delete("k")
+    assert cache.get("k") is None
+    assert cache.incr("counter") == 1
+    assert b"t:counter" in kv_server.data
+
+
+def test_network_cache_failures_are_misses():
+    cache = NetworkCacheService(port=1, timeout=0.05)
+    assert cache.get("k") is None
+    cache.set("k", "v")
+    with pytest.raises(OSError):
+        cache.incr("k")
+
+
+def test_network_cache_pubsub(kv_server):
+    cache = NetworkCacheService(port=kv_server.port)
+    received = []
+    cache.subscribe("events", received.append)
+    assert wait_for(lambda: kv_server.subscribers.get(b"events"))
+    cache.publish("events", "hello")
+    assert wait_for(lambda: received == ["hello"])
+
+
+def test_recipe_cache_invalidates_other_instances(kv_server):
+    caches = [
+        RecipeCache(InMemoryCacheService(), NetworkCacheService(port=kv_server.port), local_ttl=60)
+        for _ in range(2)
+    ]
+    assert wait_for(lambda: len(kv_server.subscribers.get(b"recipes:invalidate", [])) == 2)
+
+    recipe = {"recipe_id": 1, "name": "Soup"}
+    loads = []
+    loader = lambda: loads.append(1) or dict(recipe)
+    assert caches[0].get_recipe("recipe_id", 1, loader) == recipe
+    assert caches[1].get_recipe("recipe_id", 1, loader) == recipe
+    assert len(loads) == 1
+
+    page = caches[1].get_page(0, 10, lambda: [recipe])
+    generation = caches[1].generation()
+    caches[0].invalidate(recipe_ids=[1], names=["Soup"])
+
+    assert wait_for(lambda: caches[1].generation() > generation)
+    assert caches[1].local.get("recipe:id:1") is None
+    assert caches[1].get_page(0, 10, lambda: []) == [] != page
+
+
+def test_recipe_cache_name_pointer_checks_name():
+    cache = RecipeCache(InMemoryCacheService())
+    cache.get_recipe("name", "Soup", lambda: {"recipe_id": 1, "name": "Soup"})
+    cache._set("recipe:id:1", {"recipe_id": 1, "name": "Stew"})
+    assert cache.get_recipe("name", "Soup", lambda: None) is None
+
+
+def test_recipe_cache_serves_stale_while_revalidating():
+    cache = RecipeCache(InMemoryCacheService(), ttl=0.05, max_stale=60)
+    versions = iter([{"recipe_id": 1, "version": 1}, {"recipe_id": 1, "version": 2}])
+    loader = lambda: next(versions)
+    assert cache.get_recipe("recipe_id", 1, loader)["version"] == 1
+    time.sleep(0.06)
+
+    request = contextvars.Context()
+    assert request.run(cache.get_recipe, "recipe_id", 1, loader)["version"] == 1
+    assert request.run(served_stale_age) >= 0.05
+    assert wait_for(lambda: cache.local.get("recipe:id:1")[0]["version"] == 2)
+
+
+def test_recipe_cache_falls_back_to_stale_copy_during_outage():
+    cache = RecipeCache(InMemoryCacheService(), NetworkCacheService(port=1, timeout=0.05),
+                        ttl=60, local_ttl=0, max_stale=60)
+    cache.get_page(0, 10, lambda: [{"recipe_id": 1}])
+
+    def unavailable():
+        raise ServiceUnavailableException("database down")
+
+    request = contextvars.Context()
+    assert request.run(cache.get_page, 0, 10, unavailable) == [{"recipe_id": 1}]
+    assert request.run(served_stale_age) is not None
+    with pytest.raises(ServiceUnavailableException):
+        cache.get_page(10, 10, unavailable)
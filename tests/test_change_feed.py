@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from app.resources.recipe_change_feed import RecipeChangeFeed
+from framework.services.cache.InMemoryCacheService import InMemoryCacheService
+
+
+class OutboxStub:
+    """
+    The change outbox as readers see it: only committed changes, which need not commit in change_id order.
+    """
+
+    def __init__(self, changes, pruned=0):
+        self.changes = changes
+        self.pruned = pruned
+
+    def commit(self, change_id, recipe_id=1, operation="update"):
+        self.changes.append({"change_id": change_id, "recipe_id": recipe_id, "operation": operation})
+        self.changes.sort(key=lambda c: c["change_id"])
+
+    def get_change_bounds(self, database_name):
+        if not self.changes:
+            return None, None
+        return self.changes[0]["change_id"], self.changes[-1]["change_id"]
+
+    def get_pruned_change_id(self, database_name):
+        return self.pruned
+
+    def get_changes(self, database_name, after_change_id, limit=100):
+        return [c for c in self.changes if c["change_id"] > after_change_id][:limit]
+
+
+def change_ids(changes):
+    return [c["change_id"] for c in changes]
+
+
+def test_change_feed_wakes_listeners_and_reads_after_offset():
+    changes = [{"change_id": n, "recipe_id": 1, "operation": "update"} for n in (3, 4, 5)]
+    feed = RecipeChangeFeed(OutboxStub(changes), InMemoryCacheService())
+
+    woken = []
+    listener = lambda: woken.append(True)
+    feed.add_listener(listener)
+    feed.publish(1)
+    feed.remove_listener(listener)
+    feed.publish(1)
+
+    assert woken == [True]
+    assert feed.bounds() == (3, 5)
+    assert [c["change_id"] for c in feed.read(3, limit=1)] == [4]
+
+
+def test_reads_stop_before_uncommitted_changes():
+    outbox = OutboxStub([])
+    for change_id in (1, 2, 4, 5):
+        outbox.commit(change_id)  # 3 is not committed yet
+    feed = RecipeChangeFeed(outbox, InMemoryCacheService(), gap_timeout=0.1)
+
+    assert change_ids(feed.read(0)) == [1, 2]
+    assert change_ids(feed.read(2)) == []
+    assert feed.head() == 2  # a consumer starting now must not skip 3 either
+
+    outbox.commit(3)
+    assert change_ids(feed.read(2)) == [3, 4, 5]
+
+
+def test_gaps_left_by_rollbacks_are_skipped_after_the_timeout():
+    outbox = OutboxStub([])
+    for change_id in (1, 4, 6):
+        outbox.commit(change_id)  # 2, 3 and 5 rolled back
+    feed = RecipeChangeFeed(outbox, InMemoryCacheService(), gap_timeout=0.05)
+
+    assert change_ids(feed.read(0)) == [1]
+    time.sleep(0.06)
+    assert change_ids(feed.read(1)) == [4]  # 5 was first seen just now
+    time.sleep(0.06)
+    assert change_ids(feed.read(4)) == [6]
+    assert feed.head() == 6
+
+    # Rolled back ids right after the pruning watermark are not mistaken for pruned changes
+    assert RecipeChangeFeed(OutboxStub([], pruned=4), InMemoryCacheService()).head() == 4
+
+
+class StreamRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def stream_events(feed, monkeypatch, after, until, on_event=None):
+    """
+    Run GET /recipes/changes against feed and return the (event type, id) of the events it sends until
+    the until-th event.
+    """
+    changes = pytest.importorskip("app.routers.changes")
+    monkeypatch.setattr(changes, "POLL_INTERVAL", 0.02)
+    monkeypatch.setattr(changes.ServiceFactory, "get_service", classmethod(lambda cls, name: feed))
+
+    async def run():
+        request = StreamRequest()
+        response = await changes.recipe_changes(request, after=after, last_event_id=None)
+        events = []
+        async for chunk in response.body_iterator:
+            lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n") if ": " in line)
+            if "event" in lines:
+                events.append((lines["event"], lines.get("id")))
+                if on_event:
+                    on_event(events)
+                if len(events) == until:
+                    request.disconnected = True
+        return events
+
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_stream_sends_changes_in_order_when_they_commit_out_of_order(monkeypatch):
+    pytest.importorskip("fastapi")
+    outbox = OutboxStub([])
+    for change_id in (1, 3):
+        outbox.commit(change_id)  # 2 commits after 3
+    feed = RecipeChangeFeed(outbox, InMemoryCacheService(), gap_timeout=30)
+
+    def commit_late(events):
+        if len(events) == 1:
+            outbox.commit(2)
+            feed.publish(1)
+
+    events = stream_events(feed, monkeypatch, after=0, until=3, on_event=commit_late)
+    assert events == [("update", "1"), ("update", "2"), ("update", "3")]
+
+
+def test_stream_resets_consumers_behind_the_pruned_changes(monkeypatch):
+    pytest.importorskip("fastapi")
+    outbox = OutboxStub([{"change_id": 7, "recipe_id": 1, "operation": "delete"}], pruned=5)
+    feed = RecipeChangeFeed(outbox, InMemoryCacheService(), gap_timeout=0)
+
+    assert stream_events(feed, monkeypatch, after=2, until=2) == [("reset", None), ("delete", "7")]
+    # 6 rolled back: not a reason to reset
+    assert stream_events(feed, monkeypatch, after=5, until=1) == [("delete", "7")]
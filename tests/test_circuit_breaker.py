@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from framework.services.data_access.BaseDataService import ServiceUnavailableException
+from framework.services.data_access.CircuitBreaker import CircuitBreaker, CircuitOpenException
+
+
+def test_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(min_calls=4, failure_rate_threshold=0.5, open_seconds=10)
+    for failed in (False, True, False, True):
+        breaker.before_call()
+        breaker.record(0.01, failed=failed)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenException) as e:
+        breaker.before_call()
+    assert isinstance(e.value, ServiceUnavailableException)
+    assert 0 < e.value.retry_after <= 10
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker(min_calls=3, slow_call_seconds=0.5, slow_call_rate_threshold=1.0)
+    for _ in range(2):
+        breaker.record_success(1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success(1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_success(0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
@@ -0,0 +1,27 @@
+import gzip
+
+from framework.utils.compression import CompressedBodyCache, negotiate_encoding
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") == negotiate_encoding("br, gzip")
+    assert negotiate_encoding("br;q=0.5, gzip;q=0.9", supported=("br", "gzip")) == "gzip"
+    assert negotiate_encoding("br, gzip", supported=("br", "gzip")) == "br"
+    assert negotiate_encoding("*;q=0.1, gzip;q=0", supported=("br", "gzip")) == "br"
+
+
+def test_compressed_body_cache_reuses_compressed_bytes():
+    cache = CompressedBodyCache(max_entries=1)
+    body = b'{"items": []}' * 200
+    first = cache.get_or_compress(body, "gzip")
+    assert gzip.decompress(first) == body
+    assert cache.get_or_compress(body, "gzip") is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get_or_compress(b"other" * 100, "gzip")
+    assert len(cache) == 1
+    assert cache.get_or_compress(body, "gzip") is not first
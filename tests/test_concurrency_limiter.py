@@ -0,0 +1,34 @@
+from framework.utils.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+
+def test_limiter_rejects_over_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+    tokens = [limiter.try_acquire(), limiter.try_acquire()]
+    assert None not in tokens
+    assert limiter.try_acquire() is None
+    assert limiter.stats()["rejected"] == 1
+    limiter.release(tokens[0])
+    assert limiter.try_acquire() is not None
+
+
+def test_limiter_grows_when_busy_and_fast():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=5)
+    for _ in range(50):
+        tokens = [limiter.try_acquire() for _ in range(int(limiter.limit))]
+        for token in tokens:
+            limiter.release(token)
+    assert limiter.limit == 5
+
+
+def test_limiter_backs_off_on_slow_or_dropped_requests():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, min_limit=2)
+    limiter.release(limiter.try_acquire())  # baseline latency
+    token = limiter.try_acquire()
+    limiter.release(token - 1.0)  # a request that took a second
+    assert limiter.limit < 10
+
+    limit = limiter.limit
+    limiter._last_decrease = 0.0
+    limiter.release(limiter.try_acquire(), dropped=True)
+    assert limiter.limit < limit
+    assert limiter.limit >= 2
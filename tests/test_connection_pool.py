@@ -0,0 +1,65 @@
+import pytest
+
+from framework.services.data_access.ConnectionPool import ConnectionPool, PoolTimeoutException
+
+
+class StubConnection:
+    def __init__(self):
+        self.open = True
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def close(self):
+        self.open = False
+
+
+def test_pool_reuses_released_connections():
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(StubConnection()) or opened[-1], max_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    assert len(opened) == 1
+
+
+def test_pool_times_out_when_exhausted():
+    pool = ConnectionPool(StubConnection, max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeoutException):
+        pool.acquire()
+
+
+def test_pool_frees_slot_of_closed_connection():
+    pool = ConnectionPool(StubConnection, max_size=1, timeout=0.05)
+    connection = pool.acquire()
+    connection.close()
+    pool.release(connection)
+    assert pool.acquire() is not connection
+
+
+def test_pool_frees_slot_when_connect_fails():
+    def fail():
+        raise ConnectionError("down")
+
+    pool = ConnectionPool(fail, max_size=1)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool.stats()["size"] == 0
+
+
+def test_pool_pings_idle_connections():
+    pool = ConnectionPool(StubConnection, max_size=1, ping_interval=0)
+    connection = pool.acquire()
+    pool.release(connection)
+    assert pool.acquire().pings == 1
+
+
+def test_warmup_and_forked_child_starts_empty():
+    pool = ConnectionPool(StubConnection, max_size=4, min_size=3)
+    assert pool.warmup() == 3
+    assert pool.stats() == {"size": 3, "idle": 3, "in_use": 0, "max_size": 4}
+
+    pool._pid = -1  # as seen from a forked child
+    assert pool.stats()["size"] == 0
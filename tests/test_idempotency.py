@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from framework.services.cache.NetworkCacheService import NetworkCacheService
+from framework.utils.idempotency import (
+    IdempotencyKeyInProgressException, IdempotencyKeyReusedException, IdempotencyStore, SharedIdempotencyStore
+)
+from tests.kv_stub_server import KeyValueStubServer
+
+
+def test_repeated_key_replays_the_response():
+    store = IdempotencyStore()
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return {"recipe_id": len(calls)}
+
+    assert store.run("k", "body", execute) == ({"recipe_id": 1}, False)
+    assert store.run("k", "body", execute) == ({"recipe_id": 1}, True)
+    assert store.run("other", "body", execute) == ({"recipe_id": 2}, False)
+    assert len(calls) == 2 and store.replayed == 1
+
+    with pytest.raises(IdempotencyKeyReusedException):
+        store.run("k", "different body", execute)
+
+
+def test_failed_requests_are_not_kept():
+    store = IdempotencyStore()
+
+    def fail():
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        store.run("k", "body", fail)
+    assert len(store) == 0
+    assert store.run("k", "body", lambda: "created") == ("created", False)
+
+
+def test_concurrent_duplicates_wait_for_the_first():
+    store = IdempotencyStore()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "created"
+
+    first = threading.Thread(target=lambda: results.append(store.run("k", "body", slow)))
+    first.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(store.run("k", "body", slow))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [first] + waiters:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(results) == [("created", False)] + [("created", True)] * 3
+
+
+def test_waiting_times_out():
+    store = IdempotencyStore(wait_timeout=0.05)
+    release = threading.Event()
+    thread = threading.Thread(target=store.run, args=("k", "body", lambda: release.wait(5)))
+    thread.start()
+    time.sleep(0.02)
+    try:
+        with pytest.raises(IdempotencyKeyInProgressException):
+            store.run("k", "body", lambda: None)
+    finally:
+        release.set()
+        thread.join(5)
+
+
+def test_keys_expire_and_are_bounded():
+    store = IdempotencyStore(ttl=0.05, max_entries=2)
+    for key in ("a", "b", "c"):
+        store.run(key, "body", lambda: key)
+    assert len(store) == 2
+    assert store.run("a", "body", lambda: "again") == ("again", False)  # dropped to stay within bounds
+    time.sleep(0.06)
+    assert store.run("b", "body", lambda: "expired") == ("expired", False)
+    assert len(store) == 1
+
+
+@pytest.fixture
+def kv_server():
+    server = KeyValueStubServer().start()
+    yield server
+    server.stop()
+
+
+def shared_store(kv_server, **options):
+    # One per worker: they only share the key-value server
+    return SharedIdempotencyStore(NetworkCacheService(port=kv_server.port), IdempotencyStore(),
+                                  poll_interval=0.01, **options)
+
+
+def test_shared_keys_are_recognised_by_every_worker(kv_server):
+    first_worker, second_worker = shared_store(kv_server), shared_store(kv_server)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"recipe_id": 7}
+
+    thread = threading.Thread(target=lambda: results.append(first_worker.run("k", "body", slow)))
+    thread.start()
+    started.wait(5)
+    retry = threading.Thread(target=lambda: results.append(second_worker.run("k", "body", slow)))
+    retry.start()
+    time.sleep(0.05)
+    release.set()
+    for t in (thread, retry):
+        t.join(5)
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [({"recipe_id": 7}, False), ({"recipe_id": 7}, True)]
+
+    with pytest.raises(IdempotencyKeyReusedException):
+        second_worker.run("k", "different body", slow)
+
+
+def test_shared_key_is_released_when_the_request_fails(kv_server):
+    first_worker, second_worker = shared_store(kv_server), shared_store(kv_server, wait_timeout=0.05)
+
+    def fail():
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        first_worker.run("k", "body", fail)
+    assert second_worker.run("k", "body", lambda: "created") == ("created", False)
+
+
+def test_shared_store_falls_back_to_the_process_when_unreachable():
+    store = SharedIdempotencyStore(NetworkCacheService(port=1, timeout=0.05), IdempotencyStore())
+    assert store.run("k", "body", lambda: "created") == ("created", False)
+    assert store.run("k", "body", lambda: "again") == ("created", True)
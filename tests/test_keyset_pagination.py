@@ -0,0 +1,188 @@
+import json
+import sqlite3
+import struct
+
+import pytest
+
+from tests.mysql_stub import make_data_service
+
+# (recipe_id, name, calories, rating): ties and NULLs land on page boundaries for the page sizes below.
+# 4.3 and 3.7 have no exact single-precision value, like most ratings.
+RECIPES = [(1, "Stew", 700, 4.3), (2, "Soup", None, None), (3, "Pie", 500, 4.3), (4, "Taco", 300, 3.7),
+           (5, "Rice", None, None), (6, "Naan", 300, 4.3), (7, "Dahl", 450, 5.0), (8, "Kale", 80, 3.7),
+           (9, "Flan", None, None), (10, "Chai", 120, 4.3), (11, "Wrap", 300, 2.1), (12, "Pho", 380, 4.3)]
+
+
+def float32(value):
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def as_sent(value):
+    """
+    A FLOAT as MySQL sends it to pymysql: the shortest decimal that reads back as the stored single.
+    """
+    for digits in range(1, 10):
+        shortest = float(f"{value:.{digits}g}")
+        if float32(shortest) == value:
+            return shortest
+    return value
+
+
+class SQLiteCursor:
+    """
+    Runs the data service's SELECTs on SQLite, which sorts NULLs like MySQL: first ascending, last
+    descending. rating is stored as a single-precision value, like MySQL's FLOAT column.
+    """
+
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+        self.rows = []
+
+    def execute(self, sql, args=None):
+        self.cursor.execute(sql.replace("%s", "?"), list(args or []))
+        names = [d[0] for d in self.cursor.description]
+        self.rows = [dict(zip(names, row)) for row in self.cursor.fetchall()]
+        for row in self.rows:
+            if row.get("rating") is not None:
+                row["rating"] = as_sent(row["rating"])
+
+    def fetchall(self):
+        return self.rows
+
+
+class SQLiteConnection:
+    def __init__(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("ATTACH ':memory:' AS db")
+        self.connection.execute("CREATE TABLE db.recipes (recipe_id INTEGER PRIMARY KEY, name TEXT, steps TEXT, "
+                                "time_to_cook INTEGER, meal_type TEXT, calories INTEGER, rating REAL, version INTEGER)")
+        self.connection.execute("CREATE TABLE db.ingredients (ingredient_id INTEGER PRIMARY KEY, recipe_id INTEGER, "
+                                "ingredient_name TEXT, quantity TEXT)")
+        self.connection.executemany(
+            "INSERT INTO db.recipes (recipe_id, name, calories, rating, version) VALUES (?, ?, ?, ?, 1)",
+            [(recipe_id, name, calories, float32(rating) if rating is not None else None)
+             for recipe_id, name, calories, rating in RECIPES]
+        )
+        self.open = True
+
+    def cursor(self):
+        return SQLiteCursor(self.connection)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def service():
+    pytest.importorskip("pymysql")
+    from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
+    service = MySQLRDBDataService(context=dict(host="localhost", port=3306, user="u", password="p"))
+    service.pool._connect = SQLiteConnection
+    return service
+
+
+def expected_order(sort, descending):
+    column = {"recipe_id": 0, "name": 1, "calories": 2, "rating": 3}[sort]
+    # NULLs first, ties by recipe_id; descending is the exact reverse
+    order = sorted(RECIPES, key=lambda r: (r[column] is not None, r[column] or 0, r[0]) if sort != "name"
+                   else (r[1], r[0]))
+    ids = [r[0] for r in order]
+    return ids[::-1] if descending else ids
+
+
+def page_through(service, sort, descending, limit, cursor):
+    """
+    :param cursor: Called as cursor(sort, descending, last row of a page) for the next page's after.
+    """
+    ids, after = [], None
+    for _ in range(len(RECIPES) + 1):
+        rows = service.get_all_data("db", "recipes", limit=limit, fields=["name"], include_ingredients=False,
+                                    sort=sort, descending=descending, after=after)
+        ids.extend(row["recipe_id"] for row in rows)
+        if len(rows) < limit:
+            return ids
+        after = cursor(sort, descending, rows[-1])
+    raise AssertionError("pagination does not end")
+
+
+@pytest.mark.parametrize("sort", ["rating", "calories", "name", "recipe_id"])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_pages_neither_skip_nor_repeat_rows(service, sort, descending, limit):
+    def json_cursor(sort, descending, row):
+        # The cursor value makes a JSON round trip, as in the next link
+        return tuple(json.loads(json.dumps([row[sort], row["recipe_id"]])))
+
+    assert page_through(service, sort, descending, limit, json_cursor) == expected_order(sort, descending)
+
+
+def test_rating_cursor_is_compared_as_a_single(service):
+    # 4.3 as sent is not the stored single; compared as a double, the rating ties after recipe 3 are lost
+    first = service.get_all_data("db", "recipes", limit=5, include_ingredients=False, sort="rating")
+    assert [row["recipe_id"] for row in first] == [2, 5, 9, 11, 4]
+    page = service.get_all_data("db", "recipes", limit=3, include_ingredients=False, sort="rating",
+                                after=(4.3, 3))
+    assert [row["recipe_id"] for row in page] == [6, 10, 12]
+    assert service._keyset_args("rating", (4.3, 3)) == [float32(4.3), float32(4.3), 3]
+    assert service._keyset_args("calories", (None, 9)) == [9]
+
+
+@pytest.fixture
+def recipes():
+    pytest.importorskip("fastapi")
+    from app.routers import recipes
+    return recipes
+
+
+def test_router_cursors(service, recipes):
+    from fastapi import HTTPException, Response
+    assert recipes.parse_sort(None) == (None, False)
+    assert recipes.parse_sort("-rating") == ("rating", True)
+
+    def router_cursor(sort, descending, row):
+        return recipes.decode_cursor(recipes.encode_cursor(sort, descending, row), sort, descending)
+
+    assert page_through(service, "rating", True, 2, router_cursor) == expected_order("rating", True)
+
+    cursor = recipes.encode_cursor("rating", True, {"rating": 4.3, "recipe_id": 3})
+    bad = [("rating", True, "not a cursor!"), ("rating", True, cursor[:-3]), ("calories", True, cursor),
+           ("rating", False, cursor), ("rating", True, recipes.base64.urlsafe_b64encode(b"[1, 2]").decode())]
+    for sort, descending, value in bad:
+        with pytest.raises(HTTPException) as error:
+            recipes.decode_cursor(value, sort, descending)
+        assert error.value.status_code == 400
+    for sort in ("colour", "-steps"):
+        with pytest.raises(HTTPException) as error:
+            recipes.parse_sort(sort)
+        assert error.value.status_code == 400
+
+    with pytest.raises(HTTPException) as error:
+        recipes.get_all_recipes(request=None, response=Response(), skip=5, limit=10, fields=None, expand=None,
+                                sort="-rating", cursor=cursor)
+    assert (error.value.status_code, error.value.detail) == (400, "Use either skip or cursor")
+
+
+def test_top_rated_groups_rows_by_meal_type_case_insensitively():
+    def row(recipe_id, meal_type, rating):
+        return {"recipe_id": recipe_id, "name": f"Recipe {recipe_id}", "steps": None, "time_to_cook": None,
+                "meal_type": meal_type, "calories": None, "rating": rating, "version": 1}
+
+    service, connections = make_data_service([
+        (r"^SELECT DISTINCT", [{"meal_type": "dinner"}, {"meal_type": "Breakfast"}]),
+        # The collation matches meal types case-insensitively, so rows need not have the requested spelling
+        (r"UNION ALL", [row(4, "Breakfast", 3.5), row(1, "DINNER", 4.0), row(2, "dinner", 4.5),
+                        row(3, "Dinner", 4.5), row(5, "breakfast", 4.0)]),
+    ])
+    top = service.get_top_rated("db", "recipes", limit=3)
+    assert {meal_type: [r["recipe_id"] for r in rows] for meal_type, rows in top.items()} == {
+        "Breakfast": [5, 4], "dinner": [3, 2, 1]
+    }
+    statement, args = connections[0].statements[-1]
+    assert statement.count("UNION ALL") == 1 and args == ["Breakfast", 3, "dinner", 3]
+
+    service, connections = make_data_service([(r"UNION ALL", [row(1, "DINNER", 4.0)])])
+    assert list(service.get_top_rated("db", "recipes", meal_types=["Dinner"])) == ["Dinner"]
+    assert service.get_top_rated("db", "recipes", meal_types=[]) == {}
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from framework.utils.micro_batcher import MicroBatcher
+
+
+def run_concurrently(batcher, keys):
+    results = {}
+    errors = []
+    barrier = threading.Barrier(len(keys))
+
+    def load(i, key):
+        barrier.wait(5)
+        try:
+            results[i] = batcher.load(key)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=(i, key)) for i, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_loads_share_one_call():
+    calls = []
+
+    def load_many(keys):
+        calls.append(sorted(keys))
+        return {key: f"recipe {key}" for key in keys if key != 4}
+
+    batcher = MicroBatcher(load_many, window=0.2)
+    keys = [1, 2, 3, 2, 4]
+    results, errors = run_concurrently(batcher, keys)
+    assert not errors
+    assert calls == [[1, 2, 3, 4]]  # the repeated key is loaded once
+    assert [results[i] for i in range(len(keys))] == ["recipe 1", "recipe 2", "recipe 3", "recipe 2", None]
+    assert batcher.stats() == {"loads": 5, "batches": 1, "average_batch": 5.0}
+
+
+def test_full_batches_close_early():
+    calls = []
+
+    def load_many(keys):
+        calls.append(len(keys))
+        return {key: key for key in keys}
+
+    # The window is far longer than the test: only max_batch can close the batches in time
+    batcher = MicroBatcher(load_many, window=30, max_batch=3)
+    results, errors = run_concurrently(batcher, list(range(6)))
+    assert not errors
+    assert calls == [3, 3]
+    assert results == {i: i for i in range(6)}
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    def load_many(keys):
+        raise RuntimeError("database down")
+
+    batcher = MicroBatcher(load_many, window=0.2)
+    results, errors = run_concurrently(batcher, [1, 2, 3])
+    assert not results
+    assert len(errors) == 3 and all(isinstance(e, RuntimeError) for e in errors)
+
+    # The next batch starts afresh
+    batcher.load_many = lambda keys: {key: key for key in keys}
+    assert batcher.load(7) == 7
+
+    with pytest.raises(RuntimeError):
+        MicroBatcher(load_many, window=0).load(1)
@@ -204,3 +204,9 @@ def test_paginated_response_serialization():
     assert isinstance(json_data, str)
     parsed_paginated = PaginatedResponse.model_validate_json(json_data)
     assert parsed_paginated == paginated
+
+
+def test_recipe_model_version():
+    recipe = Recipe.model_validate({**valid_recipe_data, "version": 3})
+    assert recipe.version == 3
+    assert Recipe.model_validate(valid_recipe_data).version is None
@@ -0,0 +1,35 @@
+from framework.utils.name_matching import TrigramIndex, normalize_name, trigrams
+
+
+def test_normalize_name():
+    assert normalize_name("  Crème \t Brûlée ") == "creme brulee"
+    assert normalize_name("CAFÉ au lait") == normalize_name("cafe  au  LAIT") == "cafe au lait"
+    assert normalize_name("Straße") == "strasse"
+    assert normalize_name("ﬁsh pie") == "fish pie"
+    assert len(normalize_name("a" * 300)) == 255
+
+
+def test_trigrams():
+    assert trigrams("pie") == {"  p", " pi", "pie", "ie "}
+    assert trigrams("") == set()
+
+
+def test_trigram_index_search():
+    index = TrigramIndex()
+    for key, name in enumerate(["Spaghetti Carbonara", "Spaghetti Bolognese", "Chicken Curry", "Carrot Cake"]):
+        index.add(key, name)
+
+    matches = index.search("spagetti carbonara")
+    assert [key for _, key in matches] == [0]
+    assert 0.5 < matches[0][0] < 1
+    assert [key for _, key in index.search("spagetti carbonara", min_similarity=0.1)] == [0, 1, 3]
+    assert len(index.search("spagetti carbonara", limit=2, min_similarity=0)) == 2
+    assert index.search("Chicken Curry")[0] == (1.0, 2)
+    assert index.search("zzz") == []
+    assert index.search("") == []
+
+    index.remove(0, "Spaghetti Carbonara")
+    index.remove(1)  # without the text
+    index.remove(1)
+    assert [key for _, key in index.search("spagetti carbonara", min_similarity=0.1)] == [3]
+    assert len(index) == 2
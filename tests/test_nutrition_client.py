@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from framework.services.nutrition.NutritionClient import NutritionClient  # noqa: E402
+from tests.nutrition_stub_server import NutritionStubServer  # noqa: E402
+
+
+@pytest.fixture
+def nutrition_server():
+    server = NutritionStubServer().start()
+    yield server
+    server.stop()
+
+
+def run(client, coroutine):
+    async def main():
+        await client.start()
+        try:
+            return await coroutine()
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_lookups_run_concurrently_and_are_cached(nutrition_server):
+    nutrition_server.delay = 0.2
+    nutrition_server.missing = {3}
+    client = NutritionClient(nutrition_server.url, timeout=2)
+    headers = {"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"}
+
+    started = time.monotonic()
+    results = run(client, lambda: client.get_many([1, 2, 3, 4, 5, 1], headers))
+    assert time.monotonic() - started < 0.6  # five calls of 0.2s each, in parallel
+    assert results == {i: (None if i == 3 else NutritionStubServer.nutrition(i)) for i in (1, 2, 3, 4, 5)}
+    assert len(nutrition_server.requests) == 5
+    assert all(h.get("traceparent") == headers["traceparent"] for _, h in nutrition_server.requests)
+
+    # Found and missing recipes alike come from the cache now
+    assert run(client, lambda: client.get_many([1, 3])) == {1: NutritionStubServer.nutrition(1), 3: None}
+    assert len(nutrition_server.requests) == 5
+    assert client.stats() == {"calls": 5, "failures": 0, "cached": 5}
+
+
+def test_slow_or_unreachable_service_gives_none(nutrition_server):
+    nutrition_server.delay = 1.0
+    client = NutritionClient(nutrition_server.url, timeout=0.1)
+    started = time.monotonic()
+    assert run(client, lambda: client.get_many([1, 2])) == {1: None, 2: None}
+    assert time.monotonic() - started < 0.5
+    assert client.failures == 2
+
+    # Failures are not cached
+    nutrition_server.delay = 0
+    assert run(client, lambda: client.get(1)) == NutritionStubServer.nutrition(1)
+
+    unreachable = NutritionClient("http://127.0.0.1:9", timeout=0.5)
+    assert run(unreachable, lambda: unreachable.get(1)) is None
@@ -0,0 +1,126 @@
+import pytest
+
+from app.models.recipe import Recipe
+from framework.services.data_access.BaseDataService import NotFoundException, VersionConflictException
+from tests.mysql_stub import make_data_service
+
+
+@pytest.fixture
+def recipes():
+    pytest.importorskip("fastapi")
+    from app.routers import recipes
+    return recipes
+
+
+def test_if_match_parsing(recipes):
+    from fastapi import HTTPException
+    assert recipes.make_etag(3) == '"3"' and recipes.make_etag(None) is None
+    assert recipes.parse_if_match(None) is None
+    assert recipes.parse_if_match("*") is None and recipes.parse_if_match(" * ") is None
+    assert recipes.parse_if_match('"3"') == 3
+    assert recipes.parse_if_match(' W/"3" ') == 3
+    for tag in ("garbage", '"abc"', '"3", "4"', ""):
+        with pytest.raises(HTTPException) as error:
+            recipes.parse_if_match(tag)
+        assert error.value.status_code == 412
+
+
+class ResourceStub:
+    """
+    A recipe at version current_version; writes that expect another version conflict.
+    """
+
+    def __init__(self, current_version):
+        self.current_version = current_version
+        self.write_buffer = None
+
+    def _check(self, key_value, expected_version):
+        if key_value == 404:
+            raise NotFoundException("Recipe with recipe_id=404 not found")
+        if expected_version is not None and expected_version != self.current_version:
+            raise VersionConflictException("modified", current_version=self.current_version)
+
+    def update_by_key(self, key_value, key_field, data, expected_version=None):
+        self._check(key_value, expected_version)
+        self.current_version += 1
+        return Recipe(recipe_id=1, name="Stew", ingredients=[], version=self.current_version)
+
+    def delete_by_key(self, key_value, key_field, expected_version=None):
+        self._check(key_value, expected_version)
+
+
+@pytest.fixture
+def resource(recipes, monkeypatch):
+    resource = ResourceStub(current_version=3)
+    monkeypatch.setattr(recipes.ServiceFactory, "get_service", classmethod(lambda cls, name: resource))
+    return resource
+
+
+def put(recipes, recipe_id, if_match):
+    from fastapi import Response
+    response = Response()
+    recipes.update_recipe_by_id(recipe_id, Recipe(name="Stew", ingredients=[]), request=None, response=response,
+                                if_match=if_match)
+    return response
+
+
+def test_stale_writes_fail_with_the_current_etag(recipes, resource):
+    from fastapi import HTTPException, Response
+    for write in (lambda: put(recipes, 1, '"2"'),
+                  lambda: recipes.patch_recipe_by_id(1, recipes.RecipePatch(rating=4.0), request=None,
+                                                     response=Response(), if_match='W/"2"'),
+                  lambda: recipes.delete_recipe_by_id(1, request=None, if_match='"2"'),
+                  lambda: recipes.delete_recipe_by_name("Stew", request=None, if_match='"2"')):
+        with pytest.raises(HTTPException) as error:
+            write()
+        assert error.value.status_code == 412
+        assert error.value.headers == {"ETag": '"3"'}
+    assert resource.current_version == 3
+
+    with pytest.raises(HTTPException) as error:
+        put(recipes, 404, '"3"')
+    assert error.value.status_code == 404
+
+
+def test_matching_writes_return_the_new_etag(recipes, resource):
+    assert put(recipes, 1, '"3"').headers["ETag"] == '"4"'
+    assert put(recipes, 1, "*").headers["ETag"] == '"5"'
+    assert put(recipes, 1, None).headers["ETag"] == '"6"'
+    assert recipes.delete_recipe_by_id(1, request=None, if_match='"6"') == {
+        "message": "Recipe with id 1 has been deleted"
+    }
+
+
+def test_updates_bump_the_version_and_check_the_expected_one():
+    service, connections = make_data_service([
+        (r"^UPDATE .* AND `version`=%s", 0),  # the expected version is stale
+        (r"^SELECT `version`", [{"version": 7}]),
+    ])
+    service.update_data("db", "recipes", {"rating": 4.0}, key_field="recipe_id", key_value=1)
+    update = connections[0].sql("UPDATE")[0]
+    assert update == "UPDATE `db`.`recipes` SET `rating`=%s, `version`=`version`+1 WHERE `recipe_id`=%s"
+    assert connections[0].transactions == ["BEGIN", "COMMIT"]
+
+    with pytest.raises(VersionConflictException) as error:
+        service.update_data("db", "recipes", {"rating": 4.0}, key_field="recipe_id", key_value=1,
+                            expected_version=6)
+    assert error.value.current_version == 7
+    assert connections[0].statements[-2] == (
+        "UPDATE `db`.`recipes` SET `rating`=%s, `version`=`version`+1 WHERE `recipe_id`=%s AND `version`=%s",
+        [4.0, 1, 6]
+    )
+    assert connections[0].transactions[-1] == "ROLLBACK"
+
+
+def test_deletes_claim_the_expected_version():
+    service, connections = make_data_service([(r"^UPDATE", 0), (r"^SELECT `version`", [])])
+    with pytest.raises(NotFoundException):
+        service.delete_data("db", "recipes", key_field="recipe_id", key_value=1, expected_version=2)
+    assert connections[0].sql("DELETE") == []
+
+    service, connections = make_data_service()
+    service.delete_data("db", "recipes", key_field="recipe_id", key_value=1, expected_version=2)
+    assert connections[0].sql()[:2] == [
+        "UPDATE `db`.`recipes` SET `version`=`version`+1 WHERE `recipe_id`=1 AND `version`=2",
+        "DELETE FROM `db`.`ingredients` WHERE `recipe_id`=1",
+    ]
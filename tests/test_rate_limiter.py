@@ -0,0 +1,85 @@
+import pytest
+
+from framework.utils.rate_limiter import InMemoryRateLimitStore, NetworkRateLimitStore, RateLimitPolicy
+
+
+def test_policy_parse():
+    policy = RateLimitPolicy.parse("read", "120/60")
+    assert (policy.limit, policy.period, policy.rate) == (120, 60.0, 2.0)
+    assert policy.header() == "120;w=60"
+    for invalid in ("120", "a/60", "0/60", "10/0"):
+        with pytest.raises(ValueError):
+            RateLimitPolicy.parse("read", invalid)
+
+
+def test_bucket_allows_a_burst_then_refills():
+    store = InMemoryRateLimitStore()
+    policy = RateLimitPolicy("read", 3, 3)  # one token per second
+    results = [store.consume("client", policy, now=100.0) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    denied = results[-1]
+    assert denied.headers() == {"RateLimit-Limit": "3", "RateLimit-Remaining": "0", "RateLimit-Reset": "3",
+                                "RateLimit-Policy": "3;w=3", "Retry-After": "1"}
+    assert "Retry-After" not in results[0].headers()
+
+    assert store.consume("other", policy, now=100.0).allowed  # buckets are per client
+    assert store.consume("client", RateLimitPolicy("write", 1, 1), now=100.0).allowed  # and per policy
+    assert store.consume("client", policy, now=101.5).allowed
+    assert not store.consume("client", policy, now=101.5).allowed
+    assert store.consume("client", policy, cost=3, now=110.0).remaining == 0
+
+
+def test_idle_buckets_expire_and_memory_is_bounded():
+    store = InMemoryRateLimitStore(max_entries=3)
+    policy = RateLimitPolicy("read", 10, 10)
+    for i in range(3):
+        store.consume(f"client{i}", policy, now=0.0)
+    assert len(store) == 3
+    store.consume("client3", policy, now=0.5)  # over max_entries: the least recently used goes
+    assert len(store) == 3
+    store.consume("client4", policy, now=5.0)  # the others have refilled by now
+    assert len(store) == 2
+    store.consume("client4", policy, now=6.0)
+    assert len(store) == 1
+
+
+class FailingClient:
+    def eval(self, script, keys, args):
+        raise ConnectionError("down")
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = []
+
+    def eval(self, script, keys, args):
+        self.calls.append((keys, args))
+        return [0, "0.25"]
+
+
+def test_network_store():
+    policy = RateLimitPolicy("expensive", 4, 2)
+    client = StubClient()
+    result = NetworkRateLimitStore(client).consume("10.0.0.1", policy, cost=2)
+    assert client.calls == [(["ratelimit:expensive:10.0.0.1"], [4, 2.0, 2])]
+    assert (result.allowed, result.remaining, result.retry_after) == (False, 0.25, 0.875)
+
+    # An unavailable server lets requests through
+    assert NetworkRateLimitStore(FailingClient()).consume("10.0.0.1", policy).allowed
+
+
+def test_client_key_ignores_forwarded_entries_the_client_made_up():
+    pytest.importorskip("fastapi")
+    from starlette.requests import Request
+    from app.rate_limit_middleware import RateLimitMiddleware
+
+    def key(forwarded_for, trusted_hops=1):
+        middleware = RateLimitMiddleware(None, InMemoryRateLimitStore(), {}, client_header="X-Forwarded-For",
+                                         trusted_hops=trusted_hops)
+        return middleware.client_key(Request({"type": "http", "client": ("10.0.0.9", 443),
+                                              "headers": [(b"x-forwarded-for", forwarded_for.encode())]}))
+
+    # The load balancer appended 203.0.113.7; a rotated leading entry does not give a new bucket
+    assert key("203.0.113.7") == key("1.2.3.4, 203.0.113.7") == key("5.6.7.8, 203.0.113.7") == "203.0.113.7"
+    assert key("1.2.3.4, 203.0.113.7, 10.1.0.2", trusted_hops=2) == "203.0.113.7"
+    assert key("203.0.113.7", trusted_hops=2) == "203.0.113.7"
@@ -0,0 +1,35 @@
+from tests.mysql_stub import make_data_service
+
+STEW = {"recipe_id": 1, "name": "Stew", "steps": "Simmer.", "time_to_cook": 120, "meal_type": "dinner",
+        "calories": 700, "rating": 4.8, "version": 3}
+
+
+def test_recipe_and_ingredients_are_read_with_two_statements():
+    service, connections = make_data_service([
+        (r"WHERE r.`name`=%s", [STEW]),
+        (r"FROM `db`.`ingredients` i WHERE i.recipe_id=1$", [
+            {"ingredient_id": 10, "ingredient_name": "Beef", "quantity": "1 kg"},
+            {"ingredient_id": 11, "ingredient_name": "Salt", "quantity": None},
+        ]),
+    ])
+    recipe = service.get_data_object("db", "recipes", "name", "Stew")
+    assert recipe == dict(STEW, ingredients=[{"ingredient_id": 10, "ingredient_name": "Beef", "quantity": "1 kg"},
+                                             {"ingredient_id": 11, "ingredient_name": "Salt", "quantity": None}])
+    # The ingredients are looked up by the recipe_id of the row, not by the name
+    assert [args for _, args in connections[0].statements] == [["Stew"], None]
+
+
+def test_recipe_without_ingredients_has_an_empty_list():
+    service, connections = make_data_service([(r"FROM `db`.`recipes`", [STEW])])
+    assert service.get_data_object("db", "recipes", "recipe_id", 1) == dict(STEW, ingredients=[])
+    assert len(connections[0].statements) == 2
+
+
+def test_missing_recipe_is_none_without_an_ingredients_query():
+    service, connections = make_data_service()
+    assert service.get_data_object("db", "recipes", "recipe_id", 1) is None
+    assert connections[0].sql() == [
+        "SELECT r.`recipe_id`, r.`name`, r.`steps`, r.`time_to_cook`, r.`meal_type`, r.`calories`, r.`rating`, "
+        "r.`version` FROM `db`.`recipes` r WHERE r.`recipe_id`=1"
+    ]
+    assert service.pool.stats()["in_use"] == 0
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from app.resources.recipe_snapshot import RecipeSnapshot
+
+
+def recipe(recipe_id, name, meal_type=None, calories=None, time_to_cook=None, rating=None):
+    return {"recipe_id": recipe_id, "name": name, "meal_type": meal_type, "calories": calories,
+            "time_to_cook": time_to_cook, "rating": rating}
+
+
+class CatalogStub:
+    """
+    The recipes/ingredients tables and the change outbox, as the snapshot reads them.
+    """
+
+    def __init__(self):
+        self.recipes = {}
+        self.ingredients = {}
+        self.changes = []
+
+    def write(self, row, ingredients=(), operation="update"):
+        self.recipes[row["recipe_id"]] = row
+        self.ingredients[row["recipe_id"]] = list(ingredients)
+        self.changes.append({"change_id": len(self.changes) + 1, "recipe_id": row["recipe_id"],
+                             "operation": operation})
+
+    def delete(self, recipe_id):
+        del self.recipes[recipe_id]
+        self.changes.append({"change_id": len(self.changes) + 1, "recipe_id": recipe_id, "operation": "delete"})
+
+    def get_catalog_rows(self, database_name, collection_name, after_recipe_id=0, limit=5000, recipe_ids=None):
+        if recipe_ids is None:
+            ids = sorted(i for i in self.recipes if i > after_recipe_id)[:limit]
+        else:
+            ids = [i for i in recipe_ids if i in self.recipes]
+        return ([self.recipes[i] for i in ids],
+                [{"recipe_id": i, "ingredient_name": name} for i in ids for name in self.ingredients[i]])
+
+    # The change feed interface
+    def head(self):
+        return self.changes[-1]["change_id"] if self.changes else 0
+
+    def pruned_through(self):
+        return 0
+
+    def read(self, after_change_id, limit=100):
+        return [c for c in self.changes if c["change_id"] > after_change_id][:limit]
+
+
+def make_snapshot(max_patched_fraction=0.2):
+    catalog = CatalogStub()
+    catalog.write(recipe(1, "Omelette", "breakfast", 300, 10, 4.0), ["Egg", "Salt"], "create")
+    catalog.write(recipe(2, "Pancakes", "breakfast", 450, 20, 4.6), ["Egg", "Flour"], "create")
+    catalog.write(recipe(3, "Stew", "dinner", 700, 120, 4.8), ["Beef", "Salt"], "create")
+    catalog.write(recipe(4, "Toast", "Breakfast"), ["Bread"], "create")
+    snapshot = RecipeSnapshot(catalog, catalog, chunk_size=2, max_patched_fraction=max_patched_fraction)
+    snapshot.load()
+    return catalog, snapshot
+
+
+def ids(result):
+    return [item["recipe_id"] for item in result[1]]
+
+
+def test_filters_and_nulls():
+    _, snapshot = make_snapshot()
+    assert ids(snapshot.search(meal_type="breakfast")) == [1, 2, 4]
+    assert ids(snapshot.search(max_calories=500)) == [1, 2]
+    assert ids(snapshot.search(min_calories=400)) == [2, 3]
+    assert ids(snapshot.search(min_rating=4.5, max_time_to_cook=60)) == [2]
+    assert ids(snapshot.search(ingredient="egg")) == [1, 2]
+    assert snapshot.search(meal_type="brunch") == (0, [])
+    # Like the database collation, meal types compare case-insensitively
+    assert ids(snapshot.search(meal_type="BREAKFAST")) == [1, 2, 4]
+
+
+def test_sort_and_top_k():
+    _, snapshot = make_snapshot()
+    assert ids(snapshot.search(sort="rating", descending=True)) == [3, 2, 1, 4]
+    assert ids(snapshot.search(sort="rating", descending=True, limit=2)) == [3, 2]
+    assert ids(snapshot.search(sort="calories", skip=1, limit=2)) == [2, 3]
+    assert ids(snapshot.search(sort="name")) == [1, 2, 3, 4]
+
+    total, items = snapshot.search(meal_type="dinner")
+    assert total == 1
+    assert items[0] == {"recipe_id": 3, "name": "Stew", "meal_type": "dinner", "calories": 700,
+                        "time_to_cook": 120, "rating": 4.8, "ingredients": ["Beef", "Salt"]}
+
+
+# 1.0 patches the columns in place; 0.2 reloads, as 2 of 5 rows are patched
+@pytest.mark.parametrize("max_patched_fraction", [1.0, 0.2])
+def test_incremental_refresh(max_patched_fraction):
+    catalog, snapshot = make_snapshot(max_patched_fraction)
+    catalog.write(recipe(1, "Omelette", "breakfast", 300, 10, 2.0), ["Egg", "Cheese"])
+    catalog.write(recipe(5, "Salad", "lunch", 150, 5, 4.9), ["Lettuce"], "create")
+    catalog.delete(3)
+    snapshot.refresh()
+
+    assert ids(snapshot.search(sort="rating", descending=True)) == [5, 2, 1, 4]
+    assert ids(snapshot.search(ingredient="Salt")) == []
+    assert ids(snapshot.search(ingredient="Cheese")) == [1]
+    assert snapshot.stats()["recipes"] == 4
+    assert snapshot.stats()["change_offset"] == 7
+
+
+def test_pruned_changes_force_a_reload():
+    catalog, snapshot = make_snapshot()
+    catalog.write(recipe(6, "Soup", "dinner", 200), [], "create")
+    del catalog.changes[:-1]
+    catalog.changes[0]["change_id"] = 10
+    snapshot.refresh()
+    assert ids(snapshot.search(meal_type="dinner")) == [3, 6]
+    assert snapshot.stats()["change_offset"] == 10
+
+
+def test_suggest_names_follows_renames_and_deletes():
+    catalog, snapshot = make_snapshot()
+    assert [s["recipe_id"] for s in snapshot.suggest_names("pancake")] == [2]
+    assert snapshot.suggest_names("Omelete")[0]["name"] == "Omelette"
+
+    catalog.write(recipe(2, "Crêpes", "breakfast", 450, 20, 4.6), ["Egg", "Flour"])
+    catalog.delete(1)
+    snapshot.refresh()
+    assert snapshot.suggest_names("pancake") == []
+    assert snapshot.suggest_names("Omelete") == []
+    assert snapshot.suggest_names("crepes") == [{"recipe_id": 2, "name": "Crêpes", "similarity": 1.0}]
+
+
+def test_suggest_names_finds_a_recipe_that_comes_back():
+    catalog, snapshot = make_snapshot(max_patched_fraction=1.0)  # patch in place, never reload
+    omelette = catalog.recipes[1]
+    catalog.delete(1)
+    snapshot.refresh()
+    assert snapshot.suggest_names("Omelete") == []
+
+    catalog.write(omelette, ["Egg"], "create")
+    snapshot.refresh()
+    assert [s["recipe_id"] for s in snapshot.suggest_names("Omelete")] == [1]
+    assert ids(snapshot.search(ingredient="Egg")) == [1, 2]
+
+
+def test_start_loads_in_the_background():
+    catalog = CatalogStub()
+    catalog.write(recipe(1, "Omelette", "breakfast"), ["Egg"], "create")
+    release = threading.Event()
+    get_catalog_rows = catalog.get_catalog_rows
+    catalog.get_catalog_rows = lambda *args, **kwargs: release.wait(5) and get_catalog_rows(*args, **kwargs)
+    snapshot = RecipeSnapshot(catalog, None, refresh_interval=60)
+
+    snapshot.start()  # returns while the first load is still reading
+    assert not snapshot.ready
+    release.set()
+    for _ in range(50):
+        if snapshot.ready:
+            break
+        time.sleep(0.1)
+    snapshot.stop()
+    assert ids(snapshot.search()) == [1]
@@ -0,0 +1,78 @@
+import threading
+from contextvars import copy_context
+
+from framework.utils.request_profiler import (
+    ProfileStore, RequestProfile, cprofiled, current_profile, record_statement
+)
+
+
+def make_profile(correlation_id="abc", use_cprofile=False):
+    return RequestProfile(correlation_id, "GET", "/recipes", use_cprofile=use_cprofile)
+
+
+def test_phases_split_the_request():
+    profile = make_profile()
+    profile.start = 0.0
+    profile.route_start, profile.endpoint_start = 0.002, 0.003
+    profile.endpoint_end, profile.route_end, profile.end = 0.013, 0.015, 0.016
+    profile.add_statement(0.006)
+
+    phases = {phase: round(seconds, 6) for phase, seconds in profile.phases().items()}
+    assert phases == {"middleware": 0.003, "validation": 0.001, "router": 0.004, "sql": 0.006,
+                      "serialization": 0.002, "total": 0.016}
+    assert profile.server_timing().startswith("middleware;dur=3.00, validation;dur=1.00, router;dur=4.00, "
+                                              'sql;dur=6.00;desc="1 statements"')
+
+
+def test_phases_of_a_request_that_never_reached_the_endpoint():
+    profile = make_profile()
+    profile.start, profile.route_start, profile.route_end, profile.end = 0.0, 0.001, 0.002, 0.004
+    assert list(profile.phases()) == ["middleware", "validation", "total"]
+
+    unrouted = make_profile()
+    unrouted.finish(404)
+    assert list(unrouted.phases()) == ["middleware", "total"]
+
+
+def test_statements_are_recorded_in_the_current_profile_only():
+    record_statement("SELECT 1", None, 1.0)  # no profile: ignored
+
+    profile = make_profile()
+    token = current_profile.set(profile)
+    try:
+        record_statement("SELECT 1", None, 0.5)
+        # Another thread with a copy of the context, as the threadpool runs route handlers
+        thread = threading.Thread(target=copy_context().run, args=(record_statement, "SELECT 2", None, 0.25))
+        thread.start()
+        thread.join()
+    finally:
+        current_profile.reset(token)
+    assert (profile.sql_statements, profile.sql_seconds) == (2, 0.75)
+
+
+def test_cprofile_report_and_one_at_a_time():
+    first, second = make_profile(use_cprofile=True), make_profile(use_cprofile=True)
+    with cprofiled(first):
+        with cprofiled(second):
+            sum(range(1000))
+    assert "function calls" in first.cprofile
+    assert second.cprofile is None and second.notes
+
+    untouched = make_profile()
+    with cprofiled(untouched):
+        pass
+    assert untouched.cprofile is None and not untouched.notes
+
+
+def test_profile_store_is_bounded():
+    store = ProfileStore(max_entries=2)
+    for correlation_id in ("a", "b", "c"):
+        profile = make_profile(correlation_id)
+        profile.finish(200)
+        store.put(profile)
+    store.put(make_profile(None))
+
+    assert store.get("a") is None
+    assert store.get("c")["status_code"] == 200
+    assert [p["correlation_id"] for p in store.recent()] == ["c", "b"]
+    assert "cprofile" not in store.recent()[0]
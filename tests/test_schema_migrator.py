@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from framework.services.data_access.SchemaMigrator import SchemaMigrator, split_statements, DEFAULT_MIGRATIONS_DIR
+
+
+def test_split_statements_skips_comments_and_blank_lines():
+    sql = """
+-- a comment
+CREATE TABLE t (a INT);
+
+ALTER TABLE t
+    ADD KEY ix_a (a);
+"""
+    assert split_statements(sql) == ["CREATE TABLE t (a INT)", "ALTER TABLE t\n    ADD KEY ix_a (a)"]
+
+
+def test_split_statements_honors_delimiter():
+    sql = """
+DELIMITER $$
+CREATE TRIGGER trg AFTER INSERT ON t FOR EACH ROW
+BEGIN
+    UPDATE s SET n = n + 1;
+END$$
+DELIMITER ;
+SELECT 1;
+"""
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[0].startswith("CREATE TRIGGER")
+    assert "UPDATE s SET n = n + 1;" in statements[0]
+    assert statements[0].endswith("END")
+    assert statements[1] == "SELECT 1"
+
+
+def test_discover_orders_repository_migrations():
+    migrator = SchemaMigrator(data_service=None, database_name="recipes_database")
+    migrations = migrator.discover()
+    versions = [m[0] for m in migrations]
+    assert versions == sorted(versions)
+    assert versions[0] == 1
+    assert all(os.path.dirname(m[2]) == DEFAULT_MIGRATIONS_DIR for m in migrations)
+
+
+def test_discover_rejects_duplicate_versions(tmp_path):
+    (tmp_path / "001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "001_b.sql").write_text("SELECT 2;")
+    migrator = SchemaMigrator(data_service=None, database_name="db", migrations_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        migrator.discover()
+
+
+def test_repository_migrations_do_not_delete_rows():
+    migrator = SchemaMigrator(data_service=None, database_name="recipes_database")
+    for version, name, path in migrator.discover():
+        with open(path, encoding="utf-8") as f:
+            for statement in split_statements(f.read()):
+                assert not statement.upper().startswith(("DELETE", "TRUNCATE", "DROP TABLE")), (version, name)
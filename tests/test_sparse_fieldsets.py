@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from tests.mysql_stub import make_data_service
+
+STEW = {"recipe_id": 1, "name": "Stew", "steps": "Simmer.", "time_to_cook": 120, "meal_type": "dinner",
+        "calories": 700, "rating": 4.8, "version": 3}
+BEEF = {"ingredient_id": 10, "recipe_id": 1, "ingredient_name": "Beef", "quantity": "1 kg"}
+
+
+@pytest.fixture
+def recipes():
+    pytest.importorskip("fastapi")
+    from app.routers import recipes
+    return recipes
+
+
+def test_parse_fieldset(recipes):
+    from fastapi import HTTPException
+    assert recipes.parse_fieldset(None, None) == (None, True)
+    assert recipes.parse_fieldset("name, rating", None) == (["name", "rating"], False)
+    # ingredients are asked for either as a field or as an expansion
+    assert recipes.parse_fieldset("name,ingredients", None) == (["name"], True)
+    assert recipes.parse_fieldset("name", "ingredients") == (["name"], True)
+    assert recipes.parse_fieldset(None, "ingredients") == (None, True)
+
+    for fields, expand in (("name,colour", None), ("name", "steps"), (None, "ingredients,reviews")):
+        with pytest.raises(HTTPException) as error:
+            recipes.parse_fieldset(fields, expand)
+        assert error.value.status_code == 400
+
+
+def test_sparse_response_keeps_only_the_requested_fields(recipes, monkeypatch):
+    from fastapi import Response
+
+    class ResourceStub:
+        def get_by_key(self, key_value, key_field, fields=None, include_ingredients=True):
+            assert (fields, include_ingredients) == (["name"], False)
+            return {"recipe_id": key_value, "name": "Stew"}
+
+    monkeypatch.setattr(recipes.ServiceFactory, "get_service", classmethod(lambda cls, name: ResourceStub()))
+    response = recipes.get_recipe_by_id(1, request=None, response=Response(), fields="name", expand=None)
+    assert response.status_code == 200
+    assert sorted(json.loads(response.body)) == ["links", "name", "recipe_id"]
+
+
+def test_get_data_object_selects_only_the_requested_columns():
+    service, connections = make_data_service([(r"FROM `db`.`recipes`", [STEW]), (r"`ingredients`", [BEEF])])
+
+    assert service.get_data_object("db", "recipes", "recipe_id", 1, fields=["rating"],
+                                   include_ingredients=False) == {"recipe_id": 1, "rating": 4.8}
+    # No ingredients query when ingredients are not asked for
+    assert connections[0].sql() == ["SELECT r.`recipe_id`, r.`rating` FROM `db`.`recipes` r WHERE r.`recipe_id`=1"]
+
+    recipe = service.get_data_object("db", "recipes", "recipe_id", 1, fields=["name"])
+    assert recipe == {"recipe_id": 1, "name": "Stew",
+                      "ingredients": [{"ingredient_id": 10, "ingredient_name": "Beef", "quantity": "1 kg"}]}
+
+    with pytest.raises(ValueError):
+        service.get_data_object("db", "recipes", "recipe_id", 1, fields=["colour"])
+
+
+def test_get_all_data_selects_only_the_requested_columns():
+    service, connections = make_data_service([(r"FROM `db`.`recipes`", [STEW]), (r"ingredients i", [BEEF])])
+
+    assert service.get_all_data("db", "recipes", fields=["name"], include_ingredients=False) == [
+        {"recipe_id": 1, "name": "Stew"}
+    ]
+    assert len(connections[0].statements) == 1
+    # The sort column is returned too
+    assert service.get_all_data("db", "recipes", fields=["name"], include_ingredients=False, sort="rating") == [
+        {"recipe_id": 1, "name": "Stew", "rating": 4.8}
+    ]
+    assert service.get_all_data("db", "recipes", fields=["name"]) == [
+        {"recipe_id": 1, "name": "Stew",
+         "ingredients": [{"ingredient_id": 10, "ingredient_name": "Beef", "quantity": "1 kg"}]}
+    ]
+    assert len(connections[0].statements) == 4
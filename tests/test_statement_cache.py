@@ -0,0 +1,42 @@
+from framework.services.data_access.StatementCache import StatementCache, bucket_size, pad_in_list, render_int_args
+
+
+def test_bucket_size_rounds_up_to_power_of_two():
+    assert [bucket_size(n) for n in (1, 2, 3, 5, 8, 9, 100)] == [1, 2, 4, 8, 8, 16, 128]
+    assert len({bucket_size(n) for n in range(1, 101)}) == 8
+
+
+def test_pad_in_list_repeats_last_value():
+    assert pad_in_list([1, 2, 3]) == [1, 2, 3, 3]
+    assert pad_in_list([7, 8]) == [7, 8]
+
+
+def test_render_int_args():
+    assert render_int_args("SELECT * FROM t WHERE a=%s AND b IN (%s,%s)", [1, 2, 3]) == \
+        "SELECT * FROM t WHERE a=1 AND b IN (2,3)"
+    # Anything but plain ints goes through the driver's escaping.
+    assert render_int_args("SELECT %s", ["x"]) is None
+    assert render_int_args("SELECT %s", [True]) is None
+    assert render_int_args("SELECT %s", [1.5]) is None
+    assert render_int_args("SELECT 1", None) is None
+
+
+def test_statement_cache_builds_once():
+    cache = StatementCache()
+    calls = []
+
+    def builder():
+        calls.append(1)
+        return "SELECT 1"
+
+    assert cache.get("op", "db", "t", 1, builder) == "SELECT 1"
+    assert cache.get("op", "db", "t", 1, builder) == "SELECT 1"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_statement_cache_is_bounded():
+    cache = StatementCache(max_size=2)
+    for shape in range(3):
+        cache.get("op", "db", "t", shape, lambda: f"SELECT {shape}")
+    assert len(cache) == 2
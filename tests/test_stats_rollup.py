@@ -0,0 +1,64 @@
+from framework.services.data_access.StatsRollup import StatsDelta, calorie_bucket
+
+
+def test_calorie_bucket():
+    assert calorie_bucket(None) is None
+    assert calorie_bucket(0) == 0
+    assert calorie_bucket(99) == 0
+    assert calorie_bucket(250) == 200
+
+
+def test_insert_adds_every_rollup():
+    delta = StatsDelta()
+    delta.add_recipe({"meal_type": "breakfast", "rating": 4.5, "calories": 320})
+    delta.add_ingredients(["Egg", "Salt"])
+    assert delta.meal_type_rows() == [("breakfast", 1, 1, 4.5, 1, 320)]
+    assert delta.calorie_rows() == [(300, 1)]
+    assert delta.ingredient_rows() == [("Egg", 1), ("Salt", 1)]
+
+
+def test_missing_values_are_not_counted():
+    delta = StatsDelta()
+    delta.add_recipe({"meal_type": None, "rating": None, "calories": None})
+    assert delta.meal_type_rows() == [("", 1, 0, 0.0, 0, 0)]
+    assert delta.calorie_rows() == []
+
+
+def test_update_keeps_only_the_net_change():
+    before = {"meal_type": "dinner", "rating": 3.0, "calories": 510}
+    delta = StatsDelta()
+    delta.remove_recipe(before)
+    delta.add_recipe(dict(before, rating=4.0))
+    assert delta.meal_type_rows() == [("dinner", 0, 0, 1.0, 0, 0)]
+    assert delta.calorie_rows() == []
+
+    unchanged = StatsDelta()
+    unchanged.remove_recipe(before)
+    unchanged.add_recipe(dict(before))
+    assert not unchanged
+
+
+def test_moving_meal_type_and_bucket():
+    delta = StatsDelta()
+    delta.remove_recipe({"meal_type": "lunch", "rating": None, "calories": 450})
+    delta.add_recipe({"meal_type": "dinner", "rating": None, "calories": 520})
+    delta.remove_ingredients(["Rice"])
+    delta.add_ingredients(["Pasta"])
+    assert delta.meal_type_rows() == [("dinner", 1, 0, 0.0, 1, 520), ("lunch", -1, 0, 0.0, -1, -450)]
+    assert delta.calorie_rows() == [(400, -1), (500, 1)]
+    assert delta.ingredient_rows() == [("Pasta", 1), ("Rice", -1)]
+
+
+def test_top_ingredients_are_read_in_index_order():
+    from tests.mysql_stub import make_data_service
+    service, connections = make_data_service([
+        (r"recipe_stats_meal_types", [{"meal_type": "", "recipe_count": 2, "rating_count": 1, "rating_sum": 4.0,
+                                       "calorie_count": 0, "calorie_sum": 0}]),
+        (r"recipe_stats_ingredients", [{"ingredient_name": "Salt", "recipe_count": 2}]),
+    ])
+    stats = service.get_recipe_stats("db", top_ingredients=3)
+    assert stats["total_recipes"] == 2 and stats["meal_types"][0]["meal_type"] is None
+    assert stats["meal_types"][0]["average_rating"] == 4.0 and stats["meal_types"][0]["average_calories"] is None
+    assert stats["top_ingredients"] == [{"ingredient_name": "Salt", "count": 2}]
+    # Mixed directions would make MySQL sort every row instead of scanning the count index backwards
+    assert connections[0].sql()[-1].endswith("ORDER BY `recipe_count` DESC, `ingredient_name` DESC LIMIT 3")
@@ -0,0 +1,102 @@
+import pytest
+
+from framework.utils.tracing import (
+    Tracer, current_span, new_trace_id, parse_traceparent, record_statement_span, traced, tracer
+)
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class ListExporter:
+    def __init__(self):
+        self.batches = []
+
+    def export(self, spans):
+        self.batches.append(spans)
+
+    @property
+    def spans(self):
+        return [span for batch in self.batches for span in batch]
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracer.configure(exporter, max_batch=2, interval=60)
+    yield exporter
+    tracer.configure(None)
+
+
+def test_parse_traceparent():
+    context = parse_traceparent(TRACEPARENT)
+    assert (context.trace_id, context.span_id, context.sampled) == \
+        ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    assert context.traceparent() == TRACEPARENT
+    assert parse_traceparent(TRACEPARENT[:-2] + "00").sampled is False
+
+    for invalid in (None, "", "garbage", "ff" + TRACEPARENT[2:], "00-" + "0" * 32 + "-b7ad6b7169203331-01",
+                    "00-0af7651916cd43dd8448eb211c80319c-" + "0" * 16 + "-01"):
+        assert parse_traceparent(invalid) is None
+
+
+def test_new_trace_id_uses_uuid_correlation_ids():
+    assert new_trace_id("123e4567-e89b-12d3-a456-426614174000") == "123e4567e89b12d3a456426614174000"
+    assert len(new_trace_id("not-a-uuid")) == 32
+    assert new_trace_id() != new_trace_id()
+
+
+def test_spans_nest_under_the_request_span(exporter):
+    span = tracer.start_request_span("GET /recipes", traceparent=TRACEPARENT)
+    token = current_span.set(span)
+    try:
+        @traced
+        def get_all():
+            record_statement_span("SELECT 1", [1], 0.002)
+
+        get_all()
+        with pytest.raises(ValueError):
+            with tracer.span("failing"):
+                raise ValueError("boom")
+    finally:
+        current_span.reset(token)
+        span.end()
+    tracer.flush()
+
+    by_name = {s["name"]: s for s in exporter.spans}
+    assert set(by_name) == {"SELECT", "test_spans_nest_under_the_request_span.<locals>.get_all", "failing",
+                            "GET /recipes"}
+    request = by_name["GET /recipes"]
+    assert request["trace_id"] == "0af7651916cd43dd8448eb211c80319c"
+    assert request["parent_span_id"] == "b7ad6b7169203331"
+    function = by_name["test_spans_nest_under_the_request_span.<locals>.get_all"]
+    assert function["parent_span_id"] == request["span_id"]
+    statement = by_name["SELECT"]
+    assert statement["parent_span_id"] == function["span_id"]
+    assert statement["end_time_unix_nano"] - statement["start_time_unix_nano"] == 2000000
+    assert statement["attributes"]["db.statement"] == "SELECT 1"
+    assert by_name["failing"]["status"] == "error"
+    assert all(len(batch) <= 2 for batch in exporter.batches)
+
+
+def test_no_spans_without_a_sampled_request(exporter):
+    record_statement_span("SELECT 1", None, 0.001)
+    with tracer.span("orphan") as span:
+        assert span is None
+    assert tracer.start_request_span("GET /", traceparent=TRACEPARENT[:-2] + "00") is None
+    tracer.sample_rate = 0.0
+    assert tracer.start_request_span("GET /") is None
+    tracer.flush()
+    assert exporter.spans == []
+
+    assert Tracer().start_request_span("GET /") is None  # not configured
+
+
+def test_full_queue_drops_spans():
+    exporter = ListExporter()
+    local = Tracer()
+    local.configure(exporter, max_queue=3, max_batch=100, interval=60)
+    for i in range(5):
+        local.start_request_span(f"span {i}").end()
+    local.flush()
+    assert [s["name"] for s in exporter.spans] == ["span 0", "span 1", "span 2"]
+    assert local.processor.stats() == {"queued": 0, "exported": 3, "dropped": 2}
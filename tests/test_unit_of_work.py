@@ -0,0 +1,199 @@
+from contextlib import contextmanager
+
+import pytest
+
+from framework.services.data_access.BaseDataService import (
+    ConstraintViolationException, NotFoundException, UnitOfWorkAbortedException
+)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 1
+        self.lastrowid = 1
+        self.rows = []
+
+    def execute(self, sql, args=None):
+        self.connection.log.append(" ".join(sql.split()))
+        if self.connection.fail_on and sql.startswith(self.connection.fail_on):
+            import pymysql
+            raise pymysql.err.IntegrityError(1062, "Duplicate entry 'Stew' for key 'uq_recipes_name'")
+        self.rows = self.connection.results.pop(0) if self.connection.results else []
+        return self.rowcount
+
+    def executemany(self, sql, args):
+        self.connection.log.append(" ".join(sql.split()))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+        self.results = []
+        self.fail_on = None
+        self.open = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.log.append("BEGIN")
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+def make_service():
+    pytest.importorskip("pymysql")
+    from framework.services.data_access.MySQLRDBDataService import MySQLRDBDataService
+    service = MySQLRDBDataService(context=dict(host="localhost", port=3306, user="u", password="p"))
+    connections = []
+    service.pool._connect = lambda: connections.append(FakeConnection()) or connections[-1]
+    return service, connections
+
+
+def transaction_log(connection):
+    return [entry for entry in connection.log if entry in ("BEGIN", "COMMIT", "ROLLBACK")]
+
+
+def test_operations_share_one_transaction():
+    service, connections = make_service()
+    from framework.services.data_access.MySQLRDBDataService import _UnitOfWorkConnection
+    wrapped = _UnitOfWorkConnection(FakeConnection())
+    wrapped.begin()
+    wrapped.commit()
+    assert wrapped.connection.log == [] and not wrapped.rollback_only
+    wrapped.rollback()
+    assert wrapped.connection.log == [] and wrapped.rollback_only
+
+    with service.unit_of_work():
+        service.insert_data("db", "recipes", {"name": "Stew", "ingredients": []})
+        with service.unit_of_work():  # joins the outer one
+            service.insert_data("db", "recipes", {"name": "Soup", "ingredients": []})
+        assert transaction_log(connections[0]) == ["BEGIN"]
+    assert len(connections) == 1
+    assert transaction_log(connections[0]) == ["BEGIN", "COMMIT"]
+
+
+def test_a_failed_operation_rolls_back_even_if_caught():
+    service, connections = make_service()
+    with pytest.raises(UnitOfWorkAbortedException):
+        with service.unit_of_work():
+            service.insert_data("db", "recipes", {"name": "Stew", "ingredients": []})
+            connections[0].fail_on = "INSERT"
+            with pytest.raises(ConstraintViolationException):
+                service.insert_data("db", "recipes", {"name": "Stew", "ingredients": []})
+            assert service.unit_of_work_aborted()
+    assert transaction_log(connections[0]) == ["BEGIN", "ROLLBACK"]
+    assert not service.unit_of_work_aborted()
+
+    with pytest.raises(RuntimeError):
+        with service.unit_of_work():
+            raise RuntimeError("caller failed")
+    assert transaction_log(connections[0])[-2:] == ["BEGIN", "ROLLBACK"]
+
+
+class CacheStub:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, recipe_ids=(), names=()):
+        self.invalidated.append((list(recipe_ids), list(names)))
+
+
+class FeedStub:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, recipe_id):
+        self.published.append(recipe_id)
+
+
+class DataServiceStub:
+    def __init__(self):
+        self.next_id = 1
+        self.committed = []
+
+    @contextmanager
+    def unit_of_work(self):
+        yield
+        self.committed.append(True)
+
+    def insert_data(self, database_name, collection_name, data):
+        recipe_id, self.next_id = self.next_id, self.next_id + 1
+        return dict(data, recipe_id=recipe_id, version=1, ingredients=[])
+
+
+@pytest.fixture
+def resource(monkeypatch):
+    from app.resources.recipe_resource import RecipeResource
+    from app.services.service_factory import ServiceFactory
+    services = {"RecipeResourceDataService": DataServiceStub(), "RecipeCache": CacheStub(),
+                "RecipeChangeFeed": FeedStub()}
+    monkeypatch.setattr(ServiceFactory, "get_service", classmethod(lambda cls, name: services.get(name)))
+    return RecipeResource(config=None)
+
+
+def test_caches_are_invalidated_after_the_commit(resource):
+    with resource.unit_of_work():
+        resource.create_by_key({"name": "Stew", "ingredients": []})
+        with resource.unit_of_work():
+            resource.create_by_key({"name": "Soup", "ingredients": []})
+        assert resource.cache.invalidated == [] and resource.data_service.committed == []
+    assert resource.data_service.committed == [True]
+    assert resource.cache.invalidated == [([1, 2], ["Stew", "Soup"])]
+    assert resource.change_feed.published == [1]
+
+    with pytest.raises(NotFoundException):
+        with resource.unit_of_work():
+            resource.create_by_key({"name": "Pie", "ingredients": []})
+            raise NotFoundException("Recipe with recipe_id=9 not found")
+    assert len(resource.cache.invalidated) == 1  # rolled back: nothing to invalidate
+
+
+def test_transaction_errors_give_the_failing_operation(resource, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from app.models.recipe import RecipeTransaction
+    from app.routers import recipes
+
+    monkeypatch.setattr(recipes.ServiceFactory, "get_service", classmethod(lambda cls, name: resource))
+    transaction = RecipeTransaction(operations=[
+        {"op": "create", "recipe": {"name": "Stew", "ingredients": []}},
+        {"op": "create", "recipe": {"name": "Stew", "ingredients": []}},
+    ])
+
+    def duplicate(database_name, collection_name, data):
+        if data["name"] in names:
+            raise ConstraintViolationException("Duplicate entry 'Stew' for key 'uq_recipes_name'")
+        names.add(data["name"])
+        return dict(data, recipe_id=len(names), version=1, ingredients=[])
+
+    names = set()
+    monkeypatch.setattr(resource.data_service, "insert_data", duplicate, raising=False)
+    monkeypatch.setattr(resource.data_service, "unit_of_work_aborted", lambda: False, raising=False)
+    with pytest.raises(HTTPException) as error:
+        recipes.apply_recipe_transaction(transaction, request=None)
+    assert error.value.status_code == 409 and error.value.detail["operation"] == 1
+
+    # An error the operation handled itself still stops the transaction at that operation
+    names.clear()
+    monkeypatch.setattr(resource.data_service, "unit_of_work_aborted", lambda: bool(names), raising=False)
+    with pytest.raises(HTTPException) as error:
+        recipes.apply_recipe_transaction(transaction, request=None)
+    assert error.value.status_code == 409 and error.value.detail["operation"] == 0
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from app import warmup
+
+
+@pytest.fixture
+def hooks(monkeypatch):
+    monkeypatch.setattr(warmup, "state", {"ready": False, "warmup_seconds": None, "errors": []})
+    monkeypatch.setattr(warmup, "_hooks", [])
+    return warmup._hooks
+
+
+def test_warmup_runs_in_the_background_once(hooks):
+    release, calls = threading.Event(), []
+
+    def slow_hook():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+
+    hooks.append(slow_hook)
+    thread = warmup.start()  # returns while the hook is still running
+    assert not warmup.state["ready"]
+
+    # A warmup request that arrives meanwhile waits for the running warmup instead of repeating it
+    request = threading.Thread(target=warmup.run)
+    request.start()
+    request.join(0.1)
+    assert request.is_alive()
+
+    release.set()
+    thread.join(5)
+    request.join(5)
+    assert warmup.state["ready"] and calls == ["warmup"]
+    warmup.run()
+    assert calls == ["warmup"]
+
+
+def test_failing_hook_is_recorded_and_warmup_finishes(hooks):
+    def broken():
+        raise RuntimeError("database unreachable")
+
+    hooks.extend([broken, lambda: None])
+    warmup.start().join(5)
+    assert warmup.state["ready"]
+    assert warmup.state["errors"] == ["broken: database unreachable"]
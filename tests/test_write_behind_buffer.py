@@ -0,0 +1,92 @@
+import fcntl
+import json
+import os
+import threading
+
+import pytest
+
+from framework.services.data_access.WriteBehindBuffer import WriteBehindBuffer
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.flushed = threading.Event()
+
+    def __call__(self, updates):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append(updates)
+        self.flushed.set()
+
+
+def test_updates_are_coalesced_last_write_wins():
+    recorder = Recorder()
+    buffer = WriteBehindBuffer(recorder, flush_interval=60)
+    for rating in (3.0, 4.0, 4.5):
+        buffer.put(1, {"rating": rating})
+    buffer.put(2, {"rating": 2.0})
+    assert buffer.pending() == 2
+
+    assert buffer.flush() == 2
+    assert recorder.batches == [{1: {"rating": 4.5}, 2: {"rating": 2.0}}]
+    assert buffer.flush() == 0
+    buffer.close()
+
+
+def test_size_trigger_flushes_before_interval():
+    recorder = Recorder()
+    buffer = WriteBehindBuffer(recorder, max_pending=3, flush_interval=60)
+    for recipe_id in range(3):
+        buffer.put(recipe_id, {"rating": 1.0})
+    assert recorder.flushed.wait(5)
+    assert len(recorder.batches[0]) == 3
+    buffer.close()
+
+
+def test_failed_flush_keeps_newer_values():
+    recorder = Recorder(fail=True)
+    buffer = WriteBehindBuffer(recorder, flush_interval=60)
+    buffer.put(1, {"rating": 1.0})
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+
+    buffer.put(1, {"rating": 2.0})
+    recorder.fail = False
+    buffer.flush()
+    assert recorder.batches == [{1: {"rating": 2.0}}]
+    buffer.close()
+
+
+def test_journal_is_removed_after_close(tmp_path):
+    recorder = Recorder()
+    buffer = WriteBehindBuffer(recorder, flush_interval=60, journal_dir=str(tmp_path))
+    buffer.put(1, {"rating": 4.0})
+    assert any(name.endswith(".log") for name in os.listdir(tmp_path))
+    buffer.close()
+    assert recorder.batches == [{1: {"rating": 4.0}}]
+    assert os.listdir(tmp_path) == []
+
+
+def test_orphaned_journal_is_recovered(tmp_path):
+    # A dead process left an unflushed journal and a lock file nobody holds
+    (tmp_path / "write-behind-dead.lock").write_text("")
+    (tmp_path / "write-behind-dead.1.log").write_text(
+        json.dumps({"k": 7, "f": {"rating": 3.0}}) + "\n" + json.dumps({"k": 7, "f": {"rating": 3.5}}) + "\n"
+    )
+    (tmp_path / "write-behind-dead.2.log").write_text(json.dumps({"k": 8, "f": {"rating": 1.0}}) + "\n{\"k\": 9")
+
+    # And a live process holds its lock, so its journal is left alone
+    (tmp_path / "write-behind-alive.1.log").write_text(json.dumps({"k": 9, "f": {"rating": 5.0}}) + "\n")
+    with open(tmp_path / "write-behind-alive.lock", "a") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+
+        recorder = Recorder()
+        buffer = WriteBehindBuffer(recorder, flush_interval=60, journal_dir=str(tmp_path))
+        buffer.start()
+        assert recorder.flushed.wait(5)
+        assert recorder.batches[0] == {7: {"rating": 3.5}, 8: {"rating": 1.0}}
+        buffer.close()
+
+        assert sorted(os.listdir(tmp_path)) == ["write-behind-alive.1.log", "write-behind-alive.lock"]
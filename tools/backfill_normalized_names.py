@@ -0,0 +1,25 @@
+"""
+Fill in recipes.name_normalized (migration 008) for recipes written before it existed. Run it once
+after applying the migration; it skips recipes that already have it, so it can be re-run safely:
+
+    python -m tools.backfill_normalized_names
+"""
+import argparse
+
+from app.services.service_factory import ServiceFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in recipes.name_normalized where it is missing.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--collection", default="recipes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    filled = data_service.backfill_normalized_names(args.database, args.collection, batch_size=args.batch_size)
+    print(f"Normalized the names of {filled} recipes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark single-recipe fetches: the former LEFT JOIN shape, which repeats every recipe column once per
+ingredient row, against the two-statement fetch MySQLRDBDataService.get_data_object uses now.
+
+For each ingredient count it inserts a throw-away recipe with a long steps text, fetches it both ways and
+reports the median latency and the bytes of column data in the result sets, then deletes the recipe.
+Run it against a development or staging database:
+
+    python -m tools.bench_recipe_fetch
+    python -m tools.bench_recipe_fetch --sizes 5,20,50 --iterations 200 --steps-length 4000
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from app.services.service_factory import ServiceFactory
+
+
+def join_sql(database: str, collection: str) -> str:
+    # The statement get_data_object used before the two-statement fetch.
+    return (
+        f"SELECT r.recipe_id, r.name, r.steps, r.time_to_cook, r.meal_type, r.calories, r.rating, "
+        f"r.version, i.ingredient_id, i.ingredient_name, i.quantity "
+        f"FROM `{database}`.`{collection}` r "
+        f"LEFT JOIN `{database}`.`ingredients` i ON r.recipe_id = i.recipe_id "
+        f"WHERE r.recipe_id=%s"
+    )
+
+
+def payload_bytes(rows) -> int:
+    return sum(len(str(value).encode("utf-8")) for row in rows for value in row.values() if value is not None)
+
+
+def time_join(data_service, database: str, collection: str, recipe_id: int):
+    # Timed over the same span as get_data_object: pool checkout, circuit breaker, statement cache,
+    # the query and building the recipe dict.
+    start = time.perf_counter()
+    sql = data_service._sql("bench_join", database, collection, 1, lambda: join_sql(database, collection))
+    connection = data_service._get_connection("read")
+    try:
+        cursor = connection.cursor()
+        data_service._execute(cursor, sql, [recipe_id])
+        rows = cursor.fetchall()
+    finally:
+        data_service._release_connection(connection)
+    recipe = {column: rows[0][column] for column in data_service.RECIPE_COLUMNS}
+    recipe["ingredients"] = [
+        {"ingredient_id": row["ingredient_id"], "ingredient_name": row["ingredient_name"], "quantity": row["quantity"]}
+        for row in rows if row["ingredient_id"] is not None
+    ]
+    return time.perf_counter() - start, payload_bytes(rows)
+
+
+def time_two_statements(data_service, database: str, collection: str, recipe_id: int):
+    start = time.perf_counter()
+    recipe = data_service.get_data_object(database, collection, key_field="recipe_id", key_value=recipe_id)
+    elapsed = time.perf_counter() - start
+    ingredients = recipe.pop("ingredients")
+    return elapsed, payload_bytes([recipe]) + payload_bytes(ingredients)
+
+
+def bench(data_service, database: str, collection: str, size: int, iterations: int, steps_length: int):
+    recipe = data_service.insert_data(database, collection, {
+        "name": f"__bench_fetch_{uuid.uuid4().hex[:8]}",
+        "steps": ("Stir and simmer. " * (steps_length // 17 + 1))[:steps_length],
+        "meal_type": "dinner",
+        "ingredients": [{"ingredient_name": f"ingredient {n}", "quantity": f"{n} g"} for n in range(size)],
+    })
+    recipe_id = recipe["recipe_id"]
+    try:
+        # One untimed round of each to warm the connection and the server's caches
+        time_join(data_service, database, collection, recipe_id)
+        time_two_statements(data_service, database, collection, recipe_id)
+
+        join_times, split_times = [], []
+        for _ in range(iterations):
+            elapsed, join_bytes = time_join(data_service, database, collection, recipe_id)
+            join_times.append(elapsed)
+            elapsed, split_bytes = time_two_statements(data_service, database, collection, recipe_id)
+            split_times.append(elapsed)
+    finally:
+        data_service.delete_data(database, collection, key_field="recipe_id", key_value=recipe_id)
+
+    return statistics.median(join_times), join_bytes, statistics.median(split_times), split_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JOIN and two-statement single-recipe fetches.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--collection", default="recipes")
+    parser.add_argument("--sizes", default="5,20,50", help="Comma-separated ingredient counts")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--steps-length", type=int, default=2000, help="Characters of steps text")
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    print(f"{'ingredients':>11}  {'join ms':>8}  {'join bytes':>10}  {'2-stmt ms':>9}  {'2-stmt bytes':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        join_time, join_bytes, split_time, split_bytes = bench(
+            data_service, args.database, args.collection, size, args.iterations, args.steps_length
+        )
+        print(f"{size:>11}  {join_time * 1000:>8.3f}  {join_bytes:>10}  {split_time * 1000:>9.3f}  {split_bytes:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark of the client CPU spent per query on building and interpolating SQL,
+with and without the statement cache and the all-int interpolation fast path. No database
+is needed: statements are rendered with pymysql's own client-side interpolation
+(Cursor.mogrify) on an unconnected Connection.
+
+    python -m tools.bench_statement_cache
+    python -m tools.bench_statement_cache --iterations 50000
+"""
+import argparse
+import time
+
+import pymysql
+
+from framework.services.data_access.StatementCache import StatementCache, bucket_size, pad_in_list, render_int_args
+
+DATABASE = "recipes_database"
+TABLE = "recipes"
+
+
+def make_cursor():
+    connection = pymysql.connections.Connection(host="localhost", user="bench", password="", defer_connect=True)
+    # Normally set by the server handshake; needed by the string escaping code.
+    connection.server_status = 0
+    return connection.cursor()
+
+
+def uncached_ingredients_sql(recipe_ids):
+    format_strings = ','.join(['%s'] * len(recipe_ids))
+    return (
+        f"SELECT i.ingredient_id, i.recipe_id, i.ingredient_name, i.quantity "
+        f"FROM `{DATABASE}`.ingredients i "
+        f"WHERE i.recipe_id IN ({format_strings})"
+    )
+
+
+def cached_ingredients_sql(cache, recipe_ids):
+    return cache.get("ingredients_in", DATABASE, "ingredients", len(recipe_ids), lambda: (
+        f"SELECT i.ingredient_id, i.recipe_id, i.ingredient_name, i.quantity "
+        f"FROM `{DATABASE}`.ingredients i "
+        f"WHERE i.recipe_id IN ({','.join(['%s'] * len(recipe_ids))})"
+    ))
+
+
+def uncached_update_sql(fields):
+    set_clause = ", ".join([f"`{field}`=%s" for field in fields] + ["`version`=`version`+1"])
+    return f"UPDATE `{DATABASE}`.`{TABLE}` SET {set_clause} WHERE `recipe_id`=%s AND `version`=%s"
+
+
+def cached_update_sql(cache, fields):
+    return cache.get("update", DATABASE, TABLE, (fields, True), lambda: uncached_update_sql(fields))
+
+
+def interpolate(cursor, sql, args):
+    """
+    What MySQLRDBDataService._execute does before sending a statement.
+    """
+    rendered = render_int_args(sql, args)
+    if rendered is not None:
+        return rendered
+    return cursor.mogrify(sql, args)
+
+
+def cpu_per_call(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query client CPU with and without the statement cache.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cursor = make_cursor()
+    cache = StatementCache()
+
+    print(f"{'statement':<32}{'uncached us':>14}{'cached us':>12}{'build only':>14}{'cached build':>14}")
+    for size in (1, 10, 37, 100):
+        ids = list(range(1000, 1000 + size))
+
+        def uncached():
+            cursor.mogrify(uncached_ingredients_sql(ids), ids)
+
+        def cached():
+            padded = pad_in_list(ids)
+            interpolate(cursor, cached_ingredients_sql(cache, padded), padded)
+
+        build_uncached = cpu_per_call(lambda: uncached_ingredients_sql(ids), args.iterations)
+        build_cached = cpu_per_call(lambda: cached_ingredients_sql(cache, pad_in_list(ids)), args.iterations)
+        print(f"{'ingredients IN (' + str(size) + ')':<32}"
+              f"{cpu_per_call(uncached, args.iterations):>14.2f}{cpu_per_call(cached, args.iterations):>12.2f}"
+              f"{build_uncached:>14.2f}{build_cached:>14.2f}")
+
+    fields = ("name", "steps", "time_to_cook", "meal_type", "calories", "rating")
+    values = ["Avocado Toast", "1. Toast bread. 2. Mash avocado.", 10, "breakfast", 300, 4.4, 171, 3]
+
+    def uncached_update():
+        cursor.mogrify(uncached_update_sql(fields), values)
+
+    def cached_update():
+        interpolate(cursor, cached_update_sql(cache, fields), values)
+
+    print(f"{'update 6 fields':<32}"
+          f"{cpu_per_call(uncached_update, args.iterations):>14.2f}{cpu_per_call(cached_update, args.iterations):>12.2f}"
+          f"{cpu_per_call(lambda: uncached_update_sql(fields), args.iterations):>14.2f}"
+          f"{cpu_per_call(lambda: cached_update_sql(cache, fields), args.iterations):>14.2f}")
+
+    distinct = len({bucket_size(n) for n in range(1, 101)})
+    print(f"\nDistinct IN statements for page sizes 1..100: 100 without bucketing, {distinct} with bucketing")
+    print(f"Statement cache: {len(cache)} entries, {cache.hits} hits, {cache.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Delete many recipes with their ingredients, e.g. every recipe of a retired meal type:
+
+    python -m tools.bulk_delete --meal-type brunch
+    python -m tools.bulk_delete --ids 12,13,14
+
+Recipes are deleted in chunks of --chunk-size, each committed on its own; progress is printed per chunk.
+"""
+import argparse
+
+from app.services.service_factory import ServiceFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete recipes by id list and/or meal type.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--collection", default="recipes")
+    parser.add_argument("--ids", help="Comma-separated recipe ids")
+    parser.add_argument("--meal-type")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+    if args.ids is None and args.meal_type is None:
+        parser.error("give --ids and/or --meal-type")
+
+    recipe_ids = [int(value) for value in args.ids.split(",") if value.strip()] if args.ids else None
+    filters = {"meal_type": args.meal_type} if args.meal_type else None
+
+    def progress(deleted_ids, names, total):
+        print(f"Deleted recipes {deleted_ids[0]}..{deleted_ids[-1]} ({len(deleted_ids)}), {total} in total")
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    deleted = data_service.delete_data_bulk(args.database, args.collection, recipe_ids=recipe_ids,
+                                            filters=filters, progress=progress, chunk_size=args.chunk_size)
+    print(f"Deleted {deleted} recipes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Run EXPLAIN on every statement MySQLRDBDataService issues and flag full scans.
+
+The tool drives one create/read/list/update/delete cycle of a throw-away recipe through the data
+service, records each statement with its real parameters, then EXPLAINs them. Run it against a
+development or staging database after applying migrations:
+
+    python -m tools.explain_queries
+    python -m tools.explain_queries --allow "COUNT(*)"
+
+Exits with status 1 if any statement not matched by --allow has a problem.
+"""
+import argparse
+import sys
+import uuid
+
+from app.services.service_factory import ServiceFactory
+from framework.services.data_access.QueryPlanChecker import QueryPlanChecker
+
+
+def exercise(data_service, database: str, collection: str):
+    name = f"__explain_check_{uuid.uuid4().hex[:8]}"
+    recipe = data_service.insert_data(database, collection, {
+        "name": name,
+        "steps": "explain check",
+        "meal_type": "breakfast",
+        "ingredients": [
+            {"ingredient_name": "a", "quantity": "1"},
+            {"ingredient_name": "b", "quantity": "2"},
+        ],
+    })
+    recipe_id = recipe["recipe_id"]
+    try:
+        data_service.get_data_object(database, collection, key_field="recipe_id", key_value=recipe_id)
+        data_service.get_data_object(database, collection, key_field="name", key_value=name)
+        data_service.get_recipe_id_by_normalized_name(database, collection, name.upper())
+        data_service.get_all_data(database, collection, skip=0, limit=10)
+        data_service.get_all_data(database, collection, limit=10, sort="rating", descending=True,
+                                  after=(4.0, recipe_id))
+        data_service.get_all_data(database, collection, limit=10, sort="calories", after=(None, recipe_id))
+        data_service.get_top_rated(database, collection, limit=5)
+        data_service.get_total_count(database, collection)
+        # Change one quantity, drop one ingredient and add one, to hit every ingredient statement.
+        data_service.update_data(database, collection, {
+            "rating": 4.0,
+            "ingredients": [
+                {"ingredient_name": "a", "quantity": "3"},
+                {"ingredient_name": "c", "quantity": "1"},
+            ],
+        }, key_field="name", key_value=name, expected_version=recipe["version"])
+    finally:
+        data_service.delete_data(database, collection, key_field="name", key_value=name,
+                                 expected_version=recipe["version"] + 1)
+
+    # Bulk deletes, by id list and by filter (the throw-away meal type matches only the second recipe)
+    by_id = data_service.insert_data(database, collection, {"name": name + "_ids", "ingredients": [
+        {"ingredient_name": "a", "quantity": "1"},
+    ]})
+    data_service.delete_data_bulk(database, collection, recipe_ids=[by_id["recipe_id"]])
+    data_service.insert_data(database, collection, {"name": name + "_filter", "meal_type": name, "ingredients": []})
+    data_service.delete_data_bulk(database, collection, filters={"meal_type": name})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the data service's statements and flag full scans.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--collection", default="recipes")
+    parser.add_argument("--allow", action="append", default=[],
+                        help="Ignore problems in statements containing this text. May be repeated.")
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    checker = QueryPlanChecker(data_service)
+    with checker.recording():
+        exercise(data_service, args.database, args.collection)
+
+    failed = False
+    for finding in checker.check():
+        allowed = any(text in finding["sql"] for text in args.allow)
+        status = "OK" if not finding["problems"] else ("ALLOWED" if allowed else "FLAGGED")
+        print(f"[{status}] {finding['sql']}")
+        for row in finding["plan"]:
+            print(f"    table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                  f"rows={row.get('rows')} extra={row.get('Extra')}")
+        for problem in finding["problems"]:
+            print(f"    -> {problem}")
+        failed = failed or (finding["problems"] and not allowed)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Apply the versioned schema migrations in migrations/ to the recipe database.
+
+    python -m tools.migrate              # apply all pending migrations
+    python -m tools.migrate --dry-run    # list what would be applied
+    python -m tools.migrate --to 2       # stop after version 2
+"""
+import argparse
+
+from app.services.service_factory import ServiceFactory
+from framework.services.data_access.SchemaMigrator import SchemaMigrator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the recipe database.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--to", type=int, default=None, help="Target version (default: latest).")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    migrator = SchemaMigrator(data_service, args.database)
+    applied = migrator.migrate(target_version=args.to, dry_run=args.dry_run)
+    if not applied:
+        print("Schema is up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Delete old events from the recipe change outbox. Run it periodically (e.g. a daily cron job):
+
+    python -m tools.prune_changes --days 7
+
+Consumers that resume from a pruned offset receive a "reset" event and resynchronise.
+"""
+import argparse
+
+from app.services.service_factory import ServiceFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete change feed events older than --days.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    deleted = data_service.prune_changes(args.database, args.days)
+    print(f"Deleted {deleted} change events older than {args.days} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Recompute the recipe statistics rollups behind GET /recipes/stats from the recipes and ingredients
+tables. Writes keep the rollups current; run this to repair them after data was changed outside the
+service (e.g. manual SQL):
+
+    python -m tools.rebuild_stats
+"""
+import argparse
+
+from app.services.service_factory import ServiceFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the recipe statistics rollup tables.")
+    parser.add_argument("--database", default="recipes_database")
+    parser.add_argument("--collection", default="recipes")
+    args = parser.parse_args()
+
+    data_service = ServiceFactory.get_service("RecipeResourceDataService")
+    data_service.rebuild_stats(args.database, args.collection)
+    stats = data_service.get_recipe_stats(args.database)
+    print(f"Rebuilt statistics for {stats['total_recipes']} recipes")
+
+
+if __name__ == "__main__":
+    main()
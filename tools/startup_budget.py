@@ -0,0 +1,123 @@
+"""
+Cold-start budget: how long a new instance spends importing the app, and how long after the
+process is launched it answers its first request. No database is needed for the default
+/health/live probe, since the app connects lazily.
+
+    python -m tools.startup_budget
+    python -m tools.startup_budget --top 30 --path /recipes?limit=1
+    python -m tools.startup_budget --import-budget 800 --first-request-budget 1500
+
+Both measurements run in fresh interpreters, so nothing is already imported or cached. With a
+budget given, the exit status is 1 if it is exceeded, so the tool can gate a deploy.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULE = "app.main"
+
+
+def import_times(module: str) -> list:
+    """
+    Import module in a new interpreter with -X importtime.
+    :return: (name, self_us, cumulative_us, depth) per module, in import order.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(path: str, timeout: float) -> tuple:
+    """
+    Launch the app with uvicorn and poll path until it answers.
+    :return: (seconds from launch to the first response, its HTTP status)
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{APP_MODULE}:app", "--port", str(port),
+                               "--log-level", "warning"],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"The server exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    return time.perf_counter() - start, response.status
+            except urllib.error.HTTPError as e:
+                return time.perf_counter() - start, e.code
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module import time and time to first request.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--path", default="/health/live", help="Request to time after launch")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--import-budget", type=float, help="Milliseconds allowed for importing the app")
+    parser.add_argument("--first-request-budget", type=float, help="Milliseconds allowed until the first response")
+    args = parser.parse_args()
+
+    rows = import_times(APP_MODULE)
+    app_ms = next(cumulative for name, _, cumulative, _ in reversed(rows) if name == APP_MODULE) / 1000
+
+    print(f"{'slowest modules (self)':<56}{'self ms':>10}{'cumulative ms':>15}")
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{name:<56}{self_us / 1000:>10.1f}{cumulative_us / 1000:>15.1f}")
+
+    # What each direct import of the app costs, including everything it pulls in first. Children are
+    # listed before their parent, so collect depth-1 rows until the app module's own row.
+    direct, children = [], []
+    for name, _, cumulative_us, depth in rows:
+        if depth == 1:
+            children.append((name, cumulative_us))
+        elif depth == 0:
+            if name == APP_MODULE:
+                direct = children
+            children = []
+    print(f"\n{'imported by ' + APP_MODULE:<56}{'cumulative ms':>25}")
+    for name, cumulative_us in sorted(direct, key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<56}{cumulative_us / 1000:>25.1f}")
+
+    seconds, status = time_to_first_request(args.path, args.timeout)
+    first_request_ms = seconds * 1000
+    print(f"\nimport {APP_MODULE}: {app_ms:.0f} ms")
+    print(f"time to first request (GET {args.path} -> {status}): {first_request_ms:.0f} ms")
+
+    over = []
+    if args.import_budget is not None and app_ms > args.import_budget:
+        over.append(f"import {app_ms:.0f} ms > {args.import_budget:.0f} ms")
+    if args.first_request_budget is not None and first_request_ms > args.first_request_budget:
+        over.append(f"first request {first_request_ms:.0f} ms > {args.first_request_budget:.0f} ms")
+    if over:
+        print("Over budget: " + "; ".join(over))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()